@@ -4,10 +4,28 @@ from .calibration_message import CalibrationMessage
 from .data_message import DataMessage
 from .frame_header_message import FrameHeaderMessage
 from .frame_message import FrameMessage
+from .frame_message_lease import FrameMessageLease
+from .shared_frame_message import SharedFrameMessage
 from .simple_message import SimpleMessage
 from .ack_message import AckMessage
 
+from .image_codec import ImageCodec
+from .deduplicating_image_codec import DeduplicatingImageCodec
+from .delta_depth_image_codec import DeltaDepthImageCodec
+from .jpeg_image_codec import JPEGImageCodec
+from .png_image_codec import PNGImageCodec
+from .raw_image_codec import RawImageCodec
+from .scaled_image_codec import ScaledImageCodec
+from .tile_delta_image_codec import TileDeltaImageCodec
+from .webp_image_codec import WebPImageCodec
+from .yuv420_image_codec import YUV420ImageCodec
+from .image_codec_registry import ImageCodecRegistry
+
+from .depth_compression_util import DepthCompressionUtil
+from .rgbd_frame_batch_receiver import RGBDFrameBatchReceiver
+from .rgbd_frame_compressor import RGBDFrameCompressor
 from .rgbd_frame_message_util import RGBDFrameMessageUtil
 from .rgbd_frame_receiver import RGBDFrameReceiver
 
+from .async_socket_util import AsyncSocketUtil
 from .socket_util import SocketUtil
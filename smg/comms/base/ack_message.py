@@ -6,6 +6,15 @@ class AckMessage(SimpleMessage[int]):
 
     # CONSTRUCTOR
 
-    def __init__(self):
-        """Construct an acknowledgement message."""
-        super().__init__(int, 0)
+    def __init__(self, value: int = 0):
+        """
+        Construct an acknowledgement message.
+
+        .. note::
+            The value of an acknowledgement is protocol-specific. For example, the mapping server uses it to grant
+            credits to a client when acknowledging its calibration, and to tell it the cumulative number of frames
+            received when acknowledging each frame. Peers that don't need a value can simply ignore it.
+
+        :param value:   An optional value to carry with the acknowledgement.
+        """
+        super().__init__(int, value)
@@ -0,0 +1,89 @@
+import asyncio
+import socket
+
+from typing import TypeVar
+
+from .message import Message
+
+
+# TYPE VARIABLE
+
+T = TypeVar('T', bound=Message)
+
+
+# MAIN CLASS
+
+class AsyncSocketUtil:
+    """Utility functions related to sockets, for use with asyncio."""
+
+    # PUBLIC STATIC METHODS
+
+    @staticmethod
+    async def read_message(sock: socket.SocketType, msg: T) -> bool:
+        """
+        Attempt to read a message of type T from the specified (non-blocking) socket.
+
+        .. note::
+            As with SocketUtil.read_message, the bytes are received directly into the message's own buffer. This
+            requires Python 3.7 or later (for the event loop's sock_recv_into).
+
+        :param sock:    The socket.
+        :param msg:     The T into which to read the message (its contents are unspecified if reading fails).
+        :return:        True, if reading succeeded, or False otherwise.
+        """
+        loop = asyncio.get_event_loop()  # type: asyncio.AbstractEventLoop
+
+        try:
+            buffer = memoryview(msg.get_data()).cast("B")  # type: memoryview
+            offset = 0                                     # type: int
+
+            # Until we've read the number of bytes we were expecting:
+            while offset < len(buffer):
+                # Try to get the remaining bytes.
+                received = await loop.sock_recv_into(sock, buffer[offset:])  # type: int
+
+                # If we made progress, advance the offset into the buffer.
+                if received > 0:
+                    offset += received
+
+                # Otherwise, something's wrong, so return False.
+                else:
+                    return False
+
+            # If we managed to get the number of bytes we were expecting, return True to indicate a successful read.
+            return True
+        except (OSError, ValueError):
+            # If any exceptions are thrown during the read, return False.
+            return False
+
+    @staticmethod
+    async def write_message(sock: socket.SocketType, msg: T) -> bool:
+        """
+        Attempt to write a message of type T to the specified (non-blocking) socket.
+
+        :param sock:    The socket.
+        :param msg:     The message.
+        :return:        True, if writing succeeded, or False otherwise.
+        """
+        return await AsyncSocketUtil.write_messages(sock, msg)
+
+    @staticmethod
+    async def write_messages(sock: socket.SocketType, *msgs: Message) -> bool:
+        """
+        Attempt to write a sequence of messages to the specified (non-blocking) socket.
+
+        :param sock:    The socket.
+        :param msgs:    The messages.
+        :return:        True, if writing succeeded, or False otherwise.
+        """
+        loop = asyncio.get_event_loop()  # type: asyncio.AbstractEventLoop
+
+        try:
+            for msg in msgs:
+                if msg.get_size() > 0:
+                    await loop.sock_sendall(sock, memoryview(msg.get_data()).cast("B"))
+
+            return True
+        except OSError:
+            # If an exception is thrown during the write, return False.
+            return False
@@ -0,0 +1,136 @@
+import numpy as np
+import struct
+import threading
+import zlib
+
+from typing import Optional, Tuple
+
+from .image_codec import ImageCodec
+
+
+class DeduplicatingImageCodec(ImageCodec):
+    """
+    A stateful image codec that wraps another codec, and replaces any image that is identical to the previous image
+    in the stream with a tiny marker, rather than encoding it again.
+
+    .. note::
+        Whether an image is identical to the previous one is determined by comparing fingerprints of their raw
+        bytes (computed using CRC-32 and Adler-32, which are much faster than encoding the image). When a marker
+        is received, the decoder simply returns the image it decoded previously, so duplicate images cost neither
+        the sender nor the receiver any compression or decompression work, and almost nothing to transmit. This
+        is useful for sources that repeat images, e.g. replayed datasets or cameras that have stalled.
+    .. note::
+        As with TileDeltaImageCodec, the encoder must see the images in a stream in the order in which they will
+        be decoded, so a mapping client that uses this codec compresses its frames one at a time, in order.
+    """
+
+    # PRIVATE STATIC VARIABLES
+
+    # The format of the header at the start of each encoded image: flags, and the ID of the wrapped codec.
+    __HEADER_FMT = "<BH"  # type: str
+
+    # The flag denoting that an image is the same as the previous one.
+    __SAME_AS_PREVIOUS = 1  # type: int
+
+    # CONSTRUCTOR
+
+    def __init__(self, codec: Optional[ImageCodec] = None):
+        """
+        Construct a deduplicating image codec.
+
+        :param codec:   The codec to use to encode images that are not duplicates (only needed for encoding).
+        """
+        self.__codec = codec                  # type: Optional[ImageCodec]
+        self.__fingerprint = None             # type: Optional[Tuple[int, int, Tuple[int, ...], str]]
+        self.__inner_decoder = None           # type: Optional[ImageCodec]
+        self.__lock = threading.Lock()        # type: threading.Lock
+        self.__previous_image = None          # type: Optional[np.ndarray]
+
+    # PUBLIC METHODS
+
+    def decode(self, data: np.ndarray, shape: Tuple[int, int, int]) -> np.ndarray:
+        """
+        Decode the next image in the stream.
+
+        :param data:    The encoded image, as an array of bytes.
+        :param shape:   The shape of the image, as a (height, width, channels) tuple.
+        :return:        The decoded image.
+        """
+        # Note: The registry imports this codec, so we import it here to avoid a circular import.
+        from .image_codec_registry import ImageCodecRegistry
+
+        flags, codec_id = struct.unpack_from(DeduplicatingImageCodec.__HEADER_FMT, data)
+        offset = struct.calcsize(DeduplicatingImageCodec.__HEADER_FMT)  # type: int
+
+        with self.__lock:
+            # If the image is the same as the previous one, and we have the previous one, return it.
+            if flags & DeduplicatingImageCodec.__SAME_AS_PREVIOUS:
+                if self.__previous_image is None:
+                    raise RuntimeError("Error: Cannot decode a duplicate image without the previous image")
+                return self.__previous_image
+
+            # Otherwise, decode the image using the wrapped codec. Note that since the wrapped codec can itself be
+            # stateful, we maintain our own decoder for it.
+            if self.__inner_decoder is None or self.__inner_decoder.get_codec_id() != codec_id:
+                self.__inner_decoder = ImageCodecRegistry.get_codec(codec_id).make_decoder()
+
+            self.__previous_image = self.__inner_decoder.decode(data[offset:], shape)
+            return self.__previous_image
+
+    def encode(self, image: np.ndarray) -> np.ndarray:
+        """
+        Encode the next image in the stream.
+
+        :param image:   The image.
+        :return:        The encoded image, as an array of bytes.
+        """
+        if self.__codec is None:
+            raise RuntimeError("Error: Cannot encode images without a codec to wrap")
+
+        image = np.ascontiguousarray(image)
+        fingerprint = (
+            zlib.crc32(image), zlib.adler32(image), image.shape, image.dtype.str
+        )  # type: Tuple[int, int, Tuple[int, ...], str]
+
+        with self.__lock:
+            # If the image is the same as the previous one, just encode a marker.
+            if fingerprint == self.__fingerprint:
+                flags = DeduplicatingImageCodec.__SAME_AS_PREVIOUS  # type: int
+                payload = np.zeros(0, dtype=np.uint8)                # type: np.ndarray
+
+            # Otherwise, encode the image using the wrapped codec. Note that this is done whilst holding the lock,
+            # since the wrapped codec can itself be stateful.
+            else:
+                flags = 0
+                payload = self.__codec.encode(image)
+                self.__fingerprint = fingerprint
+
+        header = struct.pack(
+            DeduplicatingImageCodec.__HEADER_FMT, flags, self.__codec.get_codec_id()
+        )  # type: bytes
+
+        return np.concatenate([np.frombuffer(header, dtype=np.uint8), payload])
+
+    def get_codec_id(self) -> int:
+        """
+        Get the ID of the type of codec this is.
+
+        :return:    The ID of the type of codec this is.
+        """
+        return ImageCodec.DEDUPLICATING
+
+    def is_stateful(self) -> bool:
+        """
+        Get whether this is a stateful codec, i.e. one that encodes each image relative to previous ones.
+
+        :return:    True, since this is a stateful codec.
+        """
+        return True
+
+    def make_decoder(self) -> ImageCodec:
+        """
+        Make a codec that can be used to decode a single stream of images encoded by codecs of this type.
+
+        :return:    The codec to use to decode the stream.
+        """
+        return DeduplicatingImageCodec()
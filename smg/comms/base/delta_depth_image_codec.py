@@ -0,0 +1,58 @@
+import numpy as np
+
+from typing import Tuple
+
+from .depth_compression_util import DepthCompressionUtil
+from .image_codec import ImageCodec
+
+
+class DeltaDepthImageCodec(ImageCodec):
+    """
+    An image codec that losslessly compresses depth images using DepthCompressionUtil.
+
+    .. note::
+        The encoded images are prefixed by their height and width, so that they can be decoded even if they
+        were downscaled before being encoded (see ScaledImageCodec).
+    """
+
+    # CONSTRUCTOR
+
+    def __init__(self, level: int = 1):
+        """
+        Construct a delta depth image codec.
+
+        :param level:   The zlib compression level to use when encoding images (1 is fastest, 9 gives the best
+                        compression).
+        """
+        self.__level = level  # type: int
+
+    # PUBLIC METHODS
+
+    def decode(self, data: np.ndarray, shape: Tuple[int, int, int]) -> np.ndarray:
+        """
+        Decode an image that was encoded using this type of codec.
+
+        :param data:    The encoded image, as an array of bytes.
+        :param shape:   The shape of the image, as a (height, width, channels) tuple.
+        :return:        The decoded image.
+        """
+        height, width = data[:8].view("<u4")
+        return DepthCompressionUtil.decompress_depth_image(data[8:], (height, width))
+
+    def encode(self, image: np.ndarray) -> np.ndarray:
+        """
+        Encode an image.
+
+        :param image:   The image (with dtype np.uint16).
+        :return:        The encoded image, as an array of bytes.
+        """
+        size = np.array(image.shape[:2], dtype="<u4").view(np.uint8)  # type: np.ndarray
+        return np.concatenate([size, DepthCompressionUtil.compress_depth_image(image, level=self.__level)])
+
+    def get_codec_id(self) -> int:
+        """
+        Get the ID of the type of codec this is.
+
+        :return:    The ID of the type of codec this is.
+        """
+        return ImageCodec.DELTA_DEPTH
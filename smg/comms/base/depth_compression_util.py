@@ -0,0 +1,91 @@
+import numpy as np
+import zlib
+
+from typing import Optional, Tuple
+
+
+class DepthCompressionUtil:
+    """Utility functions for the lossless compression of depth images."""
+
+    # PRIVATE STATIC VARIABLES
+
+    # The magic bytes at the start of a depth image that has been compressed using compress_depth_image.
+    __MAGIC = b"SMGD"  # type: bytes
+
+    # PUBLIC STATIC METHODS
+
+    @staticmethod
+    def compress_depth_image(depth_image: np.ndarray, *, level: int = 1) -> np.ndarray:
+        """
+        Losslessly compress a depth image.
+
+        .. note::
+            The depth image is first converted into a sequence of differences between successive pixels (in raster
+            order), which are small wherever the depth varies smoothly, and zero within runs of invalid (zero) depth.
+            These are zigzag-encoded (so that small negative differences also become small unsigned values), and then
+            split into separate planes of low and high bytes, the latter of which are almost all zero. This makes
+            the data highly compressible, so a fast deflate level suffices for the final stage. The whole process is
+            vectorised, and for typical depth images it is both faster than PNG encoding and more compact.
+
+        :param depth_image: The depth image (with dtype np.uint16).
+        :param level:       The zlib compression level to use (1 is fastest, 9 gives the best compression).
+        :return:            The compressed depth image, as an array of bytes.
+        """
+        flat = np.ascontiguousarray(depth_image, dtype=np.uint16).reshape(-1)  # type: np.ndarray
+
+        # Compute the differences between successive pixels. The arithmetic wraps around modulo 2^16, which
+        # is fine, since the decoder's cumulative sum will wrap around in exactly the same way.
+        deltas = np.empty_like(flat)  # type: np.ndarray
+        if len(flat) > 0:
+            deltas[0] = flat[0]
+            np.subtract(flat[1:], flat[:-1], out=deltas[1:])
+
+        # Zigzag-encode the differences (interpreted as signed 16-bit values).
+        signed_deltas = deltas.view(np.int16)  # type: np.ndarray
+        zigzagged = ((signed_deltas << 1) ^ (signed_deltas >> 15)).view(np.uint16)  # type: np.ndarray
+
+        # Split the zigzagged differences into planes of low and high bytes, and deflate the result.
+        planes = zigzagged.astype("<u2", copy=False).view(np.uint8).reshape(-1, 2).T  # type: np.ndarray
+        compressed = zlib.compress(np.ascontiguousarray(planes).tobytes(), level)  # type: bytes
+
+        return np.frombuffer(DepthCompressionUtil.__MAGIC + compressed, dtype=np.uint8)
+
+    @staticmethod
+    def decompress_depth_image(data: np.ndarray, shape: Tuple[int, int], *,
+                               out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Decompress a depth image that was compressed using compress_depth_image.
+
+        :param data:    The compressed depth image, as an array of bytes.
+        :param shape:   The shape of the depth image, as a (height, width) tuple.
+        :param out:     An optional contiguous np.uint16 array of the specified shape into which to decompress the
+                        depth image (e.g. a view onto the image data of a frame message), avoiding a separate copy.
+        :return:        The depth image (with dtype np.uint16), which is out if it was specified.
+        """
+        if not DepthCompressionUtil.is_compressed_depth_image(data):
+            raise RuntimeError("Error: The data is not a depth image compressed by DepthCompressionUtil")
+
+        # Inflate the planes of low and high bytes, and interleave them to recover the zigzagged differences.
+        magic_len = len(DepthCompressionUtil.__MAGIC)  # type: int
+        planes = np.frombuffer(zlib.decompress(memoryview(data)[magic_len:]), dtype=np.uint8)  # type: np.ndarray
+        zigzagged = np.ascontiguousarray(planes.reshape(2, -1).T).view("<u2").reshape(-1)  # type: np.ndarray
+
+        # Undo the zigzag encoding, and then accumulate the differences to recover the depth values.
+        deltas = (zigzagged >> 1) ^ (np.uint16(0) - (zigzagged & 1))  # type: np.ndarray
+        if out is None:
+            return np.cumsum(deltas, dtype=np.uint16).reshape(shape)
+
+        np.cumsum(deltas, dtype=np.uint16, out=out.reshape(-1))
+        return out
+
+    @staticmethod
+    def is_compressed_depth_image(data: np.ndarray) -> bool:
+        """
+        Determine whether the specified data is a depth image that was compressed using compress_depth_image.
+
+        :param data:    The data, as an array of bytes.
+        :return:        True, if the data is a depth image that was compressed using compress_depth_image,
+                        or False otherwise.
+        """
+        magic_len = len(DepthCompressionUtil.__MAGIC)  # type: int
+        return bytes(data[:magic_len]) == DepthCompressionUtil.__MAGIC
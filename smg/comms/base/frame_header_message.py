@@ -8,7 +8,7 @@ from .message import Message
 
 
 class FrameHeaderMessage(Message):
-    """A message containing the sizes (in bytes) and shapes of the images for a single frame."""
+    """A message containing the sizes (in bytes), shapes and codec IDs of the images for a single frame."""
 
     # CONSTRUCTOR
 
@@ -23,14 +23,21 @@ class FrameHeaderMessage(Message):
         # The image shapes segment consists of a list of tuples [(h_1,w_1,ch_1), ...].
         self.__image_shapes_fmt = "<" + "iii" * max_images  # type: str
 
+        # The image codec IDs segment consists of a list of integers [c_1,...], in which c_i denotes the ID of the
+        # codec used to encode image i (see ImageCodec).
+        self.__image_codec_ids_fmt = "<" + "i" * max_images  # type: str
+
         self.__image_byte_sizes_segment = (
             0, struct.calcsize(self.__image_byte_sizes_fmt)
         )  # type: Tuple[int, int]
         self.__image_shapes_segment = (
             Message._end_of(self.__image_byte_sizes_segment), struct.calcsize(self.__image_shapes_fmt)
         )  # type: Tuple[int, int]
+        self.__image_codec_ids_segment = (
+            Message._end_of(self.__image_shapes_segment), struct.calcsize(self.__image_codec_ids_fmt)
+        )  # type: Tuple[int, int]
 
-        self._data = np.zeros(Message._end_of(self.__image_shapes_segment), dtype=np.uint8)
+        self._data = np.zeros(Message._end_of(self.__image_codec_ids_segment), dtype=np.uint8)
 
     # PUBLIC METHODS
 
@@ -42,6 +49,14 @@ class FrameHeaderMessage(Message):
         """
         return list(struct.unpack_from(self.__image_byte_sizes_fmt, self._data, self.__image_byte_sizes_segment[0]))
 
+    def get_image_codec_ids(self) -> List[int]:
+        """
+        Get the IDs of the codecs used to encode the images.
+
+        :return:    The IDs of the codecs used to encode the images.
+        """
+        return list(struct.unpack_from(self.__image_codec_ids_fmt, self._data, self.__image_codec_ids_segment[0]))
+
     def get_image_shapes(self) -> List[Tuple[int, int, int]]:
         """
         Get the image shapes from the message.
@@ -63,6 +78,16 @@ class FrameHeaderMessage(Message):
             self.__image_byte_sizes_fmt, self._data, self.__image_byte_sizes_segment[0], *image_byte_sizes
         )
 
+    def set_image_codec_ids(self, image_codec_ids: List[int]) -> None:
+        """
+        Copy the IDs of the codecs used to encode the images into the appropriate byte segment in the message.
+
+        :param image_codec_ids: The IDs of the codecs used to encode the images.
+        """
+        struct.pack_into(
+            self.__image_codec_ids_fmt, self._data, self.__image_codec_ids_segment[0], *image_codec_ids
+        )
+
     def set_image_shapes(self, image_shapes: List[Tuple[int, int, int]]) -> None:
         """
         Copy the image shapes into the appropriate byte segment in the message.
@@ -3,6 +3,7 @@ import struct
 
 from typing import List, Optional, Tuple
 
+from .image_codec import ImageCodec
 from .message import Message
 
 
@@ -11,7 +12,8 @@ class FrameMessage(Message):
 
     # CONSTRUCTOR
 
-    def __init__(self, image_shapes: List[Tuple[int, int, int]], image_byte_sizes: List[int]):
+    def __init__(self, image_shapes: List[Tuple[int, int, int]], image_byte_sizes: List[int], *,
+                 image_codec_ids: Optional[List[int]] = None):
         """
         Construct a frame message.
 
@@ -22,14 +24,21 @@ class FrameMessage(Message):
         .. note::
             The image byte sizes refer to the actual storage requirements for the images in the message.
             If compressed images are to be stored, the byte sizes passed in will be the compressed ones.
+        .. note::
+            The image codec IDs denote the codecs (see ImageCodec) that were used to encode the images. Like the
+            image shapes and byte sizes, they are sent across in the frame header message, rather than being stored
+            in the frame message itself. If they are not specified, the codecs used are assumed to be unspecified.
 
         :param image_shapes:        The shapes of the images that will be stored in the frame message.
         :param image_byte_sizes:    The overall byte sizes of the images that will be stored in the frame message.
+        :param image_codec_ids:     The IDs of the codecs used to encode the images (optional).
         """
         super().__init__()
 
         self.__image_shapes = image_shapes  # type: List[Tuple[int, int, int]]
         self.__image_byte_sizes = image_byte_sizes  # type: List[int]
+        self.__image_codec_ids = image_codec_ids if image_codec_ids is not None \
+            else [ImageCodec.UNSPECIFIED] * len(image_shapes)  # type: List[int]
 
         # The frame index segment consists of a single integer denoting the frame index.
         self.__frame_index_fmt = "<i"  # type: str
@@ -54,7 +63,28 @@ class FrameMessage(Message):
             Message._end_of(self.__poses_segment), sum(self.__image_byte_sizes)
         )  # type: Tuple[int, int]
 
-        self._data = np.zeros(Message._end_of(self.__images_segment), dtype=np.uint8)
+        self._data = self._make_data(Message._end_of(self.__images_segment))
+
+    # PUBLIC STATIC METHODS
+
+    @staticmethod
+    def make_pose_only(msg: "FrameMessage") -> "FrameMessage":
+        """
+        Make a pose-only update that contains the frame index, frame timestamp and poses from a frame message.
+
+        :param msg: The frame message.
+        :return:    The pose-only update.
+        """
+        image_count = len(msg.get_image_shapes())  # type: int
+        pose_only_msg = FrameMessage(
+            msg.get_image_shapes(), [0] * image_count, image_codec_ids=[ImageCodec.OMITTED] * image_count
+        )  # type: FrameMessage
+        pose_only_msg.set_frame_index(msg.get_frame_index())
+        pose_only_msg.set_frame_timestamp(msg.get_frame_timestamp())
+        for i in range(image_count):
+            pose_only_msg.set_pose(i, msg.get_pose(i))
+
+        return pose_only_msg
 
     # PUBLIC METHODS
 
@@ -88,6 +118,14 @@ class FrameMessage(Message):
         """
         return self.__image_byte_sizes
 
+    def get_image_codec_ids(self) -> List[int]:
+        """
+        Get the IDs of the codecs used to encode the images.
+
+        :return:    The IDs of the codecs used to encode the images.
+        """
+        return self.__image_codec_ids
+
     def get_image_data(self, image_idx: int) -> np.ndarray:
         """
         Get the data for the specified image.
@@ -118,6 +156,14 @@ class FrameMessage(Message):
         """
         return self.__get_pose_data(image_idx).view(np.float32).reshape((4, 4))
 
+    def is_pose_only(self) -> bool:
+        """
+        Get whether the message is a pose-only update, i.e. whether all of its images have been omitted.
+
+        :return:    True, if the message is a pose-only update, or False otherwise.
+        """
+        return all(codec_id == ImageCodec.OMITTED for codec_id in self.__image_codec_ids)
+
     def set_frame_index(self, frame_index: int) -> None:
         """
         Copy a frame index into the appropriate byte segment in the message.
@@ -143,6 +189,14 @@ class FrameMessage(Message):
             frame_timestamp if frame_timestamp is not None else -1.0
         )
 
+    def set_image_codec_ids(self, image_codec_ids: List[int]) -> None:
+        """
+        Set the IDs of the codecs used to encode the images.
+
+        :param image_codec_ids: The IDs of the codecs used to encode the images.
+        """
+        self.__image_codec_ids = image_codec_ids
+
     def set_image_data(self, image_idx: int, image_data: np.ndarray) -> None:
         """
         Copy the data for the specified image into the appropriate byte segment in the message.
@@ -161,6 +215,35 @@ class FrameMessage(Message):
         """
         np.copyto(self.__get_pose_data(image_idx), pose.astype(np.float32).reshape(-1).view(np.uint8))
 
+    def swap_data(self, msg: "FrameMessage") -> None:
+        """
+        Swap the data of this message with that of another frame message that has the same layout.
+
+        .. note::
+            This allows the contents of a frame message to be moved into another message without copying them
+            (e.g. so that a message from a pool can be returned to the pool without losing the frame it contains).
+
+        :param msg: The other frame message.
+        """
+        if msg.get_image_shapes() != self.__image_shapes or msg.get_image_byte_sizes() != self.__image_byte_sizes:
+            raise RuntimeError("Error: Cannot swap the data of frame messages with different layouts")
+
+        self._data, msg._data = msg._data, self._data
+
+    # PROTECTED METHODS
+
+    def _make_data(self, size: int) -> np.ndarray:
+        """
+        Make the buffer in which to store the message data.
+
+        .. note::
+            This can be overridden by derived classes that need to store the data somewhere specific.
+
+        :param size:    The size of the buffer (in bytes).
+        :return:        The buffer.
+        """
+        return np.zeros(size, dtype=np.uint8)
+
     # PRIVATE METHODS
 
     def __get_pose_data(self, image_idx: int) -> np.ndarray:
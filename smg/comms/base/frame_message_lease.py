@@ -0,0 +1,77 @@
+import threading
+
+from typing import Callable, Optional
+
+from .frame_message import FrameMessage
+
+
+class FrameMessageLease:
+    """
+    A lease on a frame message, granting temporary, exclusive use of it without the need to copy its contents.
+
+    .. note::
+        Whilst the lease is held, the message will not be modified or reused by its owner. Once the lease has been
+        released (either explicitly, by calling release, or at the end of a with statement), the owner is free to
+        reuse the message, so neither it nor any views into its data (e.g. those returned by
+        RGBDFrameMessageUtil.extract_frame_data with copy=False) should be used any longer.
+    """
+
+    # CONSTRUCTOR
+
+    def __init__(self, msg: FrameMessage, release_callback: Callable[[FrameMessage], None]):
+        """
+        Construct a frame message lease.
+
+        :param msg:                 The leased frame message.
+        :param release_callback:    The function to call (with the message) to return the message to its owner.
+        """
+        self.__lock = threading.Lock()              # type: threading.Lock
+        self.__msg = msg                            # type: Optional[FrameMessage]
+        self.__release_callback = release_callback  # type: Callable[[FrameMessage], None]
+
+    # DESTRUCTOR
+
+    def __del__(self):
+        """Destroy the lease, releasing it if that hasn't already been done."""
+        self.release()
+
+    # SPECIAL METHODS
+
+    def __enter__(self):
+        """No-op (needed to allow the lease's lifetime to be managed by a with statement)."""
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Release the lease at the end of the with statement that's used to manage its lifetime."""
+        self.release()
+
+    # PUBLIC METHODS
+
+    def get_frame_message(self) -> FrameMessage:
+        """
+        Get the leased frame message.
+
+        :return:    The leased frame message.
+        """
+        with self.__lock:
+            if self.__msg is None:
+                raise RuntimeError("Error: Cannot access a frame message whose lease has been released")
+            return self.__msg
+
+    def is_released(self) -> bool:
+        """
+        Get whether the lease has been released.
+
+        :return:    True, if the lease has been released, or False otherwise.
+        """
+        with self.__lock:
+            return self.__msg is None
+
+    def release(self) -> None:
+        """Release the lease, returning the frame message to its owner (this has no effect if already released)."""
+        with self.__lock:
+            msg = self.__msg  # type: Optional[FrameMessage]
+            self.__msg = None
+
+        if msg is not None:
+            self.__release_callback(msg)
@@ -0,0 +1,114 @@
+import numpy as np
+
+from abc import ABC, abstractmethod
+from typing import Tuple
+
+
+class ImageCodec(ABC):
+    """An image codec, used to compress the individual images in a frame message prior to transmission."""
+
+    # CONSTANTS
+
+    # The IDs of the different types of image codec (these are written into frame header messages, so that the
+    # receiver of a frame can determine how to decode each image, and must therefore remain stable).
+    UNSPECIFIED = 0    # type: int
+    RAW = 1            # type: int
+    JPEG = 2           # type: int
+    PNG = 3            # type: int
+    WEBP = 4           # type: int
+    DELTA_DEPTH = 5    # type: int
+    TILE_DELTA = 6     # type: int
+    DEDUPLICATING = 7  # type: int
+    YUV420 = 8         # type: int
+
+    # The ID used to denote an image that has been omitted from a frame message altogether (e.g. because only the
+    # poses in the frame message are of interest). This does not correspond to any codec.
+    OMITTED = 255      # type: int
+
+    # PUBLIC ABSTRACT METHODS
+
+    @abstractmethod
+    def decode(self, data: np.ndarray, shape: Tuple[int, int, int]) -> np.ndarray:
+        """
+        Decode an image that was encoded using this type of codec.
+
+        .. note::
+            The decoded image will always have the same bytes as the original image, but its dtype and shape
+            may not be preserved (e.g. the raw codec simply returns the bytes themselves).
+
+        :param data:    The encoded image, as an array of bytes.
+        :param shape:   The shape of the image, as a (height, width, channels) tuple.
+        :return:        The decoded image.
+        """
+        pass
+
+    @abstractmethod
+    def encode(self, image: np.ndarray) -> np.ndarray:
+        """
+        Encode an image.
+
+        :param image:   The image.
+        :return:        The encoded image, as an array of bytes.
+        """
+        pass
+
+    @abstractmethod
+    def get_codec_id(self) -> int:
+        """
+        Get the ID of the type of codec this is.
+
+        :return:    The ID of the type of codec this is.
+        """
+        pass
+
+    # PUBLIC METHODS
+
+    def is_stateful(self) -> bool:
+        """
+        Get whether this is a stateful codec, i.e. one that encodes each image relative to previous ones.
+
+        .. note::
+            The images in a stream that was encoded by a stateful codec must all be decoded, in order, by a decoder
+            that is dedicated to that stream (see make_decoder).
+
+        :return:    True, if this is a stateful codec, or False otherwise.
+        """
+        return False
+
+    def make_decoder(self) -> "ImageCodec":
+        """
+        Make a codec that can be used to decode a single stream of images encoded by codecs of this type.
+
+        .. note::
+            Stateless codecs can decode any number of streams, so by default, this simply returns the codec itself.
+
+        :return:    The codec to use to decode the stream.
+        """
+        return self
+
+    # PROTECTED STATIC METHODS
+
+    @staticmethod
+    def _check_decoded(image: np.ndarray) -> np.ndarray:
+        """
+        Check that an image has been successfully decoded by OpenCV.
+
+        :param image:   The result of decoding the image (None if decoding failed).
+        :return:        The decoded image.
+        """
+        if image is None:
+            raise RuntimeError("Error: Could not decode image")
+        return image
+
+    @staticmethod
+    def _check_encoded(result: Tuple[bool, np.ndarray]) -> np.ndarray:
+        """
+        Check that an image has been successfully encoded by OpenCV.
+
+        :param result:  The result of encoding the image, as returned by cv2.imencode.
+        :return:        The encoded image, as an array of bytes.
+        """
+        ok, data = result
+        if not ok:
+            raise RuntimeError("Error: Could not encode image")
+        return data.reshape(-1)
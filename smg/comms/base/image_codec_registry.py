@@ -0,0 +1,201 @@
+import numpy as np
+import threading
+
+from typing import Dict, List, Optional, Tuple
+
+from .deduplicating_image_codec import DeduplicatingImageCodec
+from .delta_depth_image_codec import DeltaDepthImageCodec
+from .frame_message import FrameMessage
+from .image_codec import ImageCodec
+from .jpeg_image_codec import JPEGImageCodec
+from .png_image_codec import PNGImageCodec
+from .raw_image_codec import RawImageCodec
+from .scaled_image_codec import ScaledImageCodec
+from .tile_delta_image_codec import TileDeltaImageCodec
+from .webp_image_codec import WebPImageCodec
+from .yuv420_image_codec import YUV420ImageCodec
+
+
+class ImageCodecRegistry:
+    """
+    A registry of the image codecs that can be used to decode the images in received frame messages.
+
+    .. note::
+        Each image in a frame message can be encoded using a different codec, whose ID is sent across in the
+        frame header message. The receiver of a frame then looks up the codec for each image in this registry.
+        This allows the sender to switch codecs whenever it likes, without the receiver needing to know about it.
+    """
+
+    # PRIVATE STATIC VARIABLES
+
+    # The codecs used to decode images, indexed by codec ID. Note that decoding doesn't depend on any parameters
+    # (e.g. the quality) that were used to encode an image, so a single codec of each type suffices.
+    __codecs = {
+        codec.get_codec_id(): codec for codec in [
+            DeduplicatingImageCodec(), DeltaDepthImageCodec(), JPEGImageCodec(), PNGImageCodec(), RawImageCodec(),
+            TileDeltaImageCodec(), WebPImageCodec(), YUV420ImageCodec()
+        ]
+    }  # type: Dict[int, ImageCodec]
+
+    __lock = threading.Lock()  # type: threading.Lock
+
+    # PUBLIC STATIC METHODS
+
+    @staticmethod
+    def can_decode(msg: FrameMessage) -> bool:
+        """
+        Determine whether all of the images in the specified frame message were encoded by registered codecs.
+
+        .. note::
+            Frame messages that were compressed without using codecs (e.g. by a custom frame compressor) have
+            unspecified codec IDs, and must instead be decompressed by a matching frame decompressor.
+
+        :param msg: The frame message.
+        :return:    True, if all of the images in the frame message were encoded by registered codecs,
+                    or False otherwise.
+        """
+        with ImageCodecRegistry.__lock:
+            return all(codec_id in ImageCodecRegistry.__codecs for codec_id in msg.get_image_codec_ids())
+
+    @staticmethod
+    def decode_frame_message(msg: FrameMessage, *,
+                             stream_decoders: Optional[Dict[int, ImageCodec]] = None) -> FrameMessage:
+        """
+        Decode a frame message whose images were encoded by registered codecs.
+
+        .. note::
+            This can be used as a frame decompressor.
+        .. note::
+            If any of the images were encoded by stateful codecs, a dictionary in which to store the decoders for
+            the stream of images with each index must be provided. The same dictionary must then be used to decode
+            all subsequent frame messages in the stream, in order.
+
+        :param msg:             The frame message to decode.
+        :param stream_decoders: A dictionary in which to store the decoders for the images encoded by stateful codecs.
+        :return:                The decoded frame message.
+        """
+        images = ImageCodecRegistry.__decode_images(msg, stream_decoders)  # type: List[np.ndarray]
+        decoded_msg = FrameMessage(msg.get_image_shapes(), [image.nbytes for image in images])
+        ImageCodecRegistry.__fill_frame_message(msg, images, decoded_msg)
+        return decoded_msg
+
+    @staticmethod
+    def decode_frame_message_into(msg: FrameMessage, decoded_msg: FrameMessage, *,
+                                  stream_decoders: Optional[Dict[int, ImageCodec]] = None) -> None:
+        """
+        Decode a frame message whose images were encoded by registered codecs into an existing frame message.
+
+        .. note::
+            This can be used as a frame decoder.
+        .. note::
+            See decode_frame_message for the meaning of stream_decoders.
+
+        :param msg:             The frame message to decode.
+        :param decoded_msg:     The message into which to write the decoded frame.
+        :param stream_decoders: A dictionary in which to store the decoders for the images encoded by stateful codecs.
+        """
+        ImageCodecRegistry.__fill_frame_message(
+            msg, ImageCodecRegistry.__decode_images(msg, stream_decoders), decoded_msg
+        )
+
+    @staticmethod
+    def get_codec(codec_id: int) -> ImageCodec:
+        """
+        Get the registered codec with the specified ID.
+
+        :param codec_id:    The codec ID.
+        :return:            The registered codec with the specified ID.
+        """
+        with ImageCodecRegistry.__lock:
+            codec = ImageCodecRegistry.__codecs.get(codec_id)  # type: ImageCodec
+            if codec is None:
+                raise RuntimeError("Error: Unknown image codec {}".format(codec_id))
+            return codec
+
+    @staticmethod
+    def is_stateful(msg: FrameMessage) -> bool:
+        """
+        Determine whether any of the images in the specified frame message were encoded by stateful codecs.
+
+        .. note::
+            Frame messages containing such images must be decoded in order, without skipping any of them.
+
+        :param msg: The frame message.
+        :return:    True, if any of the images in the frame message were encoded by stateful codecs,
+                    or False otherwise.
+        """
+        with ImageCodecRegistry.__lock:
+            return any(
+                codec_id in ImageCodecRegistry.__codecs and ImageCodecRegistry.__codecs[codec_id].is_stateful()
+                for codec_id in msg.get_image_codec_ids()
+            )
+
+    @staticmethod
+    def register_codec(codec: ImageCodec) -> None:
+        """
+        Register a codec, so that images that were encoded using codecs of its type can be decoded.
+
+        .. note::
+            This replaces any codec that was previously registered with the same ID. Since codec IDs are sent
+            across the network, custom codecs should be registered on both the sender and the receiver, using
+            IDs that do not clash with those of the built-in codecs (see ImageCodec). They must also be registered
+            in any worker processes that are used for decompression.
+
+        :param codec:   The codec.
+        """
+        with ImageCodecRegistry.__lock:
+            ImageCodecRegistry.__codecs[codec.get_codec_id()] = codec
+
+    # PRIVATE STATIC METHODS
+
+    @staticmethod
+    def __decode_images(msg: FrameMessage, stream_decoders: Optional[Dict[int, ImageCodec]]) -> List[np.ndarray]:
+        """
+        Decode the images in a frame message whose images were encoded by registered codecs.
+
+        .. note::
+            Any images that were downscaled before being encoded (see ScaledImageCodec) are upscaled to their
+            original sizes.
+
+        :param msg:             The frame message.
+        :param stream_decoders: A dictionary in which to store the decoders for the images encoded by stateful codecs.
+        :return:                The decoded images.
+        """
+        images = []  # type: List[np.ndarray]
+        for i, codec_id in enumerate(msg.get_image_codec_ids()):
+            codec = ImageCodecRegistry.get_codec(codec_id)  # type: ImageCodec
+
+            # If the image was encoded by a stateful codec, decode it using the decoder for the stream of images
+            # with this index (making a new decoder if the stream has only just started to use the codec).
+            if codec.is_stateful():
+                if stream_decoders is None:
+                    raise RuntimeError("Error: Cannot decode images encoded by stateful codecs without stream state")
+
+                decoder = stream_decoders.get(i)  # type: Optional[ImageCodec]
+                if decoder is None or decoder.get_codec_id() != codec_id:
+                    decoder = stream_decoders[i] = codec.make_decoder()
+
+                codec = decoder
+
+            shape = msg.get_image_shapes()[i]                     # type: Tuple[int, int, int]
+            image = codec.decode(msg.get_image_data(i), shape)  # type: np.ndarray
+            images.append(ScaledImageCodec.upscale_to_shape(image, shape))
+
+        return images
+
+    @staticmethod
+    def __fill_frame_message(msg: FrameMessage, images: List[np.ndarray], decoded_msg: FrameMessage) -> None:
+        """
+        Fill a frame message with the contents of a frame message whose images have just been decoded.
+
+        :param msg:         The frame message whose images have just been decoded.
+        :param images:      The decoded images.
+        :param decoded_msg: The frame message to fill.
+        """
+        decoded_msg.set_frame_index(msg.get_frame_index())
+        decoded_msg.set_frame_timestamp(msg.get_frame_timestamp())
+        for i, image in enumerate(images):
+            # Note: The image is copied straight into the message, even if it isn't contiguous (e.g. a view onto a
+            #       padded image), rather than first being made contiguous, which would copy it twice.
+            np.copyto(decoded_msg.get_image_data(i).view(image.dtype).reshape(image.shape), image)
+            decoded_msg.set_pose(i, msg.get_pose(i))
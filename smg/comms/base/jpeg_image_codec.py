@@ -0,0 +1,49 @@
+import cv2
+import numpy as np
+
+from typing import Tuple
+
+from .image_codec import ImageCodec
+
+
+class JPEGImageCodec(ImageCodec):
+    """An image codec that compresses (8-bit) images as JPEGs."""
+
+    # CONSTRUCTOR
+
+    def __init__(self, quality: int = 90):
+        """
+        Construct a JPEG image codec.
+
+        :param quality: The JPEG quality to use when encoding images (0-100).
+        """
+        self.__quality = quality  # type: int
+
+    # PUBLIC METHODS
+
+    def decode(self, data: np.ndarray, shape: Tuple[int, int, int]) -> np.ndarray:
+        """
+        Decode an image that was encoded using this type of codec.
+
+        :param data:    The encoded image, as an array of bytes.
+        :param shape:   The shape of the image, as a (height, width, channels) tuple.
+        :return:        The decoded image.
+        """
+        return ImageCodec._check_decoded(cv2.imdecode(data, cv2.IMREAD_UNCHANGED))
+
+    def encode(self, image: np.ndarray) -> np.ndarray:
+        """
+        Encode an image.
+
+        :param image:   The image.
+        :return:        The encoded image, as an array of bytes.
+        """
+        return ImageCodec._check_encoded(cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, self.__quality]))
+
+    def get_codec_id(self) -> int:
+        """
+        Get the ID of the type of codec this is.
+
+        :return:    The ID of the type of codec this is.
+        """
+        return ImageCodec.JPEG
@@ -0,0 +1,50 @@
+import cv2
+import numpy as np
+
+from typing import Tuple
+
+from .image_codec import ImageCodec
+
+
+class PNGImageCodec(ImageCodec):
+    """An image codec that (losslessly) compresses 8-bit or 16-bit images as PNGs."""
+
+    # CONSTRUCTOR
+
+    def __init__(self, level: int = 1):
+        """
+        Construct a PNG image codec.
+
+        :param level:   The PNG compression level to use when encoding images (0-9, where higher levels
+                        compress better, but are slower).
+        """
+        self.__level = level  # type: int
+
+    # PUBLIC METHODS
+
+    def decode(self, data: np.ndarray, shape: Tuple[int, int, int]) -> np.ndarray:
+        """
+        Decode an image that was encoded using this type of codec.
+
+        :param data:    The encoded image, as an array of bytes.
+        :param shape:   The shape of the image, as a (height, width, channels) tuple.
+        :return:        The decoded image.
+        """
+        return ImageCodec._check_decoded(cv2.imdecode(data, cv2.IMREAD_UNCHANGED))
+
+    def encode(self, image: np.ndarray) -> np.ndarray:
+        """
+        Encode an image.
+
+        :param image:   The image.
+        :return:        The encoded image, as an array of bytes.
+        """
+        return ImageCodec._check_encoded(cv2.imencode(".png", image, [cv2.IMWRITE_PNG_COMPRESSION, self.__level]))
+
+    def get_codec_id(self) -> int:
+        """
+        Get the ID of the type of codec this is.
+
+        :return:    The ID of the type of codec this is.
+        """
+        return ImageCodec.PNG
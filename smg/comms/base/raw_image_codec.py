@@ -0,0 +1,38 @@
+import numpy as np
+
+from typing import Tuple
+
+from .image_codec import ImageCodec
+
+
+class RawImageCodec(ImageCodec):
+    """An image codec that stores images uncompressed."""
+
+    # PUBLIC METHODS
+
+    def decode(self, data: np.ndarray, shape: Tuple[int, int, int]) -> np.ndarray:
+        """
+        Decode an image that was encoded using this type of codec.
+
+        :param data:    The encoded image, as an array of bytes.
+        :param shape:   The shape of the image, as a (height, width, channels) tuple.
+        :return:        The decoded image (as an array of bytes).
+        """
+        return data
+
+    def encode(self, image: np.ndarray) -> np.ndarray:
+        """
+        Encode an image.
+
+        :param image:   The image.
+        :return:        The encoded image, as an array of bytes.
+        """
+        return np.ascontiguousarray(image).reshape(-1).view(np.uint8)
+
+    def get_codec_id(self) -> int:
+        """
+        Get the ID of the type of codec this is.
+
+        :return:    The ID of the type of codec this is.
+        """
+        return ImageCodec.RAW
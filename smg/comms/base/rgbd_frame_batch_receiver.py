@@ -0,0 +1,97 @@
+import numpy as np
+
+from typing import List, Optional, Tuple
+
+from smg.utility import ImageUtil
+
+from .frame_message import FrameMessage
+
+
+class RGBDFrameBatchReceiver:
+    """
+    A receiver of batches of RGB-D frames, used to extract them from frame messages and store them for later use.
+
+    .. note::
+        The frames in each batch are stacked into arrays (e.g. the depth images are stored as a single array
+        with shape (N, H, W)), so that they can be processed together, e.g. by a batched fusion stage.
+    """
+
+    # CONSTRUCTOR
+
+    def __init__(self):
+        """Construct an RGB-D frame batch receiver."""
+        self.__depth_images = None    # type: Optional[np.ndarray]
+        self.__frame_indices = []     # type: List[int]
+        self.__frame_timestamps = []  # type: List[Optional[float]]
+        self.__poses = None           # type: Optional[np.ndarray]
+        self.__rgb_images = None      # type: Optional[np.ndarray]
+
+    # SPECIAL METHODS
+
+    def __call__(self, msgs: List[FrameMessage]) -> None:
+        """
+        Apply the receiver to a batch of frame messages.
+
+        .. note::
+            This extracts the RGB-D frames from the frame messages and stores them in the receiver.
+
+        :param msgs:    The frame messages.
+        """
+        rgb_shape = msgs[0].get_image_shapes()[0]        # type: Tuple[int, int, int]
+        depth_shape = msgs[0].get_image_shapes()[1][:2]  # type: Tuple[int, int]
+
+        self.__frame_indices = [msg.get_frame_index() for msg in msgs]
+        self.__frame_timestamps = [msg.get_frame_timestamp() for msg in msgs]
+
+        # Note: Stacking the images and poses copies them, which is essential, since the messages may change
+        #       once the receiver returns (see MappingClientHandler.get_frames).
+        self.__rgb_images = np.stack([msg.get_image_data(0).reshape(rgb_shape) for msg in msgs])
+        self.__depth_images = ImageUtil.from_short_depth(
+            np.stack([msg.get_image_data(1).view(np.uint16).reshape(depth_shape) for msg in msgs])
+        )
+        self.__poses = np.stack([msg.get_pose(0) for msg in msgs])
+
+    # PUBLIC METHODS
+
+    def get_depth_images(self) -> np.ndarray:
+        """
+        Get the depth images of the RGB-D frames in the batch.
+
+        :return:    The depth images of the RGB-D frames in the batch, as an array with shape (N, H, W).
+        """
+        return self.__depth_images
+
+    def get_frame_indices(self) -> List[int]:
+        """
+        Get the indices of the RGB-D frames in the batch.
+
+        :return:    The indices of the RGB-D frames in the batch.
+        """
+        return self.__frame_indices
+
+    def get_frame_timestamps(self) -> List[Optional[float]]:
+        """
+        Get the timestamps of the RGB-D frames in the batch.
+
+        .. note::
+            If a timestamp wasn't provided when a frame was sent, its timestamp will be None.
+
+        :return:    The timestamps of the RGB-D frames in the batch.
+        """
+        return self.__frame_timestamps
+
+    def get_poses(self) -> np.ndarray:
+        """
+        Get the poses of the RGB-D frames in the batch.
+
+        :return:    The poses of the RGB-D frames in the batch, as an array with shape (N, 4, 4).
+        """
+        return self.__poses
+
+    def get_rgb_images(self) -> np.ndarray:
+        """
+        Get the colour images of the RGB-D frames in the batch.
+
+        :return:    The colour images of the RGB-D frames in the batch, as an array with shape (N, H, W, 3).
+        """
+        return self.__rgb_images
@@ -0,0 +1,98 @@
+import numpy as np
+
+from typing import List, Optional, Tuple
+
+from .frame_message import FrameMessage
+from .image_codec import ImageCodec
+from .jpeg_image_codec import JPEGImageCodec
+from .png_image_codec import PNGImageCodec
+
+
+class RGBDFrameCompressor:
+    """A compressor of RGB-D frame messages, which encodes the RGB and depth images using specified codecs."""
+
+    # CONSTRUCTOR
+
+    def __init__(self, rgb_codec: Optional[ImageCodec] = None, depth_codec: Optional[ImageCodec] = None):
+        """
+        Construct an RGB-D frame compressor.
+
+        .. note::
+            The compressed frame messages record the IDs of the codecs used to encode their images, so they can be
+            decoded by any receiver using ImageCodecRegistry, without it needing to know which codecs were used.
+            This makes it possible to switch codecs (see set_codecs) at any point, even mid-stream.
+
+        :param rgb_codec:   The codec to use for the RGB images (defaults to a JPEG codec).
+        :param depth_codec: The codec to use for the depth images (defaults to a PNG codec).
+        """
+        self.__codecs = (
+            rgb_codec if rgb_codec is not None else JPEGImageCodec(),
+            depth_codec if depth_codec is not None else PNGImageCodec()
+        )  # type: Tuple[ImageCodec, ImageCodec]
+
+    # SPECIAL METHODS
+
+    def __call__(self, msg: FrameMessage) -> FrameMessage:
+        """
+        Compress an uncompressed RGB-D frame message.
+
+        :param msg: The message to compress.
+        :return:    The compressed message.
+        """
+        # Note: The codecs are read in one go, so that they're consistent even if set_codecs is called concurrently.
+        rgb_codec, depth_codec = self.__codecs
+
+        # Encode the RGB and depth images.
+        image_shapes = msg.get_image_shapes()  # type: List[Tuple[int, int, int]]
+        rgb_image = msg.get_image_data(0).reshape(image_shapes[0])                         # type: np.ndarray
+        depth_image = msg.get_image_data(1).view(np.uint16).reshape(image_shapes[1][:2])  # type: np.ndarray
+        compressed_rgb_image = rgb_codec.encode(rgb_image)                                 # type: np.ndarray
+        compressed_depth_image = depth_codec.encode(depth_image)                           # type: np.ndarray
+
+        # Construct and return the compressed message.
+        compressed_msg = FrameMessage(
+            image_shapes, [len(compressed_rgb_image), len(compressed_depth_image)],
+            image_codec_ids=[rgb_codec.get_codec_id(), depth_codec.get_codec_id()]
+        )  # type: FrameMessage
+        compressed_msg.set_frame_index(msg.get_frame_index())
+        compressed_msg.set_frame_timestamp(msg.get_frame_timestamp())
+        compressed_msg.set_image_data(0, compressed_rgb_image)
+        compressed_msg.set_pose(0, msg.get_pose(0))
+        compressed_msg.set_image_data(1, compressed_depth_image)
+        compressed_msg.set_pose(1, msg.get_pose(1))
+
+        return compressed_msg
+
+    # PUBLIC METHODS
+
+    def get_codecs(self) -> Tuple[ImageCodec, ImageCodec]:
+        """
+        Get the codecs currently being used for the RGB and depth images.
+
+        :return:    A tuple consisting of the codec for the RGB images and the codec for the depth images.
+        """
+        return self.__codecs
+
+    def is_stateful(self) -> bool:
+        """
+        Get whether either of the codecs currently being used is stateful.
+
+        .. note::
+            If so, the frames must be compressed one at a time, in the order in which they will be decoded.
+
+        :return:    True, if either of the codecs currently being used is stateful, or False otherwise.
+        """
+        return any(codec.is_stateful() for codec in self.__codecs)
+
+    def set_codecs(self, rgb_codec: ImageCodec, depth_codec: ImageCodec) -> None:
+        """
+        Set the codecs to use for the RGB and depth images.
+
+        .. note::
+            This can safely be called whilst frames are being compressed on other threads. The new codecs will
+            be used for all frames whose compression starts after the call.
+
+        :param rgb_codec:   The codec to use for the RGB images.
+        :param depth_codec: The codec to use for the depth images.
+        """
+        self.__codecs = (rgb_codec, depth_codec)
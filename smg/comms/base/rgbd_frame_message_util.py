@@ -1,45 +1,58 @@
 import cv2
 import numpy as np
+import os
 import struct
+import threading
 
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import List, Optional, Tuple
 
 from .calibration_message import CalibrationMessage
+from .depth_compression_util import DepthCompressionUtil
 from .frame_message import FrameMessage
 
 
 class RGBDFrameMessageUtil:
     """Utility functions related to RGB-D frame messages."""
 
+    # PRIVATE STATIC VARIABLES
+
+    # The thread pool used by the parallel variants of the compression and decompression functions (created on demand).
+    __thread_pool = None                   # type: Optional[ThreadPoolExecutor]
+    __thread_pool_lock = threading.Lock()  # type: threading.Lock
+
     # PUBLIC STATIC METHODS
 
     @staticmethod
-    def compress_frame_message(msg: FrameMessage) -> FrameMessage:
+    def compress_frame_message(msg: FrameMessage, *, depth_codec: str = "png") -> FrameMessage:
         """
         Compress an uncompressed RGB-D frame message.
 
-        :param msg: The message to compress.
-        :return:    The compressed message.
+        .. note::
+            The RGB image is always compressed as a JPEG. The depth image is compressed as a PNG by default, but
+            can instead be compressed using DepthCompressionUtil (by specifying "delta" as the depth codec),
+            which is faster. The decompression functions detect which codec was used automatically.
+
+        :param msg:         The message to compress.
+        :param depth_codec: The codec to use to compress the depth image ("png" or "delta").
+        :return:            The compressed message.
         """
-        # Extract the relevant data from the uncompressed frame message.
-        frame_idx, frame_timestamp, rgb_image, depth_image, pose = RGBDFrameMessageUtil.extract_frame_data(msg)
+        return RGBDFrameMessageUtil.__compress_frame_message(msg, depth_codec=depth_codec, parallel=False)
 
-        # Compress the RGB and depth images.
-        compressed_rgb_image = cv2.imencode(".jpg", rgb_image, [cv2.IMWRITE_JPEG_QUALITY, 90])[1]  # type: np.ndarray
-        compressed_depth_image = cv2.imencode(".png", depth_image)[1]                              # type: np.ndarray
+    @staticmethod
+    def compress_frame_message_parallel(msg: FrameMessage, *, depth_codec: str = "png") -> FrameMessage:
+        """
+        Compress an uncompressed RGB-D frame message, compressing the RGB and depth images in parallel.
 
-        # Construct and return the compressed message.
-        compressed_msg = FrameMessage(
-            msg.get_image_shapes(), [len(compressed_rgb_image), len(compressed_depth_image)]
-        )
-        compressed_msg.set_frame_index(frame_idx)
-        compressed_msg.set_frame_timestamp(frame_timestamp)
-        compressed_msg.set_image_data(0, compressed_rgb_image.flatten())
-        compressed_msg.set_pose(0, pose)
-        compressed_msg.set_image_data(1, compressed_depth_image.flatten())
-        compressed_msg.set_pose(1, pose)
+        .. note::
+            This produces exactly the same output as compress_frame_message, so the result can be decompressed
+            using either decompress_frame_message or decompress_frame_message_parallel.
 
-        return compressed_msg
+        :param msg:         The message to compress.
+        :param depth_codec: The codec to use to compress the depth image ("png" or "delta").
+        :return:            The compressed message.
+        """
+        return RGBDFrameMessageUtil.__compress_frame_message(msg, depth_codec=depth_codec, parallel=True)
 
     @staticmethod
     def decompress_frame_message(msg: FrameMessage) -> FrameMessage:
@@ -49,36 +62,58 @@ class RGBDFrameMessageUtil:
         :param msg: The message to decompress.
         :return:    The decompressed message.
         """
-        # Extract the relevant data from the compressed frame message.
-        frame_idx = msg.get_frame_index()               # type: int
-        frame_timestamp = msg.get_frame_timestamp()     # type: Optional[float]
-        compressed_rgb_image = msg.get_image_data(0)    # type: np.ndarray
-        compressed_depth_image = msg.get_image_data(1)  # type: np.ndarray
-        pose = msg.get_pose(0)                          # type: np.ndarray
+        return RGBDFrameMessageUtil.__decompress_frame_message(msg, parallel=False)
 
-        # Uncompress the RGB and depth images.
-        rgb_image = cv2.imdecode(compressed_rgb_image, cv2.IMREAD_COLOR)                           # type: np.ndarray
-        depth_image = cv2.imdecode(compressed_depth_image, cv2.IMREAD_ANYDEPTH).astype(np.uint16)  # type: np.ndarray
+    @staticmethod
+    def decompress_frame_message_parallel(msg: FrameMessage) -> FrameMessage:
+        """
+        Decompress a compressed RGB-D frame message, decompressing the RGB and depth images in parallel.
 
-        # Construct and return the decompressed message.
-        decompressed_msg = FrameMessage(
-            msg.get_image_shapes(),
-            [rgb_image.nbytes, depth_image.nbytes]
-        )
-        RGBDFrameMessageUtil.fill_frame_message(
-            frame_idx, rgb_image, depth_image, pose, decompressed_msg, frame_timestamp=frame_timestamp
-        )
+        :param msg: The message to decompress.
+        :return:    The decompressed message.
+        """
+        return RGBDFrameMessageUtil.__decompress_frame_message(msg, parallel=True)
 
-        return decompressed_msg
+    @staticmethod
+    def decompress_frame_message_into(msg: FrameMessage, decompressed_msg: FrameMessage) -> None:
+        """
+        Decompress a compressed RGB-D frame message into an existing uncompressed RGB-D frame message.
+
+        .. note::
+            This avoids the need to allocate a new message for each frame that is decompressed (e.g. it makes it
+            possible to decompress frames directly into messages that have been obtained from a pool).
+
+        :param msg:                 The message to decompress.
+        :param decompressed_msg:    The message into which to write the decompressed frame.
+        """
+        RGBDFrameMessageUtil.__decompress_frame_message_into(msg, decompressed_msg, parallel=False)
+
+    @staticmethod
+    def decompress_frame_message_into_parallel(msg: FrameMessage, decompressed_msg: FrameMessage) -> None:
+        """
+        Decompress a compressed RGB-D frame message into an existing uncompressed RGB-D frame message,
+        decompressing the RGB and depth images in parallel.
+
+        :param msg:                 The message to decompress.
+        :param decompressed_msg:    The message into which to write the decompressed frame.
+        """
+        RGBDFrameMessageUtil.__decompress_frame_message_into(msg, decompressed_msg, parallel=True)
 
     @staticmethod
-    def extract_frame_data(msg: FrameMessage) -> Tuple[int, Optional[float], np.ndarray, np.ndarray, np.ndarray]:
+    def extract_frame_data(msg: FrameMessage, *,
+                           copy: bool = True) -> Tuple[int, Optional[float], np.ndarray, np.ndarray, np.ndarray]:
         """
         Extract the relevant data from an uncompressed RGB-D frame message.
 
-        :param msg: The uncompressed RGB-D frame message.
-        :return:    A tuple consisting of the frame index, the frame timestamp, the RGB image, the depth image
-                    and the pose.
+        .. note::
+            If copy is False, the RGB image, depth image and pose are returned as read-only views into the message
+            rather than as copies. This is only safe if the message will remain unchanged for as long as the views
+            are in use, e.g. if it's been leased from a mapping server (see MappingServer.lease_frame).
+
+        :param msg:     The uncompressed RGB-D frame message.
+        :param copy:    Whether to return copies of the images and pose (rather than read-only views).
+        :return:        A tuple consisting of the frame index, the frame timestamp, the RGB image, the depth image
+                        and the pose.
         """
         frame_idx = msg.get_frame_index()  # type: int
         frame_timestamp = msg.get_frame_timestamp()  # type: Optional[float]
@@ -86,11 +121,17 @@ class RGBDFrameMessageUtil:
         depth_image = msg.get_image_data(1).view(np.uint16).reshape(msg.get_image_shapes()[1][:2])  # type: np.ndarray
         pose = msg.get_pose(0)  # type: np.ndarray
 
-        # Note: It's extremely important that we return *copies* of the data here, since the versions in
-        #       the message may change once this method returns. (The context is that the message comes
-        #       from a pool, and it will be returned to the pool once the lock that's held whilst this
-        #       method is called is released. See also MappingClientHandler.get_frame.)
-        return frame_idx, frame_timestamp, rgb_image.copy(), depth_image.copy(), pose.copy()
+        # Note: By default, it's extremely important that we return *copies* of the data here, since the versions
+        #       in the message may change once this method returns. (The context is that the message comes from a
+        #       pool, and it will be returned to the pool once the lock that's held whilst this method is called is
+        #       released. See also MappingClientHandler.get_frame.)
+        if copy:
+            return frame_idx, frame_timestamp, rgb_image.copy(), depth_image.copy(), pose.copy()
+
+        for view in (rgb_image, depth_image, pose):
+            view.flags.writeable = False
+
+        return frame_idx, frame_timestamp, rgb_image, depth_image, pose
 
     @staticmethod
     def fill_frame_message(frame_idx: int, rgb_image: np.ndarray, depth_image: np.ndarray, pose: np.ndarray,
@@ -153,3 +194,171 @@ class RGBDFrameMessageUtil:
         msg = FrameMessage(image_shapes, image_byte_sizes)
         RGBDFrameMessageUtil.fill_frame_message(frame_idx, rgb_image, depth_image, pose, msg)
         return msg
+
+    # PRIVATE STATIC METHODS
+
+    @staticmethod
+    def __compress_frame_message(msg: FrameMessage, *, depth_codec: str, parallel: bool) -> FrameMessage:
+        """
+        Compress an uncompressed RGB-D frame message.
+
+        :param msg:         The message to compress.
+        :param depth_codec: The codec to use to compress the depth image ("png" or "delta").
+        :param parallel:    Whether to compress the RGB and depth images in parallel.
+        :return:            The compressed message.
+        """
+        if depth_codec not in ("delta", "png"):
+            raise RuntimeError("Error: Unknown depth codec '{}'".format(depth_codec))
+
+        # Extract the relevant data from the uncompressed frame message.
+        frame_idx, frame_timestamp, rgb_image, depth_image, pose = RGBDFrameMessageUtil.extract_frame_data(msg)
+
+        # Compress the RGB and depth images. Note that OpenCV releases the GIL whilst encoding,
+        # so compressing the images on different threads allows the work to proceed in parallel.
+        def compress_rgb_image() -> np.ndarray:
+            return cv2.imencode(".jpg", rgb_image, [cv2.IMWRITE_JPEG_QUALITY, 90])[1]
+
+        def compress_depth_image() -> np.ndarray:
+            if depth_codec == "delta":
+                return DepthCompressionUtil.compress_depth_image(depth_image)
+            else:
+                return cv2.imencode(".png", depth_image)[1]
+
+        if parallel:
+            compressed_depth_image_future = RGBDFrameMessageUtil.__get_thread_pool().submit(
+                compress_depth_image
+            )  # type: Future
+            compressed_rgb_image = compress_rgb_image()                      # type: np.ndarray
+            compressed_depth_image = compressed_depth_image_future.result()  # type: np.ndarray
+        else:
+            compressed_rgb_image = compress_rgb_image()
+            compressed_depth_image = compress_depth_image()
+
+        # Construct and return the compressed message.
+        compressed_msg = FrameMessage(
+            msg.get_image_shapes(), [len(compressed_rgb_image), len(compressed_depth_image)]
+        )
+        compressed_msg.set_frame_index(frame_idx)
+        compressed_msg.set_frame_timestamp(frame_timestamp)
+        compressed_msg.set_image_data(0, compressed_rgb_image.flatten())
+        compressed_msg.set_pose(0, pose)
+        compressed_msg.set_image_data(1, compressed_depth_image.flatten())
+        compressed_msg.set_pose(1, pose)
+
+        return compressed_msg
+
+    @staticmethod
+    def __decompress_frame_message(msg: FrameMessage, *, parallel: bool) -> FrameMessage:
+        """
+        Decompress a compressed RGB-D frame message.
+
+        :param msg:         The message to decompress.
+        :param parallel:    Whether to decompress the RGB and depth images in parallel.
+        :return:            The decompressed message.
+        """
+        # Uncompress the RGB and depth images.
+        rgb_image, depth_image = RGBDFrameMessageUtil.__decompress_images(msg, parallel=parallel)
+
+        # Construct and return the decompressed message.
+        decompressed_msg = FrameMessage(
+            msg.get_image_shapes(),
+            [rgb_image.nbytes, depth_image.nbytes]
+        )
+        RGBDFrameMessageUtil.fill_frame_message(
+            msg.get_frame_index(), rgb_image, depth_image, msg.get_pose(0), decompressed_msg,
+            frame_timestamp=msg.get_frame_timestamp()
+        )
+
+        return decompressed_msg
+
+    @staticmethod
+    def __decompress_frame_message_into(msg: FrameMessage, decompressed_msg: FrameMessage, *, parallel: bool) -> None:
+        """
+        Decompress a compressed RGB-D frame message into an existing uncompressed RGB-D frame message.
+
+        :param msg:                 The message to decompress.
+        :param decompressed_msg:    The message into which to write the decompressed frame.
+        :param parallel:            Whether to decompress the RGB and depth images in parallel.
+        """
+        # Uncompress the RGB and depth images straight into the output message.
+        RGBDFrameMessageUtil.__decompress_images(msg, parallel=parallel, out_msg=decompressed_msg)
+
+        # Write the rest of the decompressed frame into the output message.
+        decompressed_msg.set_frame_index(msg.get_frame_index())
+        decompressed_msg.set_frame_timestamp(msg.get_frame_timestamp())
+        decompressed_msg.set_pose(0, msg.get_pose(0))
+        decompressed_msg.set_pose(1, msg.get_pose(0))
+
+    @staticmethod
+    def __decompress_images(msg: FrameMessage, *, parallel: bool,
+                            out_msg: Optional[FrameMessage] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Decompress the RGB and depth images in a compressed RGB-D frame message.
+
+        .. note::
+            If an output message is specified, the images are written into its image data. Depth images compressed
+            by DepthCompressionUtil are decompressed directly into the message, but images decoded by OpenCV still
+            have to be copied in, since cv2.imdecode can't decode into an existing buffer.
+
+        :param msg:         The compressed RGB-D frame message.
+        :param parallel:    Whether to decompress the RGB and depth images in parallel.
+        :param out_msg:     An optional uncompressed RGB-D frame message into which to write the images.
+        :return:            A tuple consisting of the RGB image and the depth image (which are views onto the
+                            image data of the output message, if one was specified).
+        """
+        # Extract the compressed images from the message.
+        compressed_rgb_image = msg.get_image_data(0)    # type: np.ndarray
+        compressed_depth_image = msg.get_image_data(1)  # type: np.ndarray
+
+        # Uncompress the RGB and depth images.
+        def decompress_rgb_image() -> np.ndarray:
+            rgb_image = cv2.imdecode(compressed_rgb_image, cv2.IMREAD_COLOR)  # type: np.ndarray
+            if out_msg is None:
+                return rgb_image
+
+            rgb_out = out_msg.get_image_data(0).reshape(out_msg.get_image_shapes()[0])  # type: np.ndarray
+            np.copyto(rgb_out, rgb_image)
+            return rgb_out
+
+        def decompress_depth_image() -> np.ndarray:
+            depth_shape = msg.get_image_shapes()[1][:2]  # type: Tuple[int, int]
+            depth_out = None                             # type: Optional[np.ndarray]
+            if out_msg is not None:
+                depth_out = out_msg.get_image_data(1).view(np.uint16).reshape(depth_shape)
+
+            if DepthCompressionUtil.is_compressed_depth_image(compressed_depth_image):
+                return DepthCompressionUtil.decompress_depth_image(compressed_depth_image, depth_shape, out=depth_out)
+
+            depth_image = cv2.imdecode(compressed_depth_image, cv2.IMREAD_ANYDEPTH)  # type: np.ndarray
+            if depth_out is None:
+                return depth_image.astype(np.uint16, copy=False)
+
+            np.copyto(depth_out, depth_image, casting="unsafe")
+            return depth_out
+
+        if parallel:
+            depth_image_future = RGBDFrameMessageUtil.__get_thread_pool().submit(
+                decompress_depth_image
+            )  # type: Future
+            rgb_image = decompress_rgb_image()         # type: np.ndarray
+            depth_image = depth_image_future.result()  # type: np.ndarray
+        else:
+            rgb_image = decompress_rgb_image()
+            depth_image = decompress_depth_image()
+
+        return rgb_image, depth_image
+
+    @staticmethod
+    def __get_thread_pool() -> ThreadPoolExecutor:
+        """
+        Get the thread pool used by the parallel variants of the compression and decompression functions.
+
+        .. note::
+            The thread pool is created the first time this function is called, and then reused.
+
+        :return:    The thread pool.
+        """
+        with RGBDFrameMessageUtil.__thread_pool_lock:
+            if RGBDFrameMessageUtil.__thread_pool is None:
+                RGBDFrameMessageUtil.__thread_pool = ThreadPoolExecutor(max_workers=os.cpu_count())
+            return RGBDFrameMessageUtil.__thread_pool
@@ -0,0 +1,86 @@
+import cv2
+import numpy as np
+
+from typing import Tuple
+
+from .image_codec import ImageCodec
+
+
+class ScaledImageCodec(ImageCodec):
+    """An image codec that downscales images before encoding them using another codec."""
+
+    # CONSTRUCTOR
+
+    def __init__(self, codec: ImageCodec, scale: float):
+        """
+        Construct a scaled image codec.
+
+        .. note::
+            The scaled images are encoded using the other codec, so they are tagged with its ID. When they are
+            decoded (e.g. by ImageCodecRegistry), they are automatically upscaled back to the original image size.
+            The other codec must not be a raw codec, since raw images don't record their own size.
+
+        :param codec:   The codec to use to encode the downscaled images.
+        :param scale:   The factor by which to scale the images (in the range (0,1]).
+        """
+        if codec.get_codec_id() == ImageCodec.RAW:
+            raise RuntimeError("Error: Cannot scale raw images")
+
+        self.__codec = codec  # type: ImageCodec
+        self.__scale = scale  # type: float
+
+    # PUBLIC STATIC METHODS
+
+    @staticmethod
+    def upscale_to_shape(image: np.ndarray, shape: Tuple[int, int, int]) -> np.ndarray:
+        """
+        Upscale a decoded image to the specified shape, if it was downscaled before it was encoded.
+
+        .. note::
+            Images with 16-bit elements (e.g. depth images) are upscaled using nearest-neighbour interpolation,
+            to avoid creating spurious values at depth discontinuities. Other images are upscaled bilinearly.
+
+        :param image:   The decoded image.
+        :param shape:   The shape of the original image, as a (height, width, channels) tuple.
+        :return:        The decoded image at the specified shape.
+        """
+        if image.ndim < 2 or image.shape[:2] == tuple(shape[:2]):
+            return image
+
+        interpolation = cv2.INTER_NEAREST if image.dtype == np.uint16 else cv2.INTER_LINEAR  # type: int
+        return cv2.resize(image, (shape[1], shape[0]), interpolation=interpolation)
+
+    # PUBLIC METHODS
+
+    def decode(self, data: np.ndarray, shape: Tuple[int, int, int]) -> np.ndarray:
+        """
+        Decode an image that was encoded using this type of codec.
+
+        :param data:    The encoded image, as an array of bytes.
+        :param shape:   The shape of the image, as a (height, width, channels) tuple.
+        :return:        The decoded image.
+        """
+        return ScaledImageCodec.upscale_to_shape(self.__codec.decode(data, shape), shape)
+
+    def encode(self, image: np.ndarray) -> np.ndarray:
+        """
+        Encode an image.
+
+        :param image:   The image.
+        :return:        The encoded image, as an array of bytes.
+        """
+        if self.__scale < 1.0:
+            height, width = image.shape[:2]
+            scaled_size = (max(int(width * self.__scale), 1), max(int(height * self.__scale), 1))
+            interpolation = cv2.INTER_NEAREST if image.dtype == np.uint16 else cv2.INTER_AREA  # type: int
+            image = cv2.resize(image, scaled_size, interpolation=interpolation)
+
+        return self.__codec.encode(image)
+
+    def get_codec_id(self) -> int:
+        """
+        Get the ID of the type of codec this is.
+
+        :return:    The ID of the type of codec this is.
+        """
+        return self.__codec.get_codec_id()
@@ -0,0 +1,168 @@
+import numpy as np
+
+from typing import Callable, List, Optional, Set, Tuple
+
+from .frame_message import FrameMessage
+
+
+class SharedFrameMessage(FrameMessage):
+    """A frame message whose data is stored in a block of shared memory, so that other processes can access it."""
+
+    # PRIVATE STATIC VARIABLES
+
+    # The names of the blocks of shared memory that have been created (and not yet unlinked) by this process.
+    __created_names = set()  # type: Set[str]
+
+    # CONSTRUCTOR
+
+    def __init__(self, image_shapes: List[Tuple[int, int, int]], image_byte_sizes: List[int], *,
+                 name: Optional[str] = None, track: bool = True):
+        """
+        Construct a shared frame message.
+
+        .. note::
+            If no name is specified, a new block of shared memory will be created to store the message data. This
+            should be unlinked (by calling unlink) once the message is no longer needed by any process. If a name
+            is specified, the message will instead be backed by the existing block of shared memory with that name.
+        .. note::
+            By default, an existing block of shared memory that is used by the message will be tracked by this
+            process's resource tracker, which will destroy it when the process exits. When attaching to a block
+            that is owned by an unrelated process (e.g. a block created by a mapping client), track should be
+            set to False, so that the block's lifetime remains under the control of its owner.
+        .. note::
+            Shared memory requires Python 3.8 or above.
+
+        :param image_shapes:        The shapes of the images that will be stored in the frame message.
+        :param image_byte_sizes:    The overall byte sizes of the images that will be stored in the frame message.
+        :param name:                The name of an existing block of shared memory to use (optional).
+        :param track:               Whether to track an existing block of shared memory in this process.
+        """
+        self.__name = name           # type: Optional[str]
+        self.__shared_memory = None  # type: Optional["multiprocessing.shared_memory.SharedMemory"]
+        self.__track = track         # type: bool
+
+        super().__init__(image_shapes, image_byte_sizes)
+
+    # PUBLIC STATIC METHODS
+
+    @staticmethod
+    def decompress_into(frame_msg: FrameMessage, image_shapes: List[Tuple[int, int, int]],
+                        image_byte_sizes: List[int], name: str, *,
+                        frame_decoder: Optional[Callable[[FrameMessage, FrameMessage], None]] = None,
+                        frame_decompressor: Optional[Callable[[FrameMessage], FrameMessage]] = None) -> None:
+        """
+        Decompress a frame into the shared frame message that is backed by the block of shared memory with the
+        specified name.
+
+        .. note::
+            This is intended to be run in a worker process (e.g. via a process pool). The frame decoder or frame
+            decompressor must therefore be picklable (e.g. a static method such as those in RGBDFrameMessageUtil).
+            If both are specified, the frame decoder takes precedence. If neither is specified, the frame is
+            simply copied across.
+
+        :param frame_msg:           The (compressed) frame.
+        :param image_shapes:        The shapes of the images in the shared frame message.
+        :param image_byte_sizes:    The byte sizes of the images in the shared frame message.
+        :param name:                The name of the block of shared memory that backs the shared frame message.
+        :param frame_decoder:       An optional function to use to decompress the frame into the shared frame message.
+        :param frame_decompressor:  An optional function to use to decompress the frame.
+        """
+        decompressed_frame_msg = SharedFrameMessage(image_shapes, image_byte_sizes, name=name)
+        try:
+            if frame_decoder is not None:
+                frame_decoder(frame_msg, decompressed_frame_msg)
+            elif frame_decompressor is not None:
+                np.copyto(decompressed_frame_msg.get_data(), frame_decompressor(frame_msg).get_data())
+            else:
+                np.copyto(decompressed_frame_msg.get_data(), frame_msg.get_data())
+        finally:
+            decompressed_frame_msg.close()
+
+    # PUBLIC METHODS
+
+    def close(self) -> None:
+        """
+        Close this process's access to the block of shared memory that backs the message.
+
+        .. note::
+            The message must not be used after it has been closed.
+        """
+        if self.__shared_memory is not None:
+            self._data = None
+            try:
+                self.__shared_memory.close()
+                self.__shared_memory = None
+            except BufferError:
+                # If something is still referring to the message data, the memory can't be closed yet. In that
+                # case, we leave it to be closed when the shared memory object is garbage collected.
+                pass
+
+    def get_shared_memory_name(self) -> str:
+        """
+        Get the name of the block of shared memory that backs the message.
+
+        :return:    The name of the block of shared memory that backs the message.
+        """
+        return self.__name
+
+    def swap_data(self, msg: FrameMessage) -> None:
+        """
+        Swap the data of this message with that of another shared frame message that has the same layout.
+
+        .. note::
+            The blocks of shared memory that back the two messages are swapped along with the data, so that each
+            message continues to report the name of the block that actually contains its data.
+
+        :param msg: The other shared frame message.
+        """
+        if not isinstance(msg, SharedFrameMessage):
+            raise RuntimeError("Error: Cannot swap the data of a shared frame message with that of a normal one")
+
+        super().swap_data(msg)
+        self.__name, msg.__name = msg.__name, self.__name
+        self.__shared_memory, msg.__shared_memory = msg.__shared_memory, self.__shared_memory
+        self.__track, msg.__track = msg.__track, self.__track
+
+    def unlink(self) -> None:
+        """
+        Close the message, and request that the block of shared memory that backs it be destroyed.
+
+        .. note::
+            The memory will actually be destroyed once every process that has access to it has closed it.
+        """
+        shared_memory = self.__shared_memory
+        self.close()
+        if shared_memory is not None:
+            shared_memory.unlink()
+            SharedFrameMessage.__created_names.discard(self.__name)
+
+    # PROTECTED METHODS
+
+    def _make_data(self, size: int) -> np.ndarray:
+        """
+        Make the buffer in which to store the message data.
+
+        :param size:    The size of the buffer (in bytes).
+        :return:        The buffer.
+        """
+        from multiprocessing import shared_memory
+
+        # Note: Shared memory blocks must have a non-zero size.
+        if self.__name is None:
+            self.__shared_memory = shared_memory.SharedMemory(create=True, size=max(size, 1))
+            self.__name = self.__shared_memory.name
+            SharedFrameMessage.__created_names.add(self.__name)
+        elif self.__track or self.__name in SharedFrameMessage.__created_names:
+            self.__shared_memory = shared_memory.SharedMemory(name=self.__name)
+        else:
+            # Note: Prior to Python 3.13, attaching to a block of shared memory always registers it with the
+            #       resource tracker, so we have to unregister it again afterwards. (We can't do that if the
+            #       block was created by this process, since that would also unregister the original block.)
+            try:
+                self.__shared_memory = shared_memory.SharedMemory(name=self.__name, track=False)
+            except TypeError:
+                from multiprocessing import resource_tracker
+                self.__shared_memory = shared_memory.SharedMemory(name=self.__name)
+                resource_tracker.unregister(self.__shared_memory._name, "shared_memory")
+
+        return np.ndarray((size,), dtype=np.uint8, buffer=self.__shared_memory.buf)
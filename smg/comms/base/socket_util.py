@@ -1,8 +1,9 @@
-import numpy as np
+import os
 import socket
+import stat
 import threading
 
-from typing import Optional, TypeVar
+from typing import List, Optional, Tuple, TypeVar, Union
 
 from .message import Message
 
@@ -19,28 +20,115 @@ class SocketUtil:
 
     # PUBLIC STATIC METHODS
 
+    @staticmethod
+    def close_server_socket(server_sock: socket.SocketType) -> None:
+        """
+        Close a server socket made by make_server_socket, removing its path from the file system if necessary.
+
+        :param server_sock: The server socket.
+        """
+        path = server_sock.getsockname() if SocketUtil.is_unix_socket(server_sock) else None  # type: Optional[str]
+        server_sock.close()
+        if path:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def format_endpoint(endpoint: Union[Tuple[str, int], str]) -> str:
+        """
+        Make a human-readable string describing the specified endpoint.
+
+        :param endpoint:    The endpoint, either as a (host, port) tuple or as the path of a Unix domain socket.
+        :return:            A human-readable string describing the endpoint.
+        """
+        if isinstance(endpoint, str):
+            return endpoint
+        else:
+            return "{}:{}".format(*endpoint)
+
+    @staticmethod
+    def is_unix_socket(sock: socket.SocketType) -> bool:
+        """
+        Get whether the specified socket is a Unix domain socket.
+
+        :param sock:    The socket.
+        :return:        True, if the socket is a Unix domain socket, or False otherwise.
+        """
+        return hasattr(socket, "AF_UNIX") and sock.family == socket.AF_UNIX
+
+    @staticmethod
+    def make_server_socket(port: Union[int, str]) -> socket.SocketType:
+        """
+        Make a server socket bound to the specified port on 127.0.0.1, or to the specified Unix domain socket path.
+
+        .. note::
+            If a path is specified and a stale socket file from a previous run exists there, it will be replaced.
+            If the path is in use by anything else (i.e. a file that isn't a socket, or a socket on which another
+            server is still listening), an exception will be raised instead.
+
+        :param port:    The port on which to listen (for TCP), or the path of the Unix domain socket.
+        :return:        The server socket (the caller is responsible for calling listen on it).
+        """
+        if isinstance(port, str):
+            SocketUtil.__remove_stale_socket_file(port)
+
+        server_sock = SocketUtil.make_socket(SocketUtil.make_server_endpoint(port))  # type: socket.SocketType
+        server_sock.bind(SocketUtil.make_server_endpoint(port))
+        return server_sock
+
+    @staticmethod
+    def make_server_endpoint(port: Union[int, str]) -> Union[Tuple[str, int], str]:
+        """
+        Make the endpoint on which a server that uses the specified port should listen.
+
+        :param port:    The port on which to listen (for TCP), or the path of the Unix domain socket.
+        :return:        The endpoint on which to listen, i.e. either ("127.0.0.1", port) or the path.
+        """
+        return port if isinstance(port, str) else ("127.0.0.1", port)
+
+    @staticmethod
+    def make_socket(endpoint: Union[Tuple[str, int], str]) -> socket.SocketType:
+        """
+        Make a stream socket of the appropriate family for the specified endpoint.
+
+        :param endpoint:    The endpoint, either as a (host, port) tuple or as the path of a Unix domain socket.
+        :return:            The socket.
+        """
+        if isinstance(endpoint, str):
+            if not hasattr(socket, "AF_UNIX"):
+                raise RuntimeError("Error: Unix domain sockets are not supported on this platform")
+            return socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            return socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+
     @staticmethod
     def read_message(sock: socket.SocketType, msg: T, stop_waiting: Optional[threading.Event] = None) -> bool:
         """
         Attempt to read a message of type T from the specified socket.
 
         :param sock:            The socket.
-        :param msg:             The T into which to copy the message, if reading succeeded.
+        :param msg:             The T into which to read the message (its contents are unspecified if reading fails).
         :param stop_waiting:    An optional event that can be used to make the operation stop waiting if needed.
         :return:                True, if reading succeeded, or False otherwise.
         """
         try:
-            data = b""  # type: bytes
+            # Receive the bytes directly into the message's own buffer, rather than accumulating them in a separate
+            # buffer and copying them across at the end. This avoids both the cost of repeatedly growing a bytes
+            # object and the need to temporarily hold two copies of a (potentially large) message in memory.
+            buffer = memoryview(msg.get_data()).cast("B")  # type: memoryview
+            offset = 0                                     # type: int
 
             # Until we've read the number of bytes we were expecting:
-            while len(data) < msg.get_size():
+            while offset < len(buffer):
                 try:
                     # Try to get the remaining bytes.
-                    received = sock.recv(msg.get_size() - len(data))  # type: bytes
+                    received = sock.recv_into(buffer[offset:])  # type: int
 
-                    # If we made progress, append the new bytes to the buffer.
-                    if len(received) > 0:
-                        data += received
+                    # If we made progress, advance the offset into the buffer.
+                    if received > 0:
+                        offset += received
 
                     # Otherwise, something's wrong, so return False.
                     else:
@@ -50,14 +138,51 @@ class SocketUtil:
                     if stop_waiting is not None and stop_waiting.is_set():
                         return False
 
-            # If we managed to get the number of bytes were were expecting, copy the buffer into the output message
-            # and return True to indicate a successful read.
-            np.copyto(msg.get_data(), np.frombuffer(data, dtype=np.uint8))
+            # If we managed to get the number of bytes we were expecting, return True to indicate a successful read.
             return True
         except (ConnectionAbortedError, ConnectionResetError, ValueError):
             # If any (non-timeout) exceptions are thrown during the read, return False.
             return False
 
+    @staticmethod
+    def read_message_nonblocking(sock: socket.SocketType, msg: T, offset: int) -> Optional[int]:
+        """
+        Read as much of a message of type T from the specified (non-blocking) socket as is currently available.
+
+        .. note::
+            This is intended for use by code that multiplexes several sockets on a single thread, and so needs
+            to parse incoming messages incrementally rather than blocking until each one has been fully received.
+
+        :param sock:    The socket.
+        :param msg:     The T into which to read the message.
+        :param offset:  The number of bytes of the message that have already been read.
+        :return:        The number of bytes of the message that have now been read, or None if the connection
+                        has been closed or an error occurred.
+        """
+        try:
+            buffer = memoryview(msg.get_data()).cast("B")  # type: memoryview
+
+            # Until we've read the number of bytes we were expecting, or no more data is currently available:
+            while offset < len(buffer):
+                try:
+                    # Try to get the remaining bytes.
+                    received = sock.recv_into(buffer[offset:])  # type: int
+
+                    # If we made progress, advance the offset into the buffer.
+                    if received > 0:
+                        offset += received
+
+                    # Otherwise, the connection has been closed, so return None.
+                    else:
+                        return None
+                except (BlockingIOError, socket.timeout):
+                    break
+
+            return offset
+        except (ConnectionAbortedError, ConnectionResetError, ValueError):
+            # If any other exceptions are thrown during the read, return None.
+            return None
+
     @staticmethod
     def write_message(sock: socket.SocketType, msg: T) -> bool:
         """
@@ -68,8 +193,111 @@ class SocketUtil:
         :return:        True, if writing succeeded, or False otherwise.
         """
         try:
-            sock.sendall(msg.get_data().tobytes())
+            # Note: The message data is passed to the socket directly (rather than being converted to bytes first)
+            #       to avoid making an unnecessary copy of it.
+            sock.sendall(msg.get_data())
             return True
         except (ConnectionAbortedError, ConnectionResetError):
             # If an exception is thrown during the write, return False.
             return False
+
+    @staticmethod
+    def write_messages(sock: socket.SocketType, *msgs: Message) -> bool:
+        """
+        Attempt to write a sequence of messages to the specified socket, using as few system calls as possible.
+
+        .. note::
+            Where the platform supports it, the messages will be written using scatter-gather I/O, which allows
+            them all to be sent in a single system call without first copying them into a contiguous buffer.
+            On other platforms (e.g. Windows), they will be written one after the other.
+
+        :param sock:    The socket.
+        :param msgs:    The messages.
+        :return:        True, if writing succeeded, or False otherwise.
+        """
+        try:
+            buffers = [
+                memoryview(msg.get_data()).cast("B") for msg in msgs if msg.get_size() > 0
+            ]  # type: List[memoryview]
+
+            if hasattr(sock, "sendmsg"):
+                # Until all of the buffers have been sent:
+                while len(buffers) > 0:
+                    # Try to send the remaining buffers.
+                    sent = sock.sendmsg(buffers)  # type: int
+
+                    # Skip past any buffers that were sent in full, and trim any buffer that was only partially sent.
+                    while sent > 0:
+                        if sent >= len(buffers[0]):
+                            sent -= len(buffers[0])
+                            buffers.pop(0)
+                        else:
+                            buffers[0] = buffers[0][sent:]
+                            sent = 0
+            else:
+                for buffer in buffers:
+                    sock.sendall(buffer)
+
+            return True
+        except (ConnectionAbortedError, ConnectionResetError):
+            # If an exception is thrown during the write, return False.
+            return False
+
+    @staticmethod
+    def write_nonblocking(sock: socket.SocketType, data: bytearray) -> bool:
+        """
+        Write as much of the specified data to the specified (non-blocking) socket as is possible without blocking.
+
+        .. note::
+            Any data that is successfully written is removed from the front of the buffer, so that the caller
+            can simply try again with the same buffer once the socket is next ready for writing.
+
+        :param sock:    The socket.
+        :param data:    The data to write.
+        :return:        True, if writing succeeded (even if only part of the data could be written), or False otherwise.
+        """
+        try:
+            while len(data) > 0:
+                try:
+                    sent = sock.send(data)  # type: int
+                    del data[:sent]
+                except (BlockingIOError, socket.timeout):
+                    break
+
+            return True
+        except (BrokenPipeError, ConnectionAbortedError, ConnectionResetError):
+            # If an exception is thrown during the write, return False.
+            return False
+
+    # PRIVATE STATIC METHODS
+
+    @staticmethod
+    def __remove_stale_socket_file(path: str) -> None:
+        """
+        Remove the socket file at the specified path, if it was left behind by a server that's no longer running.
+
+        .. note::
+            A socket file is deemed to be stale if connecting to it is refused, i.e. no server is listening on it.
+
+        :param path:    The path.
+        """
+        try:
+            mode = os.stat(path).st_mode  # type: int
+        except FileNotFoundError:
+            return
+
+        if not stat.S_ISSOCK(mode):
+            raise RuntimeError("Error: Cannot bind to {}, since it is not a socket".format(path))
+
+        probe_sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)  # type: socket.SocketType
+        try:
+            probe_sock.connect(path)
+        except ConnectionRefusedError:
+            os.unlink(path)
+            return
+        except FileNotFoundError:
+            return
+        finally:
+            probe_sock.close()
+
+        raise RuntimeError("Error: Cannot bind to {}, since another server is listening on it".format(path))
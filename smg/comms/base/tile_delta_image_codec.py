@@ -0,0 +1,256 @@
+import numpy as np
+import struct
+import threading
+
+from typing import Optional, Tuple
+
+from .image_codec import ImageCodec
+from .png_image_codec import PNGImageCodec
+
+
+class TileDeltaImageCodec(ImageCodec):
+    """
+    A stateful image codec that divides each image into tiles, and only encodes the tiles that have changed
+    since the previous image in the stream.
+
+    .. note::
+        Every so often (and whenever the image size changes), a keyframe is sent, in which the whole image is
+        encoded. Otherwise, the tiles whose mean absolute difference from the corresponding tiles of the previous
+        image exceeds a threshold are stacked into a strip, which is encoded using another (stateless) codec,
+        together with a bitmap that records which tiles were sent. The periodic keyframes allow a decoder that
+        has missed images (e.g. one that has just connected) to recover.
+    .. note::
+        The encoder compares each tile to the original version of the tile that it last sent, rather than to the
+        version the decoder will have reconstructed. This matters when the other codec is lossy (e.g. JPEG): the
+        reconstructed tiles then never exactly match the originals, so comparing against them would make every
+        tile look changed, and the whole image would be resent every time. Errors still can't accumulate, since
+        each reconstructed tile differs from the current image by at most the error introduced by the other
+        codec when the tile was last sent plus the threshold.
+    .. note::
+        The encoder must see the images in a stream in the order in which they will be decoded. A mapping client
+        whose RGBDFrameCompressor uses this codec therefore compresses its frames one at a time, in order, even if
+        it has several compression threads (see RGBDFrameCompressor.is_stateful).
+    """
+
+    # PRIVATE STATIC VARIABLES
+
+    # The format of the header at the start of each encoded image: flags, element byte size, number of channels,
+    # ID of the codec used to encode the tiles, tile size, image height and image width.
+    __HEADER_FMT = "<BBBHHHH"  # type: str
+
+    # The flag denoting that an encoded image is a keyframe.
+    __KEYFRAME = 1  # type: int
+
+    # CONSTRUCTOR
+
+    def __init__(self, codec: Optional[ImageCodec] = None, *, keyframe_interval: int = 30, threshold: float = 2.0,
+                 tile_size: int = 32):
+        """
+        Construct a tile delta image codec.
+
+        :param codec:               The stateless codec to use to encode the keyframes and the strips of changed
+                                    tiles (defaults to a PNG codec).
+        :param keyframe_interval:   The maximum number of images to encode between successive keyframes.
+        :param threshold:           The mean absolute difference (in the units of the image elements, e.g. colour
+                                    intensities or depths) above which a tile is considered to have changed.
+        :param tile_size:           The width and height of each tile (in pixels).
+        """
+        self.__codec = codec if codec is not None else PNGImageCodec()  # type: ImageCodec
+        self.__frames_since_keyframe = 0                                # type: int
+        self.__keyframe_interval = keyframe_interval                    # type: int
+        self.__lock = threading.Lock()                                  # type: threading.Lock
+        self.__reference = None                                         # type: Optional[np.ndarray]
+        self.__threshold = threshold                                    # type: float
+        self.__tile_size = tile_size                                    # type: int
+
+    # PUBLIC METHODS
+
+    def decode(self, data: np.ndarray, shape: Tuple[int, int, int]) -> np.ndarray:
+        """
+        Decode the next image in the stream.
+
+        :param data:    The encoded image, as an array of bytes.
+        :param shape:   The shape of the image, as a (height, width, channels) tuple.
+        :return:        The decoded image.
+        """
+        # Note: The registry imports this codec, so we import it here to avoid a circular import.
+        from .image_codec_registry import ImageCodecRegistry
+
+        flags, element_byte_size, channels, codec_id, tile_size, height, width = struct.unpack_from(
+            TileDeltaImageCodec.__HEADER_FMT, data
+        )
+        offset = struct.calcsize(TileDeltaImageCodec.__HEADER_FMT)  # type: int
+        dtype = np.dtype("<u{}".format(element_byte_size))          # type: np.dtype
+        codec = ImageCodecRegistry.get_codec(codec_id)               # type: ImageCodec
+
+        with self.__lock:
+            # If the image is a keyframe, decode the whole image.
+            if flags & TileDeltaImageCodec.__KEYFRAME:
+                self.__reference = TileDeltaImageCodec.__pad(
+                    TileDeltaImageCodec.__decode_with(codec, data[offset:], (height, width, channels), dtype),
+                    tile_size
+                )
+
+            # Otherwise, decode the changed tiles, and write them into the previous image. If there is no suitable
+            # previous image (i.e. we've missed the keyframe), start from a blank image until the next keyframe.
+            else:
+                padded_shape = TileDeltaImageCodec.__get_padded_shape(
+                    (height, width, channels), tile_size
+                )  # type: Tuple[int, int, int]
+                if self.__reference is None or self.__reference.shape != padded_shape \
+                        or self.__reference.dtype != dtype:
+                    self.__reference = np.zeros(padded_shape, dtype=dtype)
+
+                tiles = TileDeltaImageCodec.__get_tiles(self.__reference, tile_size)  # type: np.ndarray
+                tile_count = tiles.shape[0] * tiles.shape[1]                          # type: int
+                bitmap_size = (tile_count + 7) // 8                                   # type: int
+                changed = np.unpackbits(data[offset:offset + bitmap_size])[:tile_count].astype(bool).reshape(
+                    tiles.shape[:2]
+                )  # type: np.ndarray
+
+                changed_count = np.count_nonzero(changed)  # type: int
+                if changed_count > 0:
+                    strip = TileDeltaImageCodec.__decode_with(
+                        codec, data[offset + bitmap_size:], (changed_count * tile_size, tile_size, channels), dtype
+                    )  # type: np.ndarray
+                    tiles[changed] = strip.reshape((changed_count,) + tiles.shape[2:])
+
+            return self.__reference[:height, :width]
+
+    def encode(self, image: np.ndarray) -> np.ndarray:
+        """
+        Encode the next image in the stream.
+
+        :param image:   The image.
+        :return:        The encoded image, as an array of bytes.
+        """
+        height, width = image.shape[:2]
+        channels = image.shape[2] if image.ndim == 3 else 1  # type: int
+        tile_size = self.__tile_size                          # type: int
+
+        with self.__lock:
+            padded_image = TileDeltaImageCodec.__pad(
+                image.reshape(height, width, channels), tile_size
+            )  # type: np.ndarray
+
+            keyframe = self.__reference is None or self.__reference.shape != padded_image.shape \
+                or self.__reference.dtype != padded_image.dtype \
+                or self.__frames_since_keyframe + 1 >= self.__keyframe_interval  # type: bool
+
+            # If a keyframe is due, encode the whole image, and make it the new reference image.
+            if keyframe:
+                payload = self.__codec.encode(image)  # type: np.ndarray
+                self.__reference = padded_image
+                self.__frames_since_keyframe = 0
+                bitmap = np.zeros(0, dtype=np.uint8)  # type: np.ndarray
+
+            # Otherwise, find the tiles that have changed, encode them as a strip, and write them into the
+            # reference image.
+            else:
+                tiles = TileDeltaImageCodec.__get_tiles(padded_image, tile_size)                # type: np.ndarray
+                reference_tiles = TileDeltaImageCodec.__get_tiles(self.__reference, tile_size)  # type: np.ndarray
+                differences = np.abs(tiles.astype(np.int32) - reference_tiles).mean(axis=(2, 3, 4))
+                changed = differences > self.__threshold  # type: np.ndarray
+
+                changed_count = np.count_nonzero(changed)  # type: int
+                if changed_count > 0:
+                    strip = tiles[changed].reshape(changed_count * tile_size, tile_size, channels)  # type: np.ndarray
+                    payload = self.__codec.encode(strip if channels > 1 else strip[:, :, 0])
+                    reference_tiles[changed] = tiles[changed]
+                else:
+                    payload = np.zeros(0, dtype=np.uint8)
+
+                self.__frames_since_keyframe += 1
+                bitmap = np.packbits(changed.reshape(-1))
+
+        header = struct.pack(
+            TileDeltaImageCodec.__HEADER_FMT, TileDeltaImageCodec.__KEYFRAME if keyframe else 0,
+            image.dtype.itemsize, channels, self.__codec.get_codec_id(), tile_size, height, width
+        )  # type: bytes
+
+        return np.concatenate([np.frombuffer(header, dtype=np.uint8), bitmap, payload])
+
+    def get_codec_id(self) -> int:
+        """
+        Get the ID of the type of codec this is.
+
+        :return:    The ID of the type of codec this is.
+        """
+        return ImageCodec.TILE_DELTA
+
+    def is_stateful(self) -> bool:
+        """
+        Get whether this is a stateful codec, i.e. one that encodes each image relative to previous ones.
+
+        :return:    True, since this is a stateful codec.
+        """
+        return True
+
+    def make_decoder(self) -> ImageCodec:
+        """
+        Make a codec that can be used to decode a single stream of images encoded by codecs of this type.
+
+        :return:    The codec to use to decode the stream.
+        """
+        return TileDeltaImageCodec()
+
+    # PRIVATE STATIC METHODS
+
+    @staticmethod
+    def __decode_with(codec: ImageCodec, data: np.ndarray, shape: Tuple[int, int, int],
+                      dtype: np.dtype) -> np.ndarray:
+        """
+        Decode an image that was encoded using the specified stateless codec.
+
+        :param codec:   The codec.
+        :param data:    The encoded image, as an array of bytes.
+        :param shape:   The shape of the image, as a (height, width, channels) tuple.
+        :param dtype:   The type of the image elements.
+        :return:        The decoded image, with the specified shape and element type.
+        """
+        image = codec.decode(data, shape)  # type: np.ndarray
+
+        # Note: Some codecs (e.g. the raw codec) return the bytes of the decoded image rather than the image itself.
+        if image.dtype != dtype:
+            image = image.view(dtype)
+
+        return image.reshape(shape)
+
+    @staticmethod
+    def __get_padded_shape(shape: Tuple[int, int, int], tile_size: int) -> Tuple[int, int, int]:
+        """
+        Get the shape of an image once it has been padded to a whole number of tiles.
+
+        :param shape:       The shape of the image, as a (height, width, channels) tuple.
+        :param tile_size:   The tile size.
+        :return:            The shape of the padded image.
+        """
+        height, width, channels = shape
+        return -(-height // tile_size) * tile_size, -(-width // tile_size) * tile_size, channels
+
+    @staticmethod
+    def __get_tiles(padded_image: np.ndarray, tile_size: int) -> np.ndarray:
+        """
+        Get a view of a padded image as an array of tiles.
+
+        :param padded_image:    The padded image, with shape (height, width, channels).
+        :param tile_size:       The tile size.
+        :return:                A view of the image with shape (rows, columns, tile_size, tile_size, channels).
+        """
+        height, width, channels = padded_image.shape
+        return padded_image.reshape(
+            height // tile_size, tile_size, width // tile_size, tile_size, channels
+        ).swapaxes(1, 2)
+
+    @staticmethod
+    def __pad(image: np.ndarray, tile_size: int) -> np.ndarray:
+        """
+        Pad an image to a whole number of tiles (by replicating its edges).
+
+        :param image:       The image, with shape (height, width, channels).
+        :param tile_size:   The tile size.
+        :return:            The padded image.
+        """
+        height, width, channels = image.shape
+        padded_height, padded_width, _ = TileDeltaImageCodec.__get_padded_shape(image.shape, tile_size)
+        return np.pad(image, ((0, padded_height - height), (0, padded_width - width), (0, 0)), mode="edge")
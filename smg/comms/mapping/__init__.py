@@ -1,3 +1,7 @@
+from .adaptive_bitrate_controller import AdaptiveBitrateController
+from .async_mapping_client import AsyncMappingClient
+from .async_mapping_server import AsyncMappingServer
 from .mapping_client import MappingClient
 from .mapping_client_handler import MappingClientHandler
 from .mapping_server import MappingServer
+from .pose_keyframe_gate import PoseKeyframeGate
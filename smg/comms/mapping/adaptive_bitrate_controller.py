@@ -0,0 +1,148 @@
+import threading
+
+from typing import List, Optional, Tuple
+
+from ..base import DeltaDepthImageCodec, ImageCodec, JPEGImageCodec, RGBDFrameCompressor, ScaledImageCodec
+
+
+class AdaptiveBitrateController:
+    """
+    Used to adapt the codecs with which a mapping client compresses its frames to the conditions on its link.
+
+    .. note::
+        The controller has a ladder of quality levels, each of which specifies a pair of codecs (one for the RGB
+        images and one for the depth images), ordered from the highest quality (level 0) to the lowest. The mapping
+        client reports the time it takes to send each frame (including waiting for any acknowledgement it needs),
+        and whether its frame message queue was still occupied by an unsent frame each time a new frame was
+        submitted. If frames are taking longer to send than the target frame rate allows, or are backing up in
+        the queue, the controller steps down to a lower level; if they are being sent comfortably within the time
+        available, it steps back up. This trades image quality for freshness when the available bandwidth drops,
+        rather than letting the client silently discard frames.
+    """
+
+    # CONSTRUCTOR
+
+    def __init__(self, *, allow_downscaling: bool = False, frames_per_adjustment: int = 10,
+                 levels: Optional[List[Tuple[ImageCodec, ImageCodec]]] = None, target_fps: float = 30.0):
+        """
+        Construct an adaptive bitrate controller.
+
+        :param allow_downscaling:       Whether the default ladder of quality levels should include levels at which
+                                        the images are downscaled prior to encoding (ignored if levels is specified).
+        :param frames_per_adjustment:   The minimum number of frames to send between successive level changes.
+        :param levels:                  An optional ladder of quality levels, each specifying the codecs to use for
+                                        the RGB and depth images, from the highest quality to the lowest.
+        :param target_fps:              The frame rate that the client should be able to sustain.
+        """
+        if levels is None:
+            levels = AdaptiveBitrateController.__make_default_levels(allow_downscaling)
+
+        self.__backlog_rate = 0.0                             # type: float
+        self.__frame_time = 0.0                               # type: float
+        self.__frames_per_adjustment = frames_per_adjustment  # type: int
+        self.__frames_since_adjustment = 0                    # type: int
+        self.__level = 0                                      # type: int
+        self.__levels = levels                                # type: List[Tuple[ImageCodec, ImageCodec]]
+        self.__lock = threading.Lock()                        # type: threading.Lock
+        self.__target_frame_time = 1.0 / target_fps           # type: float
+
+        self.__frame_compressor = RGBDFrameCompressor(*levels[0])  # type: RGBDFrameCompressor
+
+    # PUBLIC METHODS
+
+    def get_frame_compressor(self) -> RGBDFrameCompressor:
+        """
+        Get the frame compressor whose codecs are being controlled.
+
+        :return:    The frame compressor whose codecs are being controlled.
+        """
+        return self.__frame_compressor
+
+    def get_level(self) -> int:
+        """
+        Get the current quality level (0 is the highest quality).
+
+        :return:    The current quality level.
+        """
+        with self.__lock:
+            return self.__level
+
+    def record_frame_sent(self, frame_time: float) -> None:
+        """
+        Record that a frame has been sent, and adjust the quality level if necessary.
+
+        :param frame_time:  The time taken to send the frame (in seconds), including compressing it (if that was
+                            done by the sender) and waiting for any acknowledgement needed before the next frame
+                            could be sent.
+        """
+        with self.__lock:
+            # Update the smoothed frame time.
+            self.__frame_time = AdaptiveBitrateController.__smooth(self.__frame_time, frame_time)
+
+            # If there haven't been enough frames since the last adjustment to judge its effect, early out.
+            self.__frames_since_adjustment += 1
+            if self.__frames_since_adjustment < self.__frames_per_adjustment:
+                return
+
+            # If the link can't keep up with the target frame rate, step down a level. If it can comfortably
+            # do so, step up a level. Note that the thresholds differ, to stop the level from oscillating.
+            level = self.__level  # type: int
+            if self.__frame_time > self.__target_frame_time or self.__backlog_rate > 0.5:
+                level = min(level + 1, len(self.__levels) - 1)
+            elif self.__frame_time < 0.7 * self.__target_frame_time and self.__backlog_rate < 0.1:
+                level = max(level - 1, 0)
+
+            if level != self.__level:
+                self.__level = level
+                self.__frames_since_adjustment = 0
+                self.__frame_compressor.set_codecs(*self.__levels[level])
+
+    def record_frame_submitted(self, backlogged: bool) -> None:
+        """
+        Record that a frame has been submitted to the client for sending.
+
+        :param backlogged:  Whether the client's frame message queue still contained an unsent frame at the time.
+        """
+        with self.__lock:
+            self.__backlog_rate = AdaptiveBitrateController.__smooth(self.__backlog_rate, 1.0 if backlogged else 0.0)
+
+    # PRIVATE STATIC METHODS
+
+    @staticmethod
+    def __make_default_levels(allow_downscaling: bool) -> List[Tuple[ImageCodec, ImageCodec]]:
+        """
+        Make the default ladder of quality levels.
+
+        .. note::
+            The depth images are always encoded losslessly (unless they are downscaled), but more effort is spent
+            compressing them at the lower levels, on the basis that the link rather than the CPU is the bottleneck.
+
+        :param allow_downscaling:   Whether to include levels at which the images are downscaled prior to encoding.
+        :return:                    The default ladder of quality levels.
+        """
+        levels = [
+            (JPEGImageCodec(90), DeltaDepthImageCodec(1)),
+            (JPEGImageCodec(75), DeltaDepthImageCodec(1)),
+            (JPEGImageCodec(60), DeltaDepthImageCodec(6)),
+            (JPEGImageCodec(45), DeltaDepthImageCodec(6))
+        ]  # type: List[Tuple[ImageCodec, ImageCodec]]
+
+        if allow_downscaling:
+            levels += [
+                (ScaledImageCodec(JPEGImageCodec(60), 0.5), ScaledImageCodec(DeltaDepthImageCodec(6), 0.5)),
+                (ScaledImageCodec(JPEGImageCodec(45), 0.5), ScaledImageCodec(DeltaDepthImageCodec(6), 0.5))
+            ]
+
+        return levels
+
+    @staticmethod
+    def __smooth(average: float, value: float) -> float:
+        """
+        Update an exponentially-weighted moving average with a new value.
+
+        :param average: The current average.
+        :param value:   The new value.
+        :return:        The updated average.
+        """
+        alpha = 0.2  # type: float
+        return (1 - alpha) * average + alpha * value
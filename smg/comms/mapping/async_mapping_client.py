@@ -0,0 +1,156 @@
+import asyncio
+import socket
+
+from concurrent.futures import Executor
+from typing import Callable, Optional, Tuple, Union
+
+from ..base import AckMessage, AsyncSocketUtil, CalibrationMessage, FrameHeaderMessage, FrameMessage, SocketUtil
+
+
+class AsyncMappingClient:
+    """An asyncio-based client that can be used to communicate with a remote mapping server."""
+
+    # CONSTRUCTOR
+
+    def __init__(self, endpoint: Union[Tuple[str, int], str] = ("127.0.0.1", 7851), *,
+                 compression_executor: Optional[Executor] = None,
+                 frame_compressor: Optional[Callable[[FrameMessage], FrameMessage]] = None,
+                 frame_window_size: int = 1):
+        """
+        Construct an asyncio-based mapping client.
+
+        .. note::
+            This speaks the same protocol as MappingClient, but rather than sending frames on a separate thread, it
+            sends each frame directly from send_frame_message, which only awaits the server when the frame window is
+            full. This provides natural back-pressure without needing a frame message queue. The client must be
+            connected (using connect, or by using it as an async context manager) before it can be used.
+        .. note::
+            If a compression executor is specified, frames will be compressed on it rather than on the event loop,
+            so that other coroutines can continue to run whilst the compression is in progress.
+
+        :param endpoint:                The server host and port, e.g. ("127.0.0.1", 7851), or the path of the
+                                        server's Unix domain socket.
+        :param compression_executor:    An optional executor on which to compress frames.
+        :param frame_compressor:        An optional function to use to compress frames prior to transmission.
+        :param frame_window_size:       The maximum number of frames the client would like to have in flight at once.
+        """
+        self.__ack_msg = AckMessage()                         # type: AckMessage
+        self.__alive = False                                  # type: bool
+        self.__calib_msg = None                               # type: Optional[CalibrationMessage]
+        self.__compression_executor = compression_executor    # type: Optional[Executor]
+        self.__endpoint = endpoint                            # type: Union[Tuple[str, int], str]
+        self.__frame_compressor = frame_compressor            # type: Optional[Callable[[FrameMessage], FrameMessage]]
+        self.__frame_msg = None                               # type: Optional[FrameMessage]
+        self.__frame_window_size = frame_window_size          # type: int
+        self.__frames_acked = 0                               # type: int
+        self.__frames_sent = 0                                # type: int
+        self.__header_msg = None                              # type: Optional[FrameHeaderMessage]
+        self.__sock = None                                    # type: Optional[socket.SocketType]
+
+    # SPECIAL METHODS
+
+    async def __aenter__(self):
+        """Connect to the server (this allows the client's lifetime to be managed by an async with statement)."""
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """Destroy the client at the end of the async with statement that's used to manage its lifetime."""
+        self.terminate()
+
+    # PUBLIC METHODS
+
+    async def connect(self) -> None:
+        """Connect to the server."""
+        loop = asyncio.get_event_loop()  # type: asyncio.AbstractEventLoop
+
+        try:
+            self.__sock = SocketUtil.make_socket(self.__endpoint)
+            self.__sock.setblocking(False)
+            await loop.sock_connect(self.__sock, self.__endpoint)
+            self.__alive = True
+        except (ConnectionRefusedError, FileNotFoundError):
+            raise RuntimeError("Error: Could not connect to the server")
+
+    async def send_calibration_message(self, calib_msg: CalibrationMessage) -> None:
+        """
+        Send a calibration message to the server.
+
+        :param calib_msg:   The calibration message.
+        """
+        # Send the message to the server, and wait for an acknowledgement.
+        connection_ok = \
+            await AsyncSocketUtil.write_message(self.__sock, calib_msg) and \
+            await AsyncSocketUtil.read_message(self.__sock, self.__ack_msg)  # type: bool
+
+        # If the message was successfully sent and acknowledged, save it, else throw.
+        if connection_ok:
+            self.__calib_msg = calib_msg
+        else:
+            raise RuntimeError("Error: Failed to send calibration message")
+
+        # Limit the frame window size to the number of credits granted by the server (see MappingClient).
+        self.__frame_window_size = max(min(self.__frame_window_size, self.__ack_msg.extract_value()), 1)
+
+        # Allocate the messages that will be reused for each frame.
+        self.__frame_msg = FrameMessage(calib_msg.get_image_shapes(), calib_msg.get_uncompressed_image_byte_sizes())
+        self.__header_msg = FrameHeaderMessage(calib_msg.get_max_images())
+
+    async def send_frame_message(self, frame_filler: Callable[[FrameMessage], None]) -> None:
+        """
+        Send a frame message to the server.
+
+        .. note::
+            As with MappingClient, the client doesn't know anything about the contents of the messages being sent:
+            it calls a callback function that fills in the contents of a message.
+        .. note::
+            This returns as soon as the frame has been sent, unless the frame window is full, in which case it
+            will first wait for the server to acknowledge enough frames to free up a credit.
+
+        :param frame_filler:    A callback function that should fill in the contents of a message.
+        """
+        # Fill in the frame message.
+        frame_filler(self.__frame_msg)
+
+        # If requested, compress the frame prior to transmission.
+        compressed_frame_msg = self.__frame_msg  # type: FrameMessage
+        if self.__frame_compressor is not None:
+            if self.__compression_executor is not None:
+                loop = asyncio.get_event_loop()  # type: asyncio.AbstractEventLoop
+                compressed_frame_msg = await loop.run_in_executor(
+                    self.__compression_executor, self.__frame_compressor, self.__frame_msg
+                )
+            else:
+                compressed_frame_msg = self.__frame_compressor(self.__frame_msg)
+
+        # Fill in the frame header message.
+        self.__header_msg.set_image_byte_sizes(compressed_frame_msg.get_image_byte_sizes())
+        self.__header_msg.set_image_codec_ids(compressed_frame_msg.get_image_codec_ids())
+        self.__header_msg.set_image_shapes(compressed_frame_msg.get_image_shapes())
+
+        # Send the frame header message and the frame message.
+        connection_ok = \
+            await AsyncSocketUtil.write_messages(self.__sock, self.__header_msg, compressed_frame_msg)  # type: bool
+
+        if connection_ok:
+            self.__frames_sent += 1
+
+        # If the window is now full, wait for acknowledgements from the server until a credit becomes free
+        # (the acknowledgements are cumulative, as for MappingClient).
+        while connection_ok and self.__frames_sent - self.__frames_acked >= self.__frame_window_size:
+            connection_ok = await AsyncSocketUtil.read_message(self.__sock, self.__ack_msg)
+            if connection_ok:
+                self.__frames_acked = max(self.__frames_acked, self.__ack_msg.extract_value())
+
+        if not connection_ok:
+            raise RuntimeError("Error: Failed to send frame message")
+
+    def terminate(self) -> None:
+        """Tell the client to terminate."""
+        if self.__alive:
+            try:
+                self.__sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self.__sock.close()
+            self.__alive = False
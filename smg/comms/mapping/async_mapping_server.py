@@ -0,0 +1,356 @@
+import asyncio
+import numpy as np
+import socket
+import threading
+
+from typing import Callable, Dict, Optional, List, Set, Tuple, Union
+
+from smg.utility import PooledQueue
+
+from ..base import AsyncSocketUtil, FrameMessage, FrameMessageLease, Message, SocketUtil
+from .mapping_client_handler import MappingClientHandler
+
+
+class AsyncMappingServer:
+    """An asyncio-based server that can be used to communicate with remote mapping clients."""
+
+    # CONSTRUCTOR
+
+    def __init__(self, port: Union[int, str] = 7851, *,
+                 frame_decoder: Optional[Callable[[FrameMessage, FrameMessage], None]] = None,
+                 frame_decompressor: Optional[Callable[[FrameMessage], FrameMessage]] = None,
+                 frame_window_size: int = 5, latest_wins: bool = False, lazy_decompression: bool = False,
+                 pool_empty_strategy: PooledQueue.EPoolEmptyStrategy = PooledQueue.PES_DISCARD):
+        """
+        Construct an asyncio-based mapping server.
+
+        .. note::
+            This speaks the same protocol as MappingServer, but communicates with all of its clients from
+            coroutines running on the event loop, rather than from separate threads. The frames received
+            from each client are managed by a MappingClientHandler, exactly as for MappingServer.
+        .. note::
+            Since received frames are processed on the event loop, PES_WAIT should not be used (it would block the
+            loop whilst the consumer catches up). The frame decoder or decompressor will also run on the event loop,
+            so lazy decompression is recommended, to defer that work until the frames are actually consumed.
+
+        :param port:                The port on which the server should listen for connections, or the path of the
+                                    Unix domain socket on which to listen.
+        :param frame_decoder:       An optional function to use to decompress received frames directly into the
+                                    messages stored by the client handlers (takes precedence over frame_decompressor).
+        :param frame_decompressor:  An optional function to use to decompress received frames.
+        :param frame_window_size:   The maximum number of frames each client may have in flight at once.
+        :param latest_wins:         Whether a frame received by a client handler whilst its frame message queue is
+                                    full should overwrite the oldest unconsumed frame on the queue, rather than being
+                                    discarded (this can only be used with the PES_DISCARD pool empty strategy).
+        :param lazy_decompression:  Whether to defer decompressing each received frame until it is actually passed
+                                    to a frame receiver.
+        :param pool_empty_strategy: The strategy to use when a frame message is received by a client handler whilst
+                                    the pool of frames associated with its frame message queue is empty.
+        """
+        if latest_wins and pool_empty_strategy != PooledQueue.PES_DISCARD:
+            raise RuntimeError("Error: Latest-wins mode can only be used with the PES_DISCARD pool empty strategy")
+
+        self.__client_handlers = {}                       # type: Dict[int, MappingClientHandler]
+        self.__client_tasks = []                          # type: List[asyncio.Future]
+        self.__finished_clients = set()                   # type: Set[int]
+        self.__frame_decoder = frame_decoder              # type: Optional[Callable[[FrameMessage, FrameMessage], None]]
+        self.__frame_decompressor = frame_decompressor    # type: Optional[Callable[[FrameMessage], FrameMessage]]
+        self.__frame_window_size = frame_window_size      # type: int
+        self.__latest_wins = latest_wins                  # type: bool
+        self.__lazy_decompression = lazy_decompression    # type: bool
+        self.__next_client_id = 0                         # type: int
+        self.__pool_empty_strategy = pool_empty_strategy  # type: PooledQueue.EPoolEmptyStrategy
+        self.__port = port                                # type: Union[int, str]
+        self.__server_sock = None                         # type: Optional[socket.SocketType]
+        self.__server_task = None                         # type: Optional[asyncio.Future]
+        self.__should_terminate = threading.Event()       # type: threading.Event
+
+        # An event that is set (and then replaced) whenever anything happens that a consumer might be waiting for,
+        # e.g. a client becoming ready, a frame arriving or a client finishing. (This is created in start, so that
+        # it is associated with the right event loop.)
+        self.__changed = None                             # type: Optional[asyncio.Event]
+
+    # SPECIAL METHODS
+
+    async def __aenter__(self):
+        """Start the server (this allows the server's lifetime to be managed by an async with statement)."""
+        self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """Destroy the server at the end of the async with statement that's used to manage its lifetime."""
+        await self.terminate()
+
+    # PUBLIC METHODS
+
+    async def get_frame(self, client_id: int, receiver: Callable[[FrameMessage], None]) -> bool:
+        """
+        Get the oldest frame from the specified client that has not yet been processed.
+
+        .. note::
+            Unlike MappingServer.get_frame, this returns False (rather than blocking forever) if the client finishes
+            (or the server terminates) before a frame becomes available.
+
+        :param client_id:   The ID of the client.
+        :param receiver:    The frame receiver to which to pass the oldest frame from the client that has not
+                            yet been processed.
+        :return:            True, if a frame was passed to the receiver, or False otherwise.
+        """
+        while not self.has_frames_now(client_id):
+            if self.has_finished(client_id) or self.__should_terminate.is_set():
+                return False
+            await self.__changed.wait()
+
+        self.__client_handlers[client_id].get_frame(receiver)
+        self.__notify_changed()
+        return True
+
+    async def get_frames(self, client_id: int, receiver: Callable[[List[FrameMessage]], None],
+                         max_frames: int) -> int:
+        """
+        Get up to the specified number of the oldest frames from the specified client that have not yet been
+        processed, and pass them to the receiver as a batch (see MappingServer.get_frames).
+
+        .. note::
+            As with get_frame, this returns 0 (rather than blocking forever) if the client finishes (or the server
+            terminates) before a frame becomes available.
+
+        :param client_id:   The ID of the client.
+        :param receiver:    The receiver to which to pass the batch of frames (oldest first).
+        :param max_frames:  The maximum number of frames to pass to the receiver.
+        :return:            The number of frames passed to the receiver.
+        """
+        while not self.has_frames_now(client_id):
+            if self.has_finished(client_id) or self.__should_terminate.is_set():
+                return 0
+            await self.__changed.wait()
+
+        frame_count = self.__client_handlers[client_id].get_frames(receiver, max_frames)  # type: int
+        self.__notify_changed()
+        return frame_count
+
+    def get_frames_overwritten(self, client_id: int) -> int:
+        """
+        Get the number of frames from the specified client that were overwritten on its frame message queue (in
+        latest-wins mode) before they could be consumed.
+
+        :param client_id:   The ID of the client.
+        :return:            The number of frames from the client that were overwritten, if the client is active,
+                            or 0 otherwise.
+        """
+        client_handler = self.__client_handlers.get(client_id)  # type: Optional[MappingClientHandler]
+        return client_handler.get_frames_overwritten() if client_handler is not None else 0
+
+    def get_image_shapes(self, client_id: int) -> Optional[List[Tuple[int, int, int]]]:
+        """
+        Try to get the shapes of the images being produced by the different cameras being used by the specified client.
+
+        :param client_id:   The ID of the client.
+        :return:            The shapes of the images being produced by the different cameras, if the client
+                            is active and a calibration message has been received from it, or None otherwise.
+        """
+        client_handler = self.__client_handlers.get(client_id)  # type: Optional[MappingClientHandler]
+        return client_handler.get_image_shapes() if client_handler is not None else None
+
+    def get_intrinsics(self, client_id: int) -> Optional[List[Tuple[float, float, float, float]]]:
+        """
+        Try to get the intrinsics of the different cameras being used by the specified client.
+
+        :param client_id:   The ID of the client.
+        :return:            The intrinsics of the different cameras being used by the specified client
+                            as a list of (fx,fy,cx,cy) tuples, if the client is active and a calibration
+                            message has been received from it, or None otherwise.
+        """
+        client_handler = self.__client_handlers.get(client_id)  # type: Optional[MappingClientHandler]
+        return client_handler.get_intrinsics() if client_handler is not None else None
+
+    def get_newest_pose(self, client_id: int) -> Optional[Tuple[int, np.ndarray]]:
+        """
+        Try to get the newest pose received from the specified client.
+
+        .. note::
+            This includes the poses in any pose-only updates sent by the client (see MappingClient).
+
+        :param client_id:   The ID of the client.
+        :return:            A tuple consisting of the frame index and the pose, if the client is active and any
+                            frame has been received from it, or None otherwise.
+        """
+        client_handler = self.__client_handlers.get(client_id)  # type: Optional[MappingClientHandler]
+        return client_handler.get_newest_pose() if client_handler is not None else None
+
+    def has_finished(self, client_id: int) -> bool:
+        """
+        Get whether or not the specified client has finished.
+
+        :param client_id:   The ID of the client to check.
+        :return:            True, if the client has finished, or False otherwise.
+        """
+        return client_id in self.__finished_clients
+
+    def has_frames_now(self, client_id: int) -> bool:
+        """
+        Get whether or not the specified client is currently active and ready to yield a frame.
+
+        :param client_id:   The ID of the client to check.
+        :return:            True, if the client is currently active and ready to yield a frame, or False otherwise.
+        """
+        client_handler = self.__client_handlers.get(client_id)  # type: Optional[MappingClientHandler]
+        return client_handler.has_frames_now() if client_handler is not None else False
+
+    def has_more_frames(self, client_id: int) -> bool:
+        """
+        Get whether or not the specified client is currently active and may still have more frames to yield.
+
+        :param client_id:   The ID of the client to check.
+        :return:            True, if the client is currently active and may still have more frames to yield,
+                            or False otherwise.
+        """
+        return not self.has_finished(client_id)
+
+    async def lease_frame(self, client_id: int) -> Optional[FrameMessageLease]:
+        """
+        Lease the oldest frame from the specified client that has not yet been processed (see
+        MappingServer.lease_frame).
+
+        .. note::
+            As with get_frame, this returns None (rather than blocking forever) if the client finishes (or the server
+            terminates) before a frame becomes available.
+
+        :param client_id:   The ID of the client.
+        :return:            A lease on the frame, if one could be obtained, or None otherwise.
+        """
+        while not self.has_frames_now(client_id):
+            if self.has_finished(client_id) or self.__should_terminate.is_set():
+                return None
+            await self.__changed.wait()
+
+        lease = self.__client_handlers[client_id].lease_frame()  # type: Optional[FrameMessageLease]
+        self.__notify_changed()
+        return lease
+
+    def peek_newest_frame(self, client_id: int, receiver: Callable[[FrameMessage], None]) -> bool:
+        """
+        Peek at the newest frame from the specified client.
+
+        :param client_id:   The ID of the client.
+        :param receiver:    The frame receiver to which to pass the newest frame from the client.
+        :return:            True, if a newest frame existed and was passed to the receiver, or False otherwise.
+        """
+        client_handler = self.__client_handlers.get(client_id)  # type: Optional[MappingClientHandler]
+        if client_handler is not None:
+            return client_handler.peek_newest_frame(receiver)
+        else:
+            return False
+
+    def start(self) -> None:
+        """Start the server (this must be called from a coroutine running on the event loop)."""
+        self.__changed = asyncio.Event()
+
+        self.__server_sock = SocketUtil.make_server_socket(self.__port)
+        self.__server_sock.listen(5)
+        self.__server_sock.setblocking(False)
+
+        print("Listening for connections on {}...".format(
+            SocketUtil.format_endpoint(SocketUtil.make_server_endpoint(self.__port))
+        ))
+
+        self.__server_task = asyncio.ensure_future(self.__run_server())
+
+    async def terminate(self) -> None:
+        """Tell the server to terminate."""
+        if not self.__should_terminate.is_set():
+            self.__should_terminate.set()
+            self.__notify_changed()
+
+            tasks = list(self.__client_tasks)  # type: List[asyncio.Future]
+            if self.__server_task is not None:
+                tasks = tasks + [self.__server_task]
+
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+            if self.__server_sock is not None:
+                SocketUtil.close_server_socket(self.__server_sock)
+
+    # PRIVATE METHODS
+
+    async def __handle_client(self, client_handler: MappingClientHandler, client_sock: socket.SocketType) -> None:
+        """
+        Handle messages from a client.
+
+        :param client_handler:  The handler for the client.
+        :param client_sock:     The socket used to communicate with the client.
+        """
+        client_id = client_handler.get_client_id()  # type: int
+        print("Starting client: {}".format(client_id))
+
+        try:
+            # Repeatedly read the message the handler is expecting, process it, and send any reply to the client.
+            # Loop until the connection drops.
+            while True:
+                msg = client_handler.get_pending_message()  # type: Message
+                if not await AsyncSocketUtil.read_message(client_sock, msg):
+                    break
+
+                reply_msg = client_handler.process_pending_message()  # type: Optional[Message]
+                if reply_msg is not None and not await AsyncSocketUtil.write_message(client_sock, reply_msg):
+                    break
+
+                # If the client has just become ready, add its handler to the dictionary of handlers for active
+                # clients. Either way, let any consumers know that something has changed.
+                if client_id not in self.__client_handlers and client_handler.get_image_shapes() is not None:
+                    self.__client_handlers[client_id] = client_handler
+                    print("Client ready: {}".format(client_id))
+
+                self.__notify_changed()
+
+            # Before stopping the client, wait until the client's frame message queue has fully drained.
+            print("Waiting for client's queue to drain: {}".format(client_id))
+            while client_handler.has_frames_now():
+                await self.__changed.wait()
+        finally:
+            # Once the client's finished (or the server is terminating), add it to the finished clients set
+            # and remove its handler.
+            print("Stopping client: {}".format(client_id))
+            client_sock.close()
+            self.__finished_clients.add(client_id)
+            self.__client_handlers.pop(client_id, None)
+            client_handler.close()
+            self.__notify_changed()
+            print("Client terminated: {}".format(client_id))
+
+    def __notify_changed(self) -> None:
+        """Wake up any consumers that are waiting for something to change."""
+        if self.__changed is not None:
+            self.__changed.set()
+            self.__changed = asyncio.Event()
+
+    async def __run_server(self) -> None:
+        """Run the server."""
+        loop = asyncio.get_event_loop()  # type: asyncio.AbstractEventLoop
+
+        while True:
+            # Accept a client connection, and make a handler for the client.
+            client_sock, client_endpoint = await loop.sock_accept(self.__server_sock)
+            client_sock.setblocking(False)
+
+            print("Accepted connection from client {} @ {}".format(self.__next_client_id, client_endpoint))
+
+            client_handler = MappingClientHandler(
+                self.__next_client_id, client_sock, self.__should_terminate,
+                frame_decoder=self.__frame_decoder,
+                frame_decompressor=self.__frame_decompressor,
+                frame_window_size=self.__frame_window_size,
+                latest_wins=self.__latest_wins,
+                lazy_decompression=self.__lazy_decompression,
+                pool_empty_strategy=self.__pool_empty_strategy
+            )  # type: MappingClientHandler
+            self.__next_client_id += 1
+
+            # Start a task to communicate with the client.
+            client_task = asyncio.ensure_future(
+                self.__handle_client(client_handler, client_sock)
+            )  # type: asyncio.Future
+            client_task.add_done_callback(self.__client_tasks.remove)
+            self.__client_tasks.append(client_task)
@@ -1,11 +1,18 @@
+import numpy as np
 import socket
 import threading
+import time
 
-from typing import Callable, cast, Optional, Tuple
+from typing import Callable, cast, Dict, List, Optional, Tuple, Union
 
 from smg.utility import PooledQueue
 
-from ..base import AckMessage, CalibrationMessage, FrameHeaderMessage, FrameMessage, SocketUtil
+from ..base import AckMessage, CalibrationMessage, DataMessage, FrameHeaderMessage, FrameMessage, Message, \
+    RGBDFrameCompressor, SharedFrameMessage, SimpleMessage, SocketUtil
+from .adaptive_bitrate_controller import AdaptiveBitrateController
+from .mapping_client_handler import MappingClientHandler
+from .mapping_server import MappingServer
+from .pose_keyframe_gate import PoseKeyframeGate
 
 
 class MappingClient:
@@ -13,31 +20,126 @@ class MappingClient:
 
     # CONSTRUCTOR
 
-    def __init__(self, endpoint: Tuple[str, int] = ("127.0.0.1", 7851), *, timeout: int = 10,
+    def __init__(self, endpoint: Union[Tuple[str, int], str, MappingServer] = ("127.0.0.1", 7851), *,
+                 timeout: int = 10, bitrate_controller: Optional[AdaptiveBitrateController] = None,
+                 compression_threads: int = 0,
                  frame_compressor: Optional[Callable[[FrameMessage], FrameMessage]] = None,
-                 pool_empty_strategy: PooledQueue.EPoolEmptyStrategy = PooledQueue.PES_DISCARD):
+                 frame_window_size: int = 1, keyframe_gate: Optional[PoseKeyframeGate] = None,
+                 pool_empty_strategy: PooledQueue.EPoolEmptyStrategy = PooledQueue.PES_DISCARD,
+                 shared_memory: bool = False):
         """
         Construct a mapping client.
 
-        :param endpoint:            The server host and port, e.g. ("127.0.0.1", 7851).
+        .. note::
+            By default, the client waits for the server to acknowledge each frame before sending the next one,
+            which limits the frame rate to one frame per round trip. If a frame window size greater than one is
+            specified, the client will instead allow up to that many frames to be in flight (i.e. sent, but not
+            yet acknowledged) at once, subject to the number of credits granted by the server.
+        .. note::
+            By default, frames are compressed (if requested) on the same thread that sends them to the server. If a
+            positive number of compression threads is specified, frames will instead be compressed on separate
+            threads, allowing the next frame(s) to be compressed whilst the current one is being transmitted. At
+            most as many compressed frames as there are compression threads will be waiting to be sent at once.
+            However, if the frame compressor is an RGBDFrameCompressor that is using stateful codecs (e.g. a
+            TileDeltaImageCodec), the frames are compressed one at a time, in order, since each frame is encoded
+            relative to the previous one. (Other frame compressors are assumed to be stateless.) Each frame is moved
+            out of the frame message queue without being copied, but the compressed frames are allocated afresh,
+            since their sizes vary from one frame to the next.
+        .. note::
+            If shared memory is requested, the client must be connected to the shared memory port of a mapping server
+            running on the same machine. Rather than sending each frame over the socket, the client writes it into
+            a frame message in shared memory, and sends only the index of the block of shared memory that contains
+            it. The messages in the pool associated with the frame message queue are themselves backed by shared
+            memory, so each frame is written there directly, and then moved (without being copied) into the next
+            slot of a ring of frame messages (with one slot per frame that can be in flight) when it's sent. Frames
+            sent in this way are never compressed, since the cost of copying an uncompressed frame is far lower
+            than the cost of compressing it.
+        .. note::
+            If the endpoint is a mapping server in the same process, the client will connect to it directly rather
+            than via a socket. Each frame is then written by send_frame_message straight into a message from the
+            pool associated with the server's frame message queue, and handed to the server by reference, so no
+            copies are made. In this case, frames are never compressed, and no threads are used by the client.
+        .. note::
+            If a bitrate controller is specified, frames will be compressed by the controller's frame compressor
+            (so no other frame compressor may be specified), and the client will report the time taken to send
+            each frame and the occupancy of its frame message queue to the controller, allowing it to adapt the
+            codecs being used to the bandwidth available.
+        .. note::
+            If a keyframe gate is specified, only frames that it deems to be keyframes (based on the poses of their
+            first images) will be sent in full. For each other frame, a pose-only update (containing the frame index,
+            timestamp and poses, but no images) will be sent instead, so that the server can still track the camera.
+            Keyframe gating is not supported when sending frames via shared memory or to a server in the same process.
+
+        :param endpoint:            The server host and port, e.g. ("127.0.0.1", 7851), the path of the server's
+                                    Unix domain socket, or a (started) mapping server in the same process.
         :param timeout:             The socket timeout to use (in seconds).
+        :param bitrate_controller:  An optional controller to use to adapt the compression to the link conditions.
+        :param compression_threads: The number of threads on which to compress frames (0 means use the sender thread).
         :param frame_compressor:    An optional function to use to compress frames prior to transmission.
+        :param frame_window_size:   The maximum number of frames the client would like to have in flight at once.
+        :param keyframe_gate:       An optional gate to use to decide which frames to send in full.
         :param pool_empty_strategy: The strategy to use when an attempt is made to send a frame message whilst the
                                     pool of frames associated with the frame message queue is empty.
+        :param shared_memory:       Whether to send frames to the server via shared memory (requires Python 3.8+).
         """
-        self.__alive = False                         # type: bool
-        self.__calib_msg = None                      # type: Optional[CalibrationMessage]
-        self.__frame_compressor = frame_compressor   # type: Optional[Callable[[FrameMessage], FrameMessage]]
+        if bitrate_controller is not None:
+            if frame_compressor is not None:
+                raise RuntimeError("Error: Cannot specify both a bitrate controller and a frame compressor")
+            frame_compressor = bitrate_controller.get_frame_compressor()
+
+        if keyframe_gate is not None and (shared_memory or isinstance(endpoint, MappingServer)):
+            raise RuntimeError("Error: Keyframe gating is only supported when sending frames over a socket")
+
+        self.__alive = False                           # type: bool
+        self.__bitrate_controller = bitrate_controller  # type: Optional[AdaptiveBitrateController]
+        self.__calib_msg = None                        # type: Optional[CalibrationMessage]
+        self.__compression_threads = []                # type: List[threading.Thread]
+        self.__frame_compressor = frame_compressor     # type: Optional[Callable[[FrameMessage], FrameMessage]]
         self.__frame_message_queue = PooledQueue[FrameMessage](pool_empty_strategy)  # type: PooledQueue[FrameMessage]
-        self.__message_sender_thread = None          # type: Optional[threading.Thread]
-        self.__should_terminate = threading.Event()  # type: threading.Event
+        self.__frame_window_size = frame_window_size   # type: int
+        self.__keyframe_gate = keyframe_gate           # type: Optional[PoseKeyframeGate]
+        self.__loopback_handler = None                 # type: Optional[MappingClientHandler]
+        self.__loopback_server = None                  # type: Optional[MappingServer]
+        self.__message_sender_thread = None            # type: Optional[threading.Thread]
+        self.__ring = []                               # type: List[SharedFrameMessage]
+        self.__shared_frame_msgs = []                  # type: List[SharedFrameMessage]
+        self.__shared_memory = shared_memory           # type: bool
+        self.__shared_memory_indices = {}              # type: Dict[str, int]
+        self.__should_terminate = threading.Event()    # type: threading.Event
+
+        # The state needed for the compression stage (if any). Frames taken from the frame message queue for
+        # compression are given consecutive sequence numbers, so that the sender thread can send them in the
+        # right order even if they finish being compressed out of order.
+        self.__compressed_frame_capacity = compression_threads  # type: int
+        self.__compressed_frames = {}                           # type: Dict[int, FrameMessage]
+        self.__next_frame_to_compress = 0                       # type: int
+        self.__next_frame_to_send = 0                           # type: int
+        self.__pipelined = compression_threads > 0 and frame_compressor is not None \
+            and not shared_memory  # type: bool
+
+        self.__compression_lock = threading.Lock()        # type: threading.Lock
+        self.__compressed_frames_lock = threading.Lock()  # type: threading.Lock
+        self.__compressed_frames_changed = threading.Condition(
+            self.__compressed_frames_lock
+        )  # type: threading.Condition
+
+        # If the endpoint is a mapping server in the same process, we'll connect to it when the calibration is sent.
+        if isinstance(endpoint, MappingServer):
+            self.__loopback_server = endpoint
+            self.__alive = True
+            return
 
         try:
-            self.__sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)  # type: socket.SocketType
+            self.__sock = SocketUtil.make_socket(endpoint)  # type: socket.SocketType
             self.__sock.connect(endpoint)
             self.__sock.settimeout(timeout)
+
+            # If we're sending frames via shared memory, only small messages will be sent over the socket, so disable
+            # Nagle's algorithm to stop them being delayed.
+            if shared_memory and not SocketUtil.is_unix_socket(self.__sock):
+                self.__sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
             self.__alive = True
-        except ConnectionRefusedError:
+        except (ConnectionRefusedError, FileNotFoundError):
             raise RuntimeError("Error: Could not connect to the server")
 
     # DESTRUCTOR
@@ -64,6 +166,12 @@ class MappingClient:
 
         :param calib_msg:   The calibration message.
         """
+        # If we're connecting to a mapping server in the same process, hand the calibration to it directly.
+        if self.__loopback_server is not None:
+            self.__loopback_handler = self.__loopback_server.connect_loopback_client(calib_msg)
+            self.__calib_msg = calib_msg
+            return
+
         connection_ok = True  # type: bool
 
         # Send the message to the server.
@@ -79,11 +187,36 @@ class MappingClient:
         else:
             raise RuntimeError("Error: Failed to send calibration message")
 
-        # Initialise the frame message queue.
+        # Limit the frame window size to the number of credits granted by the server in its acknowledgement. Note
+        # that servers that don't support windowing grant no credits, in which case we fall back to waiting for
+        # each frame to be acknowledged before sending the next one.
+        self.__frame_window_size = max(min(self.__frame_window_size, ack_msg.extract_value()), 1)
+
+        # If we're sending frames via shared memory, make the ring of frame messages to use (together with the
+        # messages for the pool associated with the frame message queue), and send the names of the blocks of
+        # shared memory that back them to the server.
         capacity = 1  # type: int
-        self.__frame_message_queue.initialise(capacity, lambda: FrameMessage(
-            calib_msg.get_image_shapes(), calib_msg.get_uncompressed_image_byte_sizes()
-        ))
+        if self.__shared_memory and not self.__send_ring(calib_msg, capacity):
+            raise RuntimeError("Error: Failed to send shared memory ring")
+
+        # Initialise the frame message queue. If we're sending frames via shared memory, the pool uses the messages
+        # in shared memory that were made for it (if the pool grows beyond those, the extra frames are copied into
+        # the ring when they're sent).
+        pool_frame_msgs = self.__shared_frame_msgs[len(self.__ring):]  # type: List[FrameMessage]
+
+        def make_frame_message() -> FrameMessage:
+            if len(pool_frame_msgs) > 0:
+                return pool_frame_msgs.pop()
+            return FrameMessage(calib_msg.get_image_shapes(), calib_msg.get_uncompressed_image_byte_sizes())
+
+        self.__frame_message_queue.initialise(capacity, make_frame_message)
+
+        # If we're compressing frames on separate threads, start the compression threads.
+        if self.__pipelined:
+            for _ in range(self.__compressed_frame_capacity):
+                compression_thread = threading.Thread(target=self.__run_compressor)  # type: threading.Thread
+                compression_thread.start()
+                self.__compression_threads.append(compression_thread)
 
         # Start the message sender thread.
         self.__message_sender_thread = threading.Thread(target=self.__run_message_sender)
@@ -100,6 +233,16 @@ class MappingClient:
 
         :param frame_filler:    A callback function that should fill in the contents of a message.
         """
+        # If we're connected to a mapping server in the same process, push the frame straight onto its queue.
+        if self.__loopback_handler is not None:
+            self.__loopback_handler.push_frame(frame_filler)
+            return
+
+        # If we're adapting the compression to the link conditions, record whether the previous frame is still
+        # waiting to be sent (if so, the link is not keeping up).
+        if self.__bitrate_controller is not None:
+            self.__bitrate_controller.record_frame_submitted(not self.__frame_message_queue.empty())
+
         with self.__frame_message_queue.begin_push(self.__should_terminate) as push_handler:
             elt = push_handler.get()  # type: Optional[FrameMessage]
             if elt is not None:
@@ -110,48 +253,255 @@ class MappingClient:
         """Tell the client to terminate."""
         if self.__alive:
             self.__should_terminate.set()
+            for compression_thread in self.__compression_threads:
+                compression_thread.join()
             if self.__message_sender_thread is not None:
                 self.__message_sender_thread.join()
-            self.__sock.shutdown(socket.SHUT_RDWR)
-            self.__sock.close()
+            if self.__loopback_handler is not None:
+                self.__loopback_handler.disconnect_loopback()
+            if self.__loopback_server is None:
+                self.__sock.shutdown(socket.SHUT_RDWR)
+                self.__sock.close()
+            for shared_frame_msg in self.__shared_frame_msgs:
+                shared_frame_msg.unlink()
+            self.__ring = []
+            self.__shared_frame_msgs = []
             self.__alive = False
 
     # PRIVATE METHODS
 
+    def __is_compressor_stateful(self) -> bool:
+        """
+        Determine whether the frame compressor is currently using stateful codecs.
+
+        .. note::
+            This is checked for each frame, since the codecs can change mid-stream (e.g. see AdaptiveBitrateController).
+
+        :return:    True, if the frame compressor is currently using stateful codecs, or False otherwise.
+        """
+        return isinstance(self.__frame_compressor, RGBDFrameCompressor) and self.__frame_compressor.is_stateful()
+
+    def __is_keyframe(self, frame_msg: FrameMessage) -> bool:
+        """
+        Determine whether a frame should be sent in full (rather than as a pose-only update).
+
+        :param frame_msg:   The frame message.
+        :return:            True, if the frame should be sent in full, or False otherwise.
+        """
+        return self.__keyframe_gate is None or self.__keyframe_gate.is_keyframe(frame_msg.get_pose(0))
+
+    def __run_compressor(self) -> None:
+        """Compress frame messages from the message queue, and make them available to the sender thread."""
+        # Allocate a frame message into which to move each frame prior to compressing it. Moving the frame allows
+        # it to be removed from the queue before it's compressed, so that the next frame can be submitted (and
+        # potentially taken by another compression thread) in the meantime.
+        uncompressed_frame_msg = FrameMessage(
+            self.__calib_msg.get_image_shapes(), self.__calib_msg.get_uncompressed_image_byte_sizes()
+        )  # type: FrameMessage
+
+        while not self.__should_terminate.is_set():
+            # Take the first frame message from the queue, together with the next sequence number. We do this whilst
+            # holding the compression lock so that frames are taken from the queue in sequence number order.
+            with self.__compression_lock:
+                # Wait until there's space for another compressed frame, or the termination flag is set.
+                with self.__compressed_frames_lock:
+                    while self.__next_frame_to_compress - self.__next_frame_to_send \
+                            >= self.__compressed_frame_capacity and not self.__should_terminate.is_set():
+                        self.__compressed_frames_changed.wait(0.1)
+
+                # Try to read the first frame message from the queue (this will block until a message is available,
+                # except when the termination flag is set, in which case it will return None).
+                frame_msg = self.__frame_message_queue.peek(self.__should_terminate)  # type: Optional[FrameMessage]
+
+                # If the termination flag is set, exit.
+                if self.__should_terminate.is_set():
+                    break
+
+                # Move the frame into our own message by swapping their data (so no copy is made), and then remove
+                # the message from the queue (returning it to the pool).
+                uncompressed_frame_msg.swap_data(frame_msg)
+                self.__frame_message_queue.pop(self.__should_terminate)
+
+                # Determine whether the frame should be sent in full (this must be done in sequence number order).
+                keyframe = self.__is_keyframe(uncompressed_frame_msg)  # type: bool
+
+                with self.__compressed_frames_lock:
+                    sequence_number = self.__next_frame_to_compress  # type: int
+                    self.__next_frame_to_compress += 1
+
+                # If the frame compressor is using stateful codecs, the frames must be encoded in sequence number
+                # order, so compress the frame whilst still holding the compression lock.
+                compressed_frame_msg = None  # type: Optional[FrameMessage]
+                if keyframe and self.__is_compressor_stateful():
+                    compressed_frame_msg = self.__frame_compressor(uncompressed_frame_msg)
+
+            # Compress the frame (or make a pose-only update from it), unless that's already been done, and make it
+            # available to the sender thread.
+            if compressed_frame_msg is None:
+                if keyframe:
+                    compressed_frame_msg = self.__frame_compressor(uncompressed_frame_msg)
+                else:
+                    compressed_frame_msg = FrameMessage.make_pose_only(uncompressed_frame_msg)
+            with self.__compressed_frames_lock:
+                self.__compressed_frames[sequence_number] = compressed_frame_msg
+                self.__compressed_frames_changed.notify_all()
+
+            # If the compressor simply returned the frame it was given, we'll need a new frame to move into.
+            if compressed_frame_msg is uncompressed_frame_msg:
+                uncompressed_frame_msg = FrameMessage(
+                    self.__calib_msg.get_image_shapes(), self.__calib_msg.get_uncompressed_image_byte_sizes()
+                )
+
     def __run_message_sender(self) -> None:
         """Send frame messages from the message queue across to the server."""
         ack_msg = AckMessage()  # type: AckMessage
 
         connection_ok = True  # type: bool
 
+        frames_acked = 0  # type: int
+        frames_sent = 0   # type: int
+
         while connection_ok and not self.__should_terminate.is_set():
-            # Try to read the first frame message from the queue (this will block until a message is available,
-            # except when the termination flag is set, in which case it will return None).
-            frame_msg = self.__frame_message_queue.peek(self.__should_terminate)  # type: Optional[FrameMessage]
-
-            # If the termination flag is set, exit.
-            if self.__should_terminate.is_set():
-                break
-
-            # If requested, compress the frame prior to transmission.
-            compressed_frame_msg = frame_msg  # type: FrameMessage
-            if self.__frame_compressor is not None:
-                compressed_frame_msg = self.__frame_compressor(frame_msg)
-
-            # Make the frame header message.
-            header_msg = FrameHeaderMessage(self.__calib_msg.get_max_images())  # type: FrameHeaderMessage
-            header_msg.set_image_byte_sizes(compressed_frame_msg.get_image_byte_sizes())
-            header_msg.set_image_shapes(compressed_frame_msg.get_image_shapes())
-
-            # First send the frame header message, then send the frame message, then wait for an acknowledgement
-            # from the server. We chain all of these with 'and' so as to early out in case of failure.
-            connection_ok = connection_ok and \
-                SocketUtil.write_message(self.__sock, header_msg) and \
-                SocketUtil.write_message(self.__sock, compressed_frame_msg) and \
-                SocketUtil.read_message(self.__sock, ack_msg)
-
-            # If the frame message was successfully sent, remove it from the queue. If not, set the termination flag.
+            # If we're compressing frames on separate threads:
+            if self.__pipelined:
+                # Try to get the next compressed frame (this will block until the frame is available, except
+                # when the termination flag is set, in which case it will return None).
+                compressed_frame_msg = self.__take_compressed_frame()  # type: Optional[FrameMessage]
+
+                # If the termination flag is set, exit.
+                if self.__should_terminate.is_set():
+                    break
+
+                frame_start = time.perf_counter()  # type: float
+
+            # Otherwise:
+            else:
+                # Try to read the first frame message from the queue (this will block until a message is available,
+                # except when the termination flag is set, in which case it will return None).
+                frame_msg = self.__frame_message_queue.peek(self.__should_terminate)  # type: Optional[FrameMessage]
+
+                # If the termination flag is set, exit.
+                if self.__should_terminate.is_set():
+                    break
+
+                frame_start = time.perf_counter()
+
+                # If the frame isn't to be sent in full, make a pose-only update from it. Otherwise, if requested,
+                # compress the frame prior to transmission (unless we're using shared memory).
+                compressed_frame_msg = frame_msg
+                if not self.__is_keyframe(frame_msg):
+                    compressed_frame_msg = FrameMessage.make_pose_only(frame_msg)
+                elif self.__frame_compressor is not None and not self.__shared_memory:
+                    compressed_frame_msg = self.__frame_compressor(frame_msg)
+
+            # If we're sending frames via shared memory, move the frame into the next slot in the ring, and make a
+            # message containing the index of the block of shared memory that now backs the slot. Note that the slot
+            # can't still be in use by the server, since there's one slot for each frame that can be in flight, so
+            # the block it previously held can safely be handed back to the frame message queue. Otherwise, make the
+            # frame header message, and send it together with the frame message itself.
+            if self.__shared_memory:
+                slot = self.__ring[frames_sent % len(self.__ring)]  # type: SharedFrameMessage
+                if isinstance(compressed_frame_msg, SharedFrameMessage):
+                    slot.swap_data(compressed_frame_msg)
+                else:
+                    np.copyto(slot.get_data(), compressed_frame_msg.get_data())
+
+                block_idx = self.__shared_memory_indices[slot.get_shared_memory_name()]  # type: int
+                msgs = [SimpleMessage[int](int, block_idx)]  # type: List[Message]
+            else:
+                header_msg = FrameHeaderMessage(self.__calib_msg.get_max_images())  # type: FrameHeaderMessage
+                header_msg.set_image_byte_sizes(compressed_frame_msg.get_image_byte_sizes())
+                header_msg.set_image_codec_ids(compressed_frame_msg.get_image_codec_ids())
+                header_msg.set_image_shapes(compressed_frame_msg.get_image_shapes())
+                msgs = [header_msg, compressed_frame_msg]
+
+            # If we're not using a frame window:
+            if self.__frame_window_size == 1:
+                # First send the messages for the frame (together), then wait for an acknowledgement from the
+                # server. We chain these with 'and' so as to early out in case of failure.
+                connection_ok = connection_ok and \
+                    SocketUtil.write_messages(self.__sock, *msgs) and \
+                    SocketUtil.read_message(self.__sock, ack_msg)
+
+                if connection_ok:
+                    frames_sent += 1
+
+            # Otherwise:
+            else:
+                # Send the messages for the frame (together).
+                connection_ok = connection_ok and SocketUtil.write_messages(self.__sock, *msgs)
+
+                if connection_ok:
+                    frames_sent += 1
+
+                # If the window is now full, wait for acknowledgements from the server until a credit becomes free.
+                # Note that the server's acknowledgements are cumulative, i.e. each one contains the total number
+                # of frames received so far, so any single acknowledgement can free up several credits at once.
+                while connection_ok and frames_sent - frames_acked >= self.__frame_window_size:
+                    connection_ok = SocketUtil.read_message(self.__sock, ack_msg, self.__should_terminate)
+                    if connection_ok:
+                        frames_acked = max(frames_acked, ack_msg.extract_value())
+
+            # If the frame message was successfully sent (and, if necessary, acknowledged), remove it from the queue
+            # (if it hasn't already been removed by a compression thread). If not, set the termination flag.
             if connection_ok:
-                self.__frame_message_queue.pop(self.__should_terminate)
+                if not self.__pipelined:
+                    self.__frame_message_queue.pop(self.__should_terminate)
+
+                # If we're adapting the compression to the link conditions, record how long the frame took to send.
+                if self.__bitrate_controller is not None and not compressed_frame_msg.is_pose_only():
+                    self.__bitrate_controller.record_frame_sent(time.perf_counter() - frame_start)
             else:
                 self.__should_terminate.set()
+
+    def __send_ring(self, calib_msg: CalibrationMessage, capacity: int) -> bool:
+        """
+        Make the ring of frame messages in shared memory via which to send frames, together with the messages in
+        shared memory for the pool associated with the frame message queue, and send the names of the blocks of
+        shared memory that back them to the server.
+
+        .. note::
+            Since frames are moved from the frame message queue into the ring by swapping the blocks of shared memory
+            that back the messages, any of the blocks can end up in any of the slots, so the server must be told
+            about all of them. The index of a block is its position in the list of names sent.
+
+        :param calib_msg:   The calibration message.
+        :param capacity:    The capacity of the frame message queue.
+        :return:            True, if the names were successfully sent, or False otherwise.
+        """
+        self.__shared_frame_msgs = [
+            SharedFrameMessage(calib_msg.get_image_shapes(), calib_msg.get_uncompressed_image_byte_sizes())
+            for _ in range(self.__frame_window_size + capacity)
+        ]
+        self.__ring = self.__shared_frame_msgs[:self.__frame_window_size]
+
+        block_names = [msg.get_shared_memory_name() for msg in self.__shared_frame_msgs]  # type: List[str]
+        self.__shared_memory_indices = {name: i for i, name in enumerate(block_names)}
+
+        names = "\n".join(block_names).encode("utf-8")  # type: bytes
+        names_msg = DataMessage(len(names))  # type: DataMessage
+        names_msg.get_data()[:] = np.frombuffer(names, dtype=np.uint8)
+
+        return SocketUtil.write_messages(self.__sock, SimpleMessage[int](int, len(names)), names_msg)
+
+    def __take_compressed_frame(self) -> Optional[FrameMessage]:
+        """
+        Take the next compressed frame to be sent from the compression stage.
+
+        .. note::
+            This will block until the frame is available, except when the termination flag is set,
+            in which case it will return None.
+
+        :return:    The next compressed frame to be sent, if the termination flag isn't set, or None otherwise.
+        """
+        with self.__compressed_frames_lock:
+            while self.__next_frame_to_send not in self.__compressed_frames:
+                if self.__should_terminate.is_set():
+                    return None
+                self.__compressed_frames_changed.wait(0.1)
+
+            compressed_frame_msg = self.__compressed_frames.pop(self.__next_frame_to_send)  # type: FrameMessage
+            self.__next_frame_to_send += 1
+            self.__compressed_frames_changed.notify_all()
+
+            return compressed_frame_msg
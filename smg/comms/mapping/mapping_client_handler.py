@@ -1,12 +1,16 @@
 import numpy as np
 import socket
 import threading
+import time
 
-from typing import Callable, cast, List, Optional, Tuple, TypeVar
+from concurrent.futures import Executor, Future
+from contextlib import contextmanager
+from typing import Callable, cast, Dict, Iterator, List, Optional, Tuple, TypeVar, Union
 
 from smg.utility import PooledQueue
 
-from ..base import AckMessage, CalibrationMessage, FrameHeaderMessage, FrameMessage, Message, SocketUtil
+from ..base import AckMessage, CalibrationMessage, DataMessage, FrameHeaderMessage, FrameMessage, FrameMessageLease, \
+    ImageCodec, ImageCodecRegistry, Message, SharedFrameMessage, SimpleMessage, SocketUtil
 
 
 # TYPE VARIABLE
@@ -21,32 +25,171 @@ class MappingClientHandler:
 
     # CONSTRUCTOR
 
-    def __init__(self, client_id: int, sock: socket.SocketType, should_terminate: threading.Event, *,
+    def __init__(self, client_id: int, sock: Optional[socket.SocketType], should_terminate: threading.Event, *,
+                 decompression_pool: Optional[Executor] = None,
+                 frame_decoder: Optional[Callable[[FrameMessage, FrameMessage], None]] = None,
                  frame_decompressor: Optional[Callable[[FrameMessage], FrameMessage]] = None,
-                 pool_empty_strategy: PooledQueue.EPoolEmptyStrategy = PooledQueue.PES_DISCARD):
+                 frame_window_size: int = 5, latest_wins: bool = False, lazy_decompression: bool = False,
+                 pool_empty_strategy: PooledQueue.EPoolEmptyStrategy = PooledQueue.PES_DISCARD,
+                 queue_changed: Optional[threading.Condition] = None, shared_memory: bool = False):
         """
         Construct a mapping client handler.
 
+        .. note::
+            A frame decoder is an alternative to a frame decompressor that writes each decompressed frame directly
+            into an existing message (rather than returning a new one). If one is specified, received frames will be
+            decompressed straight into the messages in the pool, avoiding both a per-frame allocation and a copy.
+            If both are specified, the frame decoder takes precedence. Neither is needed for frames whose images were
+            encoded by codecs in the ImageCodecRegistry (e.g. by an RGBDFrameCompressor), since such frames will be
+            decoded by the registry, whichever codecs the client chooses to use. Frames with images that were encoded
+            by stateful codecs (e.g. a TileDeltaImageCodec) are always decoded as soon as they are received, on the
+            handler's own thread, since every such frame must be decoded, in order, to reconstruct later frames.
+        .. note::
+            If lazy decompression is enabled, received frames are stored in compressed form, and only decompressed
+            when they are actually passed to a frame receiver (by get_frame or peek_newest_frame). This avoids
+            wasting time decompressing frames that end up being discarded, e.g. when the consumer falls behind.
+        .. note::
+            If latest-wins mode is enabled, a frame that is received whilst the message queue is full overwrites
+            the oldest frame on the queue that has not yet been consumed (reusing its message), rather than being
+            discarded. This keeps the frames on the queue as fresh as possible when the consumer falls behind, which
+            matters more than completeness for real-time applications such as tracking. The number of frames that
+            have been overwritten in this way can be obtained by calling get_frames_overwritten. This mode can only
+            be used with the PES_DISCARD pool empty strategy, since the other strategies never leave a new frame
+            without a message from the pool, and so would silently stop frames from being overwritten.
+        .. note::
+            If a decompression pool is specified, the frame messages in the pool will be backed by shared memory,
+            and received frames will be decompressed into them by the worker processes in the decompression pool.
+            This allows the decompression for different clients to proceed in parallel, unconstrained by the GIL.
+            The thread that receives the frames does not wait for them to be decompressed: instead, each consumer
+            waits for the decompression of the frame it takes to finish. In this case, the frame decoder or frame
+            decompressor must be picklable.
+        .. note::
+            If shared memory is enabled, the client is expected to send its frames via uncompressed frame messages
+            in shared memory (see MappingClient). Each frame is copied (once, straight into the message queue) as
+            soon as the client signals that it's ready, so that its block of shared memory can be reused once the
+            frame is acknowledged.
+
         :param client_id:           The ID used by the server to refer to the client.
-        :param sock:                The socket used to communicate with the client.
+        :param sock:                The socket used to communicate with the client (None for a loopback client).
         :param should_terminate:    Whether or not the server should terminate (read-only, set within the server).
+        :param decompression_pool:  An optional pool of worker processes to use to decompress received frames.
+        :param frame_decoder:       An optional function to use to decompress received frames into existing messages.
         :param frame_decompressor:  An optional function to use to decompress received frames.
+        :param frame_window_size:   The maximum number of frames the client may have in flight at once (this is
+                                    granted to the client as a number of credits when its calibration is received).
+        :param latest_wins:         Whether a frame received whilst the message queue is full should overwrite the
+                                    oldest unconsumed frame on the queue (this can only be used with the PES_DISCARD
+                                    pool empty strategy).
+        :param lazy_decompression:  Whether to defer decompressing each frame until it is passed to a frame receiver.
         :param pool_empty_strategy: The strategy to use when a frame message is received whilst the pool of frames
                                     associated with the frame message queue is empty.
+        :param queue_changed:       An optional condition variable to notify whenever a frame is pushed onto or popped
+                                    from the message queue (this allows a server to share one between all of its
+                                    handlers, so that it can wait for frames from any client).
+        :param shared_memory:       Whether the client sends its frames via shared memory.
         """
+        if latest_wins and pool_empty_strategy != PooledQueue.PES_DISCARD:
+            raise RuntimeError("Error: Latest-wins mode can only be used with the PES_DISCARD pool empty strategy")
+
+        if queue_changed is None:
+            queue_changed = threading.Condition()
+
+        self.__batch_frame_msgs = []                    # type: List[FrameMessage]
         self.__calib_msg = None                         # type: Optional[CalibrationMessage]
+        self.__client_frame_msgs = None                 # type: Optional[List[SharedFrameMessage]]
         self.__client_id = client_id                    # type: int
+        self.__closed = False                           # type: bool
         self.__connection_ok = True                     # type: bool
+        self.__decompression_pool = decompression_pool  # type: Optional[Executor]
+        self.__discarded_frame_msg = None               # type: Optional[FrameMessage]
+        self.__frame_decoder = frame_decoder            # type: Optional[Callable[[FrameMessage, FrameMessage], None]]
         self.__frame_decompressor = frame_decompressor  # type: Optional[Callable[[FrameMessage], FrameMessage]]
         self.__frame_message_queue = PooledQueue[FrameMessage](pool_empty_strategy)  # type: PooledQueue[FrameMessage]
+        self.__frame_window_size = frame_window_size    # type: int
+        self.__frames_overwritten = 0                   # type: int
+        self.__free_lease_frame_msgs = []               # type: List[FrameMessage]
+        self.__frames_received = 0                      # type: int
+        self.__header_msg = None                        # type: Optional[FrameHeaderMessage]
+        self.__latest_wins = latest_wins                # type: bool
+        self.__lazy_decompression = lazy_decompression  # type: bool
+        self.__lease_lock = threading.RLock()           # type: threading.RLock
+        self.__leased_frame_msgs = {}                   # type: Dict[int, FrameMessage]
         self.__lock = threading.Lock()                  # type: threading.Lock
+        self.__loopback = False                         # type: bool
+        self.__newest_compressed_frame_msg = None       # type: Optional[FrameMessage]
         self.__newest_frame_msg = None                  # type: Optional[FrameMessage]
+        self.__newest_frame_lock = threading.Lock()     # type: threading.Lock
+        self.__newest_pose = None                       # type: Optional[Tuple[int, np.ndarray]]
+        self.__newest_pose_lock = threading.Lock()      # type: threading.Lock
+        self.__pending_frames = {}                      # type: Dict[int, Union[FrameMessage, Future]]
+        self.__pending_msg = CalibrationMessage()       # type: Message
+        self.__pending_msg_offset = 0                   # type: int
+        self.__pending_output = bytearray()             # type: bytearray
+        self.__peek_frame_msg = None                    # type: Optional[FrameMessage]
+        self.__peek_lock = threading.Lock()             # type: threading.Lock
+        self.__peeked_compressed_frame_msg = None       # type: Optional[FrameMessage]
+        self.__prefetch_frame_msg = None                # type: Optional[FrameMessage]
+        self.__prefetched_frame_msg = None              # type: Optional[FrameMessage]
+        self.__queue_changed = queue_changed            # type: threading.Condition
+        self.__queue_lock = threading.Lock()            # type: threading.Lock
+        self.__retained_frame_msg = None                # type: Optional[FrameMessage]
+        self.__retired_frame_msgs = []                  # type: List[Tuple[FrameMessage, Future]]
+        self.__shared_frame_msgs = []                   # type: List[SharedFrameMessage]
+        self.__shared_memory = shared_memory            # type: bool
         self.__should_terminate = should_terminate      # type: threading.Event
-        self.__sock = sock                              # type: socket.SocketType
+        self.__stream_decoders = {}                     # type: Dict[int, ImageCodec]
+        self.__sock = sock                              # type: Optional[socket.SocketType]
         self.__thread = None                            # type: Optional[threading.Thread]
 
     # PUBLIC METHODS
 
+    def close(self) -> None:
+        """
+        Release any resources held by the handler (e.g. shared memory).
+
+        .. note::
+            This should be called once the handler's frames are no longer needed. Any frames that are currently
+            leased (see lease_frame) remain valid until their leases are released, at which point their resources
+            are released as well. Once the handler has been closed, no more frames can be obtained from it.
+        """
+        # Note: The lock and the newest frame lock are held to wait for any consumer that's currently using frames
+        #       owned by the handler (e.g. a receiver that's processing a batch of frames, or a peek that's copying
+        #       the newest frame), and to stop any consumer from obtaining a frame afterwards. (Peeks pass their own
+        #       copy of the newest frame to their receivers, which isn't backed by shared memory, so a receiver that's
+        #       still peeking at it doesn't need to be waited for.)
+        with self.__lock, self.__newest_frame_lock, self.__lease_lock:
+            self.__closed = True
+
+            for shared_frame_msg in self.__shared_frame_msgs:
+                if id(shared_frame_msg) not in self.__leased_frame_msgs:
+                    shared_frame_msg.unlink()
+
+            self.__shared_frame_msgs = []
+
+        # Note: The frame messages in shared memory are owned by the client, so we just close our access to them.
+        if self.__client_frame_msgs is not None:
+            for client_frame_msg in self.__client_frame_msgs:
+                client_frame_msg.close()
+
+            self.__client_frame_msgs = None
+
+        # Wake up any consumer that's waiting for a frame, so that it can see that the handler has been closed.
+        self.__notify_queue_changed()
+
+    def connect_loopback(self, calib_msg: CalibrationMessage) -> None:
+        """
+        Make this the handler for a loopback client, i.e. a client in the same process that pushes its frames
+        directly onto the message queue (see push_frame), rather than sending them over a socket.
+
+        :param calib_msg:   The client's calibration message.
+        """
+        self.__loopback = True
+        self.__process_calibration_message(calib_msg)
+
+    def disconnect_loopback(self) -> None:
+        """Signal that the loopback client for this handler has disconnected."""
+        self.__connection_ok = False
+
     def get_client_id(self) -> int:
         """
         Get the ID used by the server to refer to the client.
@@ -63,16 +206,68 @@ class MappingClientHandler:
             The concept of a 'frame receiver' is used to obviate the client handler from needing to know about
             the contents of frame messages. This way, the frame receiver needs to know how to handle the frame
             message that it's given, but the client handler can just forward it to the receiver without caring.
+        .. note::
+            As in get_frames, the frame is moved out of the message queue before it's passed to the receiver,
+            so the receiver must extract what it needs from the message before returning.
 
         :param receiver:    The frame receiver to which to pass the oldest frame from the client that has not
                             yet been processed.
         """
-        with self.__lock:
-            # Pass the first frame on the message queue to the frame receiver.
-            receiver(self.__frame_message_queue.peek(self.__should_terminate))
+        self.get_frames(lambda frame_msgs: receiver(frame_msgs[0]), 1)
 
-            # Pop the frame that's just been read from the message queue.
-            self.__frame_message_queue.pop(self.__should_terminate)
+    def get_frames(self, receiver: Callable[[List[FrameMessage]], None], max_frames: int) -> int:
+        """
+        Get up to the specified number of the oldest frames from the client that have not yet been processed.
+
+        .. note::
+            This waits for at least one frame to be available (without holding the lock, so that the frame can arrive
+            in the meantime), and then drains as many of the frames on the message queue as it can (up to the
+            maximum), passing them to the receiver as a batch. Each frame is moved out of
+            the queue by swapping its data with that of a message that is owned by the handler (so no copies are
+            made), which allows the message from the queue to be returned to the pool straight away. The messages
+            passed to the receiver are reused by the next call, so the receiver must extract what it needs from them
+            before returning.
+
+        :param receiver:    The receiver to which to pass the batch of frames (oldest first).
+        :param max_frames:  The maximum number of frames to pass to the receiver.
+        :return:            The number of frames passed to the receiver (0 if the server is terminating).
+        """
+        frame_msgs = []  # type: List[FrameMessage]
+
+        # Wait for a frame to be available, and then try to take it (and any others that are available). If another
+        # consumer takes the frame first, wait again.
+        while len(frame_msgs) == 0 and self.__wait_for_frame():
+            with self.__lock:
+                # Move as many frames as we can (up to the maximum) into our own messages.
+                while len(frame_msgs) < max_frames:
+                    if len(frame_msgs) == len(self.__batch_frame_msgs):
+                        self.__batch_frame_msgs.append(self.__make_frame_message())
+
+                    batch_frame_msg = self.__batch_frame_msgs[len(frame_msgs)]  # type: FrameMessage
+                    if not self.__take_frame(batch_frame_msg):
+                        break
+
+                    frame_msgs.append(batch_frame_msg)
+
+                # Pass the frames to the receiver.
+                if len(frame_msgs) > 0:
+                    receiver(frame_msgs)
+
+        # Note: This must be done without holding the lock, since anyone waiting on the queue changed condition
+        #       may need to acquire it.
+        self.__notify_queue_changed()
+
+        return len(frame_msgs)
+
+    def get_frames_overwritten(self) -> int:
+        """
+        Get the number of frames that have been overwritten on the message queue (in latest-wins mode) before
+        they could be consumed.
+
+        :return:    The number of frames that have been overwritten on the message queue.
+        """
+        with self.__queue_lock:
+            return self.__frames_overwritten
 
     def get_image_shapes(self) -> Optional[List[Tuple[int, int, int]]]:
         """
@@ -92,15 +287,45 @@ class MappingClientHandler:
         """
         return self.__calib_msg.get_intrinsics() if self.__calib_msg is not None else None
 
+    def get_newest_pose(self) -> Optional[Tuple[int, np.ndarray]]:
+        """
+        Try to get the newest pose received from the client.
+
+        .. note::
+            This is the pose of the first image in the newest frame (or pose-only update) received from the client.
+            Pose-only updates are not passed to frame receivers, so this is the only way to access their poses.
+
+        :return:    A tuple consisting of the frame index and the pose, if any frame has been received from the
+                    client, or None otherwise.
+        """
+        with self.__newest_pose_lock:
+            return self.__newest_pose
+
+    def get_pending_message(self) -> Message:
+        """
+        Get the message that the handler is next expecting to receive from the client.
+
+        :return:    The message that the handler is next expecting to receive from the client.
+        """
+        return self.__pending_msg
+
     def has_frames_now(self) -> bool:
         """
         Get whether or not the client is ready to yield a frame.
 
         :return:    True, if the client is ready to yield a frame, or False otherwise.
         """
-        with self.__lock:
+        with self.__queue_lock:
             return not self.__frame_message_queue.empty()
 
+    def has_pending_output(self) -> bool:
+        """
+        Get whether there is any data waiting to be sent to the client by write_available.
+
+        :return:    True, if there is any data waiting to be sent to the client, or False otherwise.
+        """
+        return len(self.__pending_output) > 0
+
     def is_connection_ok(self) -> bool:
         """
         Get whether the connection is still ok (tracks whether or not the most recent read/write succeeded).
@@ -109,6 +334,51 @@ class MappingClientHandler:
         """
         return self.__connection_ok
 
+    def lease_frame(self, timeout: Optional[float] = None) -> Optional[FrameMessageLease]:
+        """
+        Lease the oldest frame from the client that has not yet been processed.
+
+        .. note::
+            This is a zero-copy alternative to get_frame. The frame is moved out of the message queue by swapping
+            its data with that of a message owned by the handler (which allows the message from the queue to be
+            returned to the pool straight away), and the handler's message is then leased to the caller, who can
+            use it (e.g. via read-only views into its data) for as long as they like. The handler won't reuse the
+            message until the lease has been released. (If a consumer fails to release its leases, the handler
+            will keep making new messages, so the leases should always be released promptly.)
+
+        :param timeout: The maximum time to wait for a frame (in seconds), or None to wait indefinitely.
+        :return:        A lease on the frame, if one could be obtained, or None if the server is terminating (or
+                        the handler is closed, or no frame could be obtained within the timeout).
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None  # type: Optional[float]
+
+        # Wait for a frame to be available, and then try to take it. If another consumer takes the frame first,
+        # wait again (for whatever remains of the timeout).
+        while True:
+            if not self.__wait_for_frame(deadline):
+                return None
+
+            with self.__lock:
+                # Move the frame into one of our own messages that isn't currently leased.
+                with self.__lease_lock:
+                    lease_frame_msg = self.__free_lease_frame_msgs.pop() \
+                        if len(self.__free_lease_frame_msgs) > 0 else None  # type: Optional[FrameMessage]
+
+                if lease_frame_msg is None:
+                    lease_frame_msg = self.__make_frame_message()
+
+                if self.__take_frame(lease_frame_msg):
+                    with self.__lease_lock:
+                        self.__leased_frame_msgs[id(lease_frame_msg)] = lease_frame_msg
+                    break
+
+                self.__release_lease_frame_msg(lease_frame_msg)
+
+        # Note: As in get_frames, this must be done without holding the lock.
+        self.__notify_queue_changed()
+
+        return FrameMessageLease(lease_frame_msg, self.__release_lease_frame_msg)
+
     def peek_newest_frame(self, receiver: Callable[[FrameMessage], None]) -> bool:
         """
         Peek at the newest frame received from the client (if any).
@@ -121,75 +391,211 @@ class MappingClientHandler:
         :param receiver:    The frame receiver to which to pass the newest frame from the client.
         :return:            True, if a newest frame existed and was passed to the receiver, or False otherwise.
         """
+        # Note: The newest frame can be in a message that's on the message queue (or that's been passed to a consumer),
+        #       which could be reused at any time, so we copy it into a message of our own whilst holding the newest
+        #       frame lock, and then pass that to the receiver without holding the lock. That way, a slow receiver
+        #       can't hold up the thread that receives the frames. The peek lock makes sure that concurrent peeks don't
+        #       overwrite the copy whilst a receiver is using it.
+        with self.__peek_lock:
+            with self.__newest_frame_lock:
+                if self.__closed:
+                    return False
+
+                newest_compressed_frame_msg = self.__newest_compressed_frame_msg  # type: Optional[FrameMessage]
+                if newest_compressed_frame_msg is None and self.__newest_frame_msg is None:
+                    return False
+
+                if self.__peek_frame_msg is None:
+                    self.__peek_frame_msg = FrameMessage(
+                        self.__calib_msg.get_image_shapes(), self.__calib_msg.get_uncompressed_image_byte_sizes()
+                    )
+
+                if newest_compressed_frame_msg is None:
+                    np.copyto(self.__peek_frame_msg.get_data(), self.__newest_frame_msg.get_data())
+                    self.__peeked_compressed_frame_msg = None
+
+            # If the newest frame still needs to be decompressed (and we haven't already decompressed it for an
+            # earlier peek), decompress it now. Since each compressed frame is received into a message of its own,
+            # this can safely be done without holding the newest frame lock.
+            if newest_compressed_frame_msg is not None and \
+                    newest_compressed_frame_msg is not self.__peeked_compressed_frame_msg:
+                self.__decompress_frame_into(newest_compressed_frame_msg, self.__peek_frame_msg)
+                self.__peeked_compressed_frame_msg = newest_compressed_frame_msg
+
+            # Pass the newest frame to the frame receiver.
+            receiver(self.__peek_frame_msg)
+            return True
+
+    def prefetch_frame(self) -> None:
+        """
+        Decompress the oldest frame on the message queue in advance, if its decompression has been deferred.
+
+        .. note::
+            This allows the next frame to be decompressed (e.g. on another thread) whilst the consumer is still
+            processing the current one. It has no effect if the message queue is empty, or if the oldest frame
+            has already been decompressed (e.g. because lazy decompression is disabled).
+        .. note::
+            The frame is decompressed into a message owned by the handler (rather than the one on the queue, which
+            could otherwise be overwritten in latest-wins mode whilst it was being written), from which it's moved
+            into the message of the consumer that eventually takes it.
+        """
         with self.__lock:
-            # If any frame has ever been received from the client, pass the newest frame to the frame receiver.
-            if self.__newest_frame_msg is not None:
-                receiver(self.__newest_frame_msg)
-                return True
+            with self.__queue_lock:
+                if self.__closed or self.__frame_message_queue.empty():
+                    return
+
+                msg = self.__frame_message_queue.peek(self.__should_terminate)  # type: FrameMessage
+                pending = self.__pending_frames.get(id(msg))  # type: Optional[Union[FrameMessage, Future]]
+
+            if not isinstance(pending, FrameMessage) or pending is self.__prefetched_frame_msg:
+                return
+
+            if self.__prefetch_frame_msg is None:
+                self.__prefetch_frame_msg = self.__make_frame_message()
+
+            self.__decompress_frame_into(pending, self.__prefetch_frame_msg)
+            self.__prefetched_frame_msg = pending
+
+    def process_pending_message(self) -> Optional[Message]:
+        """
+        Process the message that has just been received from the client, and set up the next message to expect.
+
+        .. note::
+            The client first sends a calibration message, and then repeatedly sends a frame header message
+            followed by a frame message. Both calibration messages and frame messages are acknowledged.
+        .. note::
+            This (together with get_pending_message) allows the handler to be driven by code that does its own
+            socket I/O, e.g. an asyncio-based server. The pending message must have been fully received first.
+
+        :return:    The message (if any) to send to the client in reply.
+        """
+        msg = self.__pending_msg  # type: Message
+
+        if isinstance(msg, CalibrationMessage):
+            self.__header_msg = FrameHeaderMessage(msg.get_max_images())
+            self.__pending_msg = SimpleMessage[int](int) if self.__shared_memory else self.__header_msg
+            return self.__process_calibration_message(msg)
+        elif isinstance(msg, FrameHeaderMessage):
+            self.__pending_msg = FrameMessage(
+                msg.get_image_shapes(), msg.get_image_byte_sizes(), image_codec_ids=msg.get_image_codec_ids()
+            )
+            return None
+        elif isinstance(msg, SimpleMessage):
+            # If the client is sending frames via shared memory, it first sends the length of the names of the
+            # blocks of shared memory that back its frame messages, then the names themselves, and then the index
+            # of the block that contains each frame.
+            if self.__client_frame_msgs is None:
+                self.__pending_msg = DataMessage(msg.extract_value())
+                return None
             else:
-                return False
+                # Note: The block index comes from the client, so it can't be trusted. If it's out of range, we drop
+                #       the client rather than reading the wrong block (or failing on the thread that reads the data).
+                block_index = msg.extract_value()  # type: int
+                if not 0 <= block_index < len(self.__client_frame_msgs):
+                    print("Dropping client {}: invalid shared memory block index {}".format(
+                        self.__client_id, block_index
+                    ))
+                    self.__connection_ok = False
+                    return None
+
+                return self.__process_frame_message(self.__client_frame_msgs[block_index])
+        elif isinstance(msg, DataMessage):
+            self.__attach_client_frame_msgs(str(msg.get_data().tobytes(), "utf-8").split("\n"))
+            self.__pending_msg = SimpleMessage[int](int)
+            return None
+        else:
+            self.__pending_msg = self.__header_msg
+            return self.__process_frame_message(cast(FrameMessage, msg))
+
+    def read_available(self) -> None:
+        """
+        Read whatever data is currently available from the client, without blocking.
+
+        .. note::
+            This is an alternative to run_pre/run_iter for use by servers that multiplex many clients on a single
+            thread (it requires the socket to be in non-blocking mode). Messages from the client are parsed
+            incrementally, and each one is processed as soon as it has been fully received. Any replies that
+            need to be sent to the client are sent (as far as possible) without blocking, with any remaining
+            data being retained until write_available is called.
+        """
+        while self.__connection_ok:
+            # Try to read more of the pending message.
+            offset = SocketUtil.read_message_nonblocking(
+                self.__sock, self.__pending_msg, self.__pending_msg_offset
+            )  # type: Optional[int]
+
+            # If the connection has dropped, stop.
+            if offset is None:
+                self.__connection_ok = False
+                break
+
+            self.__pending_msg_offset = offset
+
+            # If the pending message has not yet been fully received, stop until more data is available.
+            if offset < self.__pending_msg.get_size():
+                break
+
+            # Otherwise, process the message, and try to send any reply to the client.
+            self.__pending_msg_offset = 0
+            reply_msg = self.process_pending_message()  # type: Optional[Message]
+            if reply_msg is not None:
+                self.__pending_output += reply_msg.get_data().tobytes()
+                self.write_available()
+
+    def push_frame(self, frame_filler: Callable[[FrameMessage], None]) -> None:
+        """
+        Push a frame from a loopback client onto the message queue.
+
+        .. note::
+            The frame filler writes the frame directly into a message from the pool associated with the message
+            queue, which is returned to the pool once the frame has been consumed, so no copies are made. (As for
+            frames received over a socket, the message is also recorded as the newest frame.)
+
+        :param frame_filler:    A callback function that should fill in the contents of a message.
+        """
+        with self.__begin_push() as push_handler:
+            msg = self.__get_received_frame_msg(push_handler.get())  # type: FrameMessage
+            frame_filler(msg)
+
+            with self.__newest_pose_lock:
+                self.__newest_pose = (msg.get_frame_index(), msg.get_pose(0).copy())
+
+            self.__record_newest_frame(msg)
+
+        self.__frames_received += 1
 
     def run_iter(self) -> None:
         """Run an iteration of the main loop for the client."""
-        # Try to read a frame header message.
-        header_msg = FrameHeaderMessage(self.__calib_msg.get_max_images())  # type: FrameHeaderMessage
-        self.__connection_ok = SocketUtil.read_message(self.__sock, header_msg, self.__should_terminate)
+        # If the client is a loopback client, there's nothing to read, so just wait for a short time (this allows
+        # the server to wait for the client to disconnect without needing special handling).
+        if self.__loopback:
+            self.__should_terminate.wait(0.1)
+            return
 
-        # If that succeeds:
-        if self.__connection_ok:
-            # Set up a frame message accordingly.
-            image_shapes = header_msg.get_image_shapes()              # type: List[Tuple[int, int, int]]
-            image_byte_sizes = header_msg.get_image_byte_sizes()      # type: List[int]
-            frame_msg = FrameMessage(image_shapes, image_byte_sizes)  # type: FrameMessage
-
-            # Try to read the contents of the frame message from the client.
-            self.__connection_ok = SocketUtil.read_message(self.__sock, frame_msg, self.__should_terminate)
+        # Try to read a frame header message, and then the corresponding frame message.
+        for _ in range(2):
+            self.__connection_ok = self.__connection_ok and \
+                SocketUtil.read_message(self.__sock, self.__pending_msg, self.__should_terminate)
 
-            # If that succeeds:
+            # If that succeeds, process the message, and send any reply to the client.
             if self.__connection_ok:
-                # Decompress the frame as necessary.
-                decompressed_frame_msg = frame_msg  # type: FrameMessage
-                if self.__frame_decompressor is not None:
-                    decompressed_frame_msg = self.__frame_decompressor(frame_msg)
-
-                # Save the decompressed frame as the newest one we have received. We do this so that we have a
-                # record of the newest frame received (e.g. to serve peeks) even if the message queue empties.
-                with self.__lock:
-                    self.__newest_frame_msg = decompressed_frame_msg
-
-                # Also push the decompressed frame onto the message queue.
-                with self.__frame_message_queue.begin_push(self.__should_terminate) as push_handler:
-                    elt = push_handler.get()  # type: Optional[FrameMessage]
-                    if elt is not None:
-                        msg = cast(FrameMessage, elt)  # type: FrameMessage
-                        np.copyto(msg.get_data(), decompressed_frame_msg.get_data())
-
-                # Send an acknowledgement to the client.
-                self.__connection_ok = SocketUtil.write_message(self.__sock, AckMessage())
+                reply_msg = self.process_pending_message()  # type: Optional[Message]
+                if reply_msg is not None:
+                    self.__connection_ok = SocketUtil.write_message(self.__sock, reply_msg)
 
     def run_pre(self) -> None:
         """Run any code that should happen before the main loop for the client."""
+        # If the client is a loopback client, its calibration will already have been processed.
+        if self.__loopback:
+            return
+
         # Read a calibration message from the client.
-        self.__calib_msg = CalibrationMessage()
-        self.__connection_ok = SocketUtil.read_message(self.__sock, self.__calib_msg)
+        self.__connection_ok = SocketUtil.read_message(self.__sock, self.__pending_msg)
 
-        # If the calibration message was successfully read:
+        # If the calibration message was successfully read, process it and signal to the client that we're ready.
         if self.__connection_ok:
-            # Print the camera parameters out for debugging purposes.
-            image_shapes = self.__calib_msg.get_image_shapes()  # type: List[Tuple[int, int, int]]
-            intrinsics = self.__calib_msg.get_intrinsics()      # type: List[Tuple[float, float, float, float]]
-            print(
-                "Received camera parameters from client {}: {}, {}".format(self.__client_id, image_shapes, intrinsics)
-            )
-
-            # Initialise the frame message queue.
-            capacity = 5  # type: int
-            self.__frame_message_queue.initialise(capacity, lambda: FrameMessage(
-                self.__calib_msg.get_image_shapes(), self.__calib_msg.get_uncompressed_image_byte_sizes()
-            ))
-
-            # Signal to the client that the server is ready.
-            self.__connection_ok = SocketUtil.write_message(self.__sock, AckMessage())
+            reply_msg = self.process_pending_message()  # type: Optional[Message]
+            self.__connection_ok = SocketUtil.write_message(self.__sock, reply_msg)
 
     def set_thread(self, thread: threading.Thread) -> None:
         """
@@ -198,3 +604,544 @@ class MappingClientHandler:
         :param thread:  The thread that manages communication with the client.
         """
         self.__thread = thread
+
+    def write_available(self) -> None:
+        """
+        Send as much of the data that's waiting to be sent to the client as is possible without blocking.
+
+        .. note::
+            This is for use by servers that multiplex many clients on a single thread (see read_available).
+        """
+        if self.__connection_ok and len(self.__pending_output) > 0:
+            self.__connection_ok = SocketUtil.write_nonblocking(self.__sock, self.__pending_output)
+
+    # PRIVATE METHODS
+
+    def __attach_client_frame_msgs(self, names: List[str]) -> None:
+        """
+        Attach to the frame messages in shared memory via which the client will send its frames.
+
+        :param names:   The names of the blocks of shared memory that back the client's frame messages.
+        """
+        image_shapes = self.__calib_msg.get_image_shapes()                      # type: List[Tuple[int, int, int]]
+        image_byte_sizes = self.__calib_msg.get_uncompressed_image_byte_sizes()  # type: List[int]
+        self.__client_frame_msgs = [
+            SharedFrameMessage(image_shapes, image_byte_sizes, name=name, track=False) for name in names
+        ]
+
+    @contextmanager
+    def __begin_push(self) -> Iterator[PooledQueue.PushHandler]:
+        """
+        Push a frame onto the message queue (for use in a with statement, whose body should fill in the frame).
+
+        .. note::
+            Once the push has completed, anyone waiting on the queue changed condition is notified.
+        .. note::
+            In latest-wins mode, if the pool associated with the message queue is empty (i.e. the queue is full),
+            the oldest frame on the queue is popped (returning its message to the pool) so that the new frame can
+            overwrite it. If the oldest frame is still being decompressed by the decompression pool, its data is
+            first moved into a retired message (see __retire_frame_msg), so that it can still be evicted. (Only the
+            oldest frame on the queue is accessible, so we can't evict the next-oldest frame instead.) Eviction only
+            needs the queue lock, which consumers hold just long enough to move a frame out
+            of the queue (see __take_frame), so the thread that receives the frames doesn't have to wait whilst a
+            consumer processes a frame.
+
+        :return:    The push handler for the frame.
+        """
+        while True:
+            push_handler = self.__frame_message_queue.begin_push(
+                self.__should_terminate
+            )  # type: PooledQueue.PushHandler
+
+            if not self.__latest_wins or push_handler.get() is not None or self.__should_terminate.is_set():
+                break
+
+            with self.__queue_lock:
+                if self.__frame_message_queue.empty():
+                    break
+
+                oldest_msg = self.__frame_message_queue.peek(self.__should_terminate)  # type: FrameMessage
+
+                # If the oldest frame is still being decompressed by the decompression pool, its data can't be
+                # reused until the worker process has finished writing into it, so move it out of the message.
+                pending = self.__pending_frames.pop(id(oldest_msg), None)  # type: Optional[Union[FrameMessage, Future]]
+                if isinstance(pending, Future) and not pending.done():
+                    self.__retire_frame_msg(oldest_msg, pending)
+
+                self.__frame_message_queue.pop(self.__should_terminate)
+                self.__frames_overwritten += 1
+
+        with push_handler:
+            yield push_handler
+
+        self.__notify_queue_changed()
+
+    def __decompress_frame_into(self, frame_msg: FrameMessage, decompressed_frame_msg: FrameMessage) -> None:
+        """
+        Decompress a received frame into an existing message, using whichever means of doing so we have available.
+
+        :param frame_msg:               The received (compressed) frame.
+        :param decompressed_frame_msg:  The message into which to write the decompressed frame.
+        """
+        # If the frame's images were encoded by registered codecs, decode it using the registry. If any of them
+        # were encoded by stateful codecs, the decoding must be done here, since the stream state lives here.
+        frame_decoder = self.__frame_decoder  # type: Optional[Callable[[FrameMessage, FrameMessage], None]]
+        if ImageCodecRegistry.can_decode(frame_msg):
+            if ImageCodecRegistry.is_stateful(frame_msg):
+                ImageCodecRegistry.decode_frame_message_into(
+                    frame_msg, decompressed_frame_msg, stream_decoders=self.__stream_decoders
+                )
+                return
+
+            frame_decoder = ImageCodecRegistry.decode_frame_message_into
+
+        # If we can, decompress the frame in one of the decompression pool's worker processes.
+        future = self.__submit_decompression(frame_msg, decompressed_frame_msg)  # type: Optional[Future]
+        if future is not None:
+            future.result()
+            return
+
+        if frame_decoder is not None:
+            frame_decoder(frame_msg, decompressed_frame_msg)
+        elif self.__frame_decompressor is not None:
+            np.copyto(decompressed_frame_msg.get_data(), self.__frame_decompressor(frame_msg).get_data())
+        else:
+            np.copyto(decompressed_frame_msg.get_data(), frame_msg.get_data())
+
+    def __decompress_pending_frame(self, pending: Optional[Union[FrameMessage, Future]], msg: FrameMessage) -> None:
+        """
+        Finish decompressing a frame that has been moved out of the message queue, if that was deferred.
+
+        .. note::
+            This must be called with the lock held.
+
+        :param pending: The compressed frame whose decompression was deferred, or the future for its decompression
+                        by the decompression pool (or None, if the frame has already been decompressed).
+        :param msg:     The message into which the frame has been moved.
+        """
+        if isinstance(pending, Future):
+            pending.result()
+        elif pending is not None and pending is self.__prefetched_frame_msg:
+            msg.swap_data(self.__prefetch_frame_msg)
+            self.__prefetched_frame_msg = None
+        elif pending is not None:
+            self.__decompress_frame_into(pending, msg)
+
+    def __defer_frame(self, frame_msg: FrameMessage) -> None:
+        """
+        Push a received frame onto the message queue without decompressing it.
+
+        .. note::
+            The compressed frame is recorded against the message from the queue into which it will eventually be
+            decompressed. Since the record is made before the push completes, it is guaranteed to be present by the
+            time any consumer can see the message. If the pool is empty and the frame is being discarded, only the
+            newest frame record will be updated, so the frame will never be decompressed unless it is peeked at.
+
+        :param frame_msg:   The received (compressed) frame.
+        """
+        with self.__begin_push() as push_handler:
+            elt = push_handler.get()  # type: Optional[FrameMessage]
+            if elt is not None:
+                with self.__queue_lock:
+                    self.__pending_frames[id(elt)] = frame_msg
+
+        self.__record_newest_compressed_frame(frame_msg)
+
+    def __decode_frame(self, frame_msg: FrameMessage) -> None:
+        """
+        Decompress a received frame directly into the message queue.
+
+        .. note::
+            The message into which the frame is decompressed is also recorded as the newest frame (e.g. to serve
+            peeks), so no separate copy of the frame is kept (see __record_newest_frame). If the pool is empty and
+            the frame is being discarded, it is decompressed into a message owned by the handler instead.
+
+        :param frame_msg:   The received (compressed) frame.
+        """
+        with self.__begin_push() as push_handler:
+            msg = self.__get_received_frame_msg(push_handler.get())  # type: FrameMessage
+            self.__decompress_frame_into(frame_msg, msg)
+            self.__record_newest_frame(msg)
+
+    def __get_received_frame_msg(self, elt: Optional[FrameMessage]) -> FrameMessage:
+        """
+        Get the message into which a received frame should be written.
+
+        .. note::
+            This is normally the element from the message queue, but if the pool is empty and the frame is being
+            discarded, it's a message owned by the handler (we still write the frame so that we have a record of
+            it as the newest frame). If the element from the message queue still holds the newest frame (e.g. because
+            it was popped to make room), the newest frame is first moved into the retained message.
+
+        :param elt: The element from the message queue, if any.
+        :return:    The message into which the frame should be written.
+        """
+        if elt is None:
+            if self.__discarded_frame_msg is None:
+                self.__discarded_frame_msg = self.__make_frame_message()
+            return self.__discarded_frame_msg
+
+        msg = cast(FrameMessage, elt)  # type: FrameMessage
+        with self.__newest_frame_lock:
+            self.__retain_newest_frame(msg)
+        return msg
+
+    def __get_retained_frame_msg(self) -> FrameMessage:
+        """
+        Get the message owned by the handler in which the newest frame is kept when no other message holds it.
+
+        .. note::
+            This must be called whilst holding the newest frame lock.
+
+        :return:    The retained message.
+        """
+        if self.__retained_frame_msg is None:
+            self.__retained_frame_msg = self.__make_frame_message()
+        return self.__retained_frame_msg
+
+    def __make_frame_message(self) -> FrameMessage:
+        """
+        Make an uncompressed frame message of the size specified by the client's calibration.
+
+        .. note::
+            If we have a decompression pool, the frame message will be backed by shared memory.
+
+        :return:    The frame message.
+        """
+        image_shapes = self.__calib_msg.get_image_shapes()                      # type: List[Tuple[int, int, int]]
+        image_byte_sizes = self.__calib_msg.get_uncompressed_image_byte_sizes()  # type: List[int]
+
+        if self.__decompression_pool is not None:
+            shared_frame_msg = SharedFrameMessage(image_shapes, image_byte_sizes)  # type: SharedFrameMessage
+            self.__shared_frame_msgs.append(shared_frame_msg)
+            return shared_frame_msg
+        else:
+            return FrameMessage(image_shapes, image_byte_sizes)
+
+    def __notify_queue_changed(self) -> None:
+        """Notify anyone waiting on the queue changed condition that a frame has been pushed or popped."""
+        with self.__queue_changed:
+            self.__queue_changed.notify_all()
+
+    def __process_calibration_message(self, calib_msg: CalibrationMessage) -> AckMessage:
+        """
+        Process a calibration message received from the client.
+
+        :param calib_msg:   The calibration message.
+        :return:            The acknowledgement to send to the client.
+        """
+        self.__calib_msg = calib_msg
+
+        # Print the camera parameters out for debugging purposes.
+        image_shapes = calib_msg.get_image_shapes()  # type: List[Tuple[int, int, int]]
+        intrinsics = calib_msg.get_intrinsics()      # type: List[Tuple[float, float, float, float]]
+        print(
+            "Received camera parameters from client {}: {}, {}".format(self.__client_id, image_shapes, intrinsics)
+        )
+
+        # Initialise the frame message queue.
+        capacity = 5  # type: int
+        self.__frame_message_queue.initialise(capacity, self.__make_frame_message)
+
+        # Signal to the client that the server is ready, granting it the appropriate number of credits.
+        return AckMessage(self.__frame_window_size)
+
+    def __process_frame_message(self, frame_msg: FrameMessage) -> AckMessage:
+        """
+        Process a frame message received from the client.
+
+        :param frame_msg:   The frame message.
+        :return:            The acknowledgement to send to the client.
+        """
+        # Record the pose of the frame.
+        # Note: This doesn't use the main lock, since consumers can hold that for a long time (e.g. whilst their
+        #       receivers process frames), and the thread that receives the frames shouldn't have to wait for them.
+        with self.__newest_pose_lock:
+            self.__newest_pose = (frame_msg.get_frame_index(), frame_msg.get_pose(0).copy())
+
+        # If the frame is a pose-only update, there's nothing else to do with it.
+        if frame_msg.is_pose_only():
+            pass
+
+        # Otherwise, if the frame is in one of the client's frame messages in shared memory, it's uncompressed, and
+        # must be copied out before we acknowledge it.
+        elif self.__client_frame_msgs is not None:
+            self.__store_frame(frame_msg)
+
+        # Otherwise, if we're decompressing frames lazily, store the frame without decompressing it (unless it
+        # was encoded by stateful codecs, in which case it must be decoded now to keep the stream state in sync).
+        elif self.__lazy_decompression and not ImageCodecRegistry.is_stateful(frame_msg):
+            self.__defer_frame(frame_msg)
+
+        # Otherwise, if we have a decompression pool, submit the frame to it without waiting for the result (again,
+        # unless the frame was encoded by stateful codecs).
+        elif self.__decompression_pool is not None and not ImageCodecRegistry.is_stateful(frame_msg):
+            self.__submit_frame(frame_msg)
+
+        # Otherwise, if we have a frame decoder or a decompression pool, or the frame can be decoded using the
+        # codec registry, decompress the frame directly into the message queue.
+        elif self.__frame_decoder is not None or self.__decompression_pool is not None \
+                or ImageCodecRegistry.can_decode(frame_msg):
+            self.__decode_frame(frame_msg)
+
+        # Otherwise:
+        else:
+            # Decompress the frame as necessary.
+            decompressed_frame_msg = frame_msg  # type: FrameMessage
+            if self.__frame_decompressor is not None:
+                decompressed_frame_msg = self.__frame_decompressor(frame_msg)
+
+            # Save the decompressed frame as the newest one we have received. We do this so that we have a
+            # record of the newest frame received (e.g. to serve peeks) even if the message queue empties.
+            self.__record_newest_frame(decompressed_frame_msg)
+
+            # Also push the decompressed frame onto the message queue.
+            with self.__begin_push() as push_handler:
+                elt = push_handler.get()  # type: Optional[FrameMessage]
+                if elt is not None:
+                    msg = cast(FrameMessage, elt)  # type: FrameMessage
+                    np.copyto(msg.get_data(), decompressed_frame_msg.get_data())
+
+        # Acknowledge the frame. The acknowledgement contains the total number of frames received so far,
+        # which allows clients that have several frames in flight to determine how many credits they have.
+        self.__frames_received += 1
+        return AckMessage(self.__frames_received)
+
+    def __record_newest_compressed_frame(self, frame_msg: FrameMessage) -> None:
+        """
+        Record a received frame whose decompression has been deferred or submitted as the newest frame.
+
+        :param frame_msg:   The received (compressed) frame.
+        """
+        with self.__newest_frame_lock:
+            self.__newest_frame_msg = None
+            self.__newest_compressed_frame_msg = frame_msg
+
+    def __record_newest_frame(self, msg: FrameMessage) -> None:
+        """
+        Record the message into which a received frame has just been written as the newest frame.
+
+        .. note::
+            No copy of the frame is made: the newest frame stays in whichever message it was written into (e.g. one
+            on the message queue), and is only moved (by swapping data) into the retained message if that message is
+            about to be overwritten (see __retain_newest_frame). A frame written into the message for discarded frames
+            is moved into the retained message straight away, since that message will be overwritten by the next one.
+        .. note::
+            For a message on the message queue, this must be called before the message is pushed, since otherwise a
+            consumer could take the frame before it is recorded.
+
+        :param msg: The message.
+        """
+        # Note: Any older frame whose decompression was deferred (e.g. before a frame that was encoded by stateful
+        #       codecs, which can't be deferred) is no longer the newest one, so it must not be peeked at.
+        with self.__newest_frame_lock:
+            if msg is self.__discarded_frame_msg:
+                retained_frame_msg = self.__get_retained_frame_msg()  # type: FrameMessage
+                retained_frame_msg.swap_data(msg)
+                msg = retained_frame_msg
+
+            self.__newest_frame_msg = msg
+            self.__newest_compressed_frame_msg = None
+
+    def __release_lease_frame_msg(self, lease_frame_msg: FrameMessage) -> None:
+        """
+        Return a message whose lease has been released to the list of messages that can be leased again.
+
+        .. note::
+            If the handler has been closed in the meantime, the message's resources are released instead.
+
+        :param lease_frame_msg: The message.
+        """
+        # Note: This uses its own lock rather than the main one, since a lease can be released at any time (e.g. when
+        #       it's garbage collected), including whilst the thread that releases it is holding the main lock. For
+        #       the same reason, the lease lock is re-entrant (e.g. a lease could be garbage collected during close).
+        with self.__lease_lock:
+            self.__leased_frame_msgs.pop(id(lease_frame_msg), None)
+
+            if not self.__closed:
+                self.__free_lease_frame_msgs.append(lease_frame_msg)
+            elif isinstance(lease_frame_msg, SharedFrameMessage):
+                lease_frame_msg.unlink()
+
+    def __retain_newest_frame(self, msg: FrameMessage) -> None:
+        """
+        If a message that's about to be overwritten holds the newest frame, move the frame into the retained message.
+
+        .. note::
+            This must be called whilst holding the newest frame lock. The frame is moved by swapping the data of the
+            two messages, so no copy is made (the retained message can't be holding the newest frame at this point,
+            so its old data can safely be overwritten).
+
+        :param msg: The message that's about to be overwritten.
+        """
+        if msg is self.__newest_frame_msg:
+            retained_frame_msg = self.__get_retained_frame_msg()  # type: FrameMessage
+            retained_frame_msg.swap_data(msg)
+            self.__newest_frame_msg = retained_frame_msg
+
+    def __retire_frame_msg(self, msg: FrameMessage, future: Future) -> None:
+        """
+        Move the data of a message that's still being written into by the decompression pool into a retired message,
+        which holds onto it until the decompression has finished, so that the message itself can be reused at once.
+
+        .. note::
+            This must be called whilst holding the queue lock. The data is moved by swapping the data of the two
+            messages (for messages backed by shared memory, this swaps the blocks of shared memory themselves, so
+            the worker process keeps writing into the block that's now held by the retired message). A retired
+            message whose decompression has finished is reused, so that messages are only made as needed.
+
+        :param msg:     The message.
+        :param future:  The future for the decompression.
+        """
+        retired_frame_msg = None  # type: Optional[FrameMessage]
+        for i, (retired_msg, retired_future) in enumerate(self.__retired_frame_msgs):
+            if retired_future.done():
+                retired_frame_msg = retired_msg
+                del self.__retired_frame_msgs[i]
+                break
+
+        if retired_frame_msg is None:
+            retired_frame_msg = self.__make_frame_message()
+
+        retired_frame_msg.swap_data(msg)
+        self.__retired_frame_msgs.append((retired_frame_msg, future))
+
+    def __store_frame(self, frame_msg: FrameMessage) -> None:
+        """
+        Push a copy of an uncompressed frame onto the message queue.
+
+        .. note::
+            As in __decode_frame, the message into which the frame is copied is also recorded as the newest frame.
+
+        :param frame_msg:   The uncompressed frame.
+        """
+        with self.__begin_push() as push_handler:
+            msg = self.__get_received_frame_msg(push_handler.get())  # type: FrameMessage
+            np.copyto(msg.get_data(), frame_msg.get_data())
+            self.__record_newest_frame(msg)
+
+    def __submit_decompression(self, frame_msg: FrameMessage,
+                               decompressed_frame_msg: FrameMessage) -> Optional[Future]:
+        """
+        Try to submit a received frame to the decompression pool, to be decompressed into an existing message.
+
+        .. note::
+            This is only possible if we have a decompression pool, the output message is backed by shared memory,
+            and the frame wasn't encoded by stateful codecs (whose stream state lives in this process). Note that if
+            the server is terminating, the pool may already have been shut down, in which case it's also impossible.
+
+        :param frame_msg:               The received (compressed) frame.
+        :param decompressed_frame_msg:  The message into which to write the decompressed frame.
+        :return:                        The future for the decompression, if the frame was submitted, or None
+                                        otherwise.
+        """
+        if self.__decompression_pool is None or not isinstance(decompressed_frame_msg, SharedFrameMessage) \
+                or ImageCodecRegistry.is_stateful(frame_msg):
+            return None
+
+        frame_decoder = self.__frame_decoder  # type: Optional[Callable[[FrameMessage, FrameMessage], None]]
+        if ImageCodecRegistry.can_decode(frame_msg):
+            frame_decoder = ImageCodecRegistry.decode_frame_message_into
+
+        try:
+            return self.__decompression_pool.submit(
+                SharedFrameMessage.decompress_into, frame_msg, decompressed_frame_msg.get_image_shapes(),
+                decompressed_frame_msg.get_image_byte_sizes(), decompressed_frame_msg.get_shared_memory_name(),
+                frame_decoder=frame_decoder, frame_decompressor=self.__frame_decompressor
+            )
+        except RuntimeError:
+            return None
+
+    def __submit_frame(self, frame_msg: FrameMessage) -> None:
+        """
+        Push a received frame onto the message queue, submitting it to the decompression pool to be decompressed
+        into the message from the queue, but without waiting for the result.
+
+        .. note::
+            The future for the decompression is recorded against the message from the queue (just as a compressed
+            frame is when decompression is deferred), and waited for by whichever consumer takes the frame. This
+            stops the thread that receives the frames (which may be serving other clients as well) from blocking
+            whilst each frame is decompressed. As for deferred frames, the newest frame record is set to the
+            compressed frame, so that it is only decompressed again if it's peeked at.
+
+        :param frame_msg:   The received (compressed) frame.
+        """
+        with self.__begin_push() as push_handler:
+            elt = push_handler.get()  # type: Optional[FrameMessage]
+            if elt is not None:
+                msg = cast(FrameMessage, elt)  # type: FrameMessage
+                future = self.__submit_decompression(frame_msg, msg)  # type: Optional[Future]
+                if future is not None:
+                    with self.__queue_lock:
+                        self.__pending_frames[id(msg)] = future
+                else:
+                    self.__decompress_frame_into(frame_msg, msg)
+
+        self.__record_newest_compressed_frame(frame_msg)
+
+    def __take_frame(self, frame_msg: FrameMessage) -> bool:
+        """
+        Try to move the oldest frame on the message queue into a message owned by the handler.
+
+        .. note::
+            This must be called with the lock held. The frame is moved by swapping its data with that of the
+            specified message (so no copies are made), after which it's popped from the queue, returning the
+            message from the queue to the pool. The queue and newest frame locks are only held for the swap itself,
+            so the thread that receives the frames only has to wait for the swap, not for the consumer to process
+            the frame. If the decompression of the frame was deferred, it's finished afterwards.
+
+        :param frame_msg:   The message into which to move the frame.
+        :return:            True, if a frame was moved, or False if the message queue was empty (or the handler
+                            has been closed).
+        """
+        # Note: The newest frame lock must be acquired before the queue lock (as elsewhere), to avoid deadlocks.
+        with self.__newest_frame_lock, self.__queue_lock:
+            if self.__closed or self.__frame_message_queue.empty():
+                return False
+
+            msg = self.__frame_message_queue.peek(self.__should_terminate)  # type: FrameMessage
+            pending = self.__pending_frames.pop(id(msg), None)  # type: Optional[Union[FrameMessage, Future]]
+            self.__retain_newest_frame(frame_msg)
+            frame_msg.swap_data(msg)
+
+            # The newest frame is often the one on the message queue, in which case it moves along with the data.
+            if msg is self.__newest_frame_msg:
+                self.__newest_frame_msg = frame_msg
+
+            self.__frame_message_queue.pop(self.__should_terminate)
+
+        self.__decompress_pending_frame(pending, frame_msg)
+        return True
+
+    def __wait_for_frame(self, deadline: Optional[float] = None) -> bool:
+        """
+        Wait until there is a frame on the message queue, or the server is terminating (or the handler is closed),
+        or the specified deadline passes.
+
+        .. note::
+            This must be called without holding the lock, since the frame can only be pushed onto the queue if the
+            thread that receives the frames is able to make progress in the meantime.
+        .. note::
+            This doesn't poll: the queue changed condition is notified whenever a frame is pushed onto the queue,
+            when the handler is closed, and (by the server) when the server starts to terminate.
+
+        :param deadline:    The time (as given by time.monotonic) by which to give up waiting, or None to wait
+                            indefinitely.
+        :return:            True, if there is a frame on the message queue, or False otherwise.
+        """
+        with self.__queue_changed:
+            while not self.__closed:
+                if self.has_frames_now():
+                    return True
+                elif self.__should_terminate.is_set():
+                    return False
+
+                if deadline is None:
+                    self.__queue_changed.wait()
+                else:
+                    remaining = deadline - time.monotonic()  # type: float
+                    if remaining <= 0:
+                        return False
+                    self.__queue_changed.wait(remaining)
+
+        return False
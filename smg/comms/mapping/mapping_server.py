@@ -1,13 +1,17 @@
+import multiprocessing
+import numpy as np
+import selectors
 import socket
 import threading
 import time
 
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from select import select
-from typing import Callable, Dict, Optional, List, Set, Tuple
+from typing import Callable, cast, Dict, Iterator, Optional, List, Set, Tuple, Union
 
 from smg.utility import PooledQueue
 
-from ..base import FrameMessage
+from ..base import CalibrationMessage, FrameMessage, FrameMessageLease, RGBDFrameMessageUtil, SocketUtil
 from .mapping_client_handler import MappingClientHandler
 
 
@@ -16,29 +20,89 @@ class MappingServer:
 
     # CONSTRUCTOR
 
-    def __init__(self, port: int = 7851, *,
+    def __init__(self, port: Union[int, str] = 7851, *, decompression_processes: int = 0,
+                 frame_decoder: Optional[Callable[[FrameMessage, FrameMessage], None]] = None,
                  frame_decompressor: Optional[Callable[[FrameMessage], FrameMessage]] = None,
-                 pool_empty_strategy: PooledQueue.EPoolEmptyStrategy = PooledQueue.PES_DISCARD):
+                 frame_window_size: int = 5, latest_wins: bool = False, lazy_decompression: bool = False,
+                 pool_empty_strategy: PooledQueue.EPoolEmptyStrategy = PooledQueue.PES_DISCARD,
+                 shared_memory_port: Optional[Union[int, str]] = None, use_selector: bool = False):
         """
         Construct a mapping server.
 
-        :param port:                The port on which the server should listen for connections.
+        .. note::
+            Frames whose images were encoded by codecs in the ImageCodecRegistry (e.g. by an RGBDFrameCompressor)
+            are decoded using the registry, so the frame decoder and frame decompressor are only needed for frames
+            that were compressed in some other way. This allows different clients to use different codecs.
+        .. note::
+            If a positive number of decompression processes is specified, the server will decompress received frames
+            using a pool of worker processes, writing the results directly into frame messages that are backed by
+            shared memory. This allows a server with many clients to make use of more cores than would be possible
+            if all of the decompression were done on the client handler threads. In this case, the frame decoder or
+            frame decompressor must be picklable (e.g. a static method of RGBDFrameMessageUtil), and the program
+            using the server must be safe to import in a fresh process (i.e. it must guard its entry point with
+            if __name__ == "__main__"), since the worker processes are spawned rather than forked.
+        .. note::
+            By default, the server uses a separate thread to communicate with each client. If use_selector is True,
+            it instead multiplexes all of the client sockets on a single I/O thread, parsing the incoming messages
+            incrementally as data arrives. This scales better to large numbers of clients, and avoids the need for
+            each client thread to wake up periodically to check whether the server is terminating. However, since
+            received frames are processed on the I/O thread, anything that blocks whilst processing a frame (e.g.
+            the PES_WAIT strategy, or decompressing the frame on the I/O thread) will stall all clients, so this is
+            best combined with the PES_DISCARD strategy (and ideally with lazy decompression or decompression
+            processes, neither of which makes the I/O thread wait for frames to be decompressed).
+        .. note::
+            If a shared memory port is specified, the server will also listen for connections on that port from
+            clients on the same machine that want to send their frames via shared memory (see MappingClient).
+
+        :param port:                The port on which the server should listen for connections, or the path of the
+                                    Unix domain socket on which to listen.
+        :param decompression_processes: The number of worker processes to use for decompression (0 means use none).
+        :param frame_decoder:       An optional function to use to decompress received frames directly into the
+                                    messages stored by the client handlers (takes precedence over frame_decompressor).
         :param frame_decompressor:  An optional function to use to decompress received frames.
+        :param frame_window_size:   The maximum number of frames each client may have in flight at once (clients
+                                    that ask for a smaller window, or don't support windowing, will use that).
+        :param latest_wins:         Whether a frame received by a client handler whilst its frame message queue is
+                                    full should overwrite the oldest unconsumed frame on the queue, rather than being
+                                    discarded (this can only be used with the PES_DISCARD pool empty strategy).
+        :param lazy_decompression:  Whether to defer decompressing each received frame until it is actually passed
+                                    to a frame receiver (this avoids decompressing frames that are later discarded).
         :param pool_empty_strategy: The strategy to use when a frame message is received by a client handler whilst
                                     the pool of frames associated with its frame message queue is empty.
+        :param shared_memory_port:  An optional port (or Unix domain socket path) on which to listen for connections
+                                    from clients that want to send their frames via shared memory.
+        :param use_selector:        Whether to multiplex all of the client sockets on a single I/O thread, rather
+                                    than using a separate thread for each client.
         """
         self.__client_handlers = {}                             # type: Dict[int, MappingClientHandler]
+        self.__decompression_pool = None                        # type: Optional[ProcessPoolExecutor]
+        self.__decompression_processes = decompression_processes  # type: int
         self.__finished_clients = set()                         # type: Set[int]
+        self.__frame_decoder = frame_decoder  # type: Optional[Callable[[FrameMessage, FrameMessage], None]]
         self.__frame_decompressor = frame_decompressor          # type: Optional[Callable[[FrameMessage], FrameMessage]]
+        self.__frame_window_size = frame_window_size            # type: int
+        self.__latest_wins = latest_wins                        # type: bool
+        self.__lazy_decompression = lazy_decompression          # type: bool
         self.__next_client_id = 0                               # type: int
         self.__pool_empty_strategy = pool_empty_strategy        # type: PooledQueue.EPoolEmptyStrategy
-        self.__port = port                                      # type: int
+        self.__port = port                                      # type: Union[int, str]
         self.__server_thread = None                             # type: Optional[threading.Thread]
+        self.__shared_memory_port = shared_memory_port          # type: Optional[Union[int, str]]
         self.__should_terminate = threading.Event()             # type: threading.Event
+        self.__use_selector = use_selector                      # type: bool
 
         self.__lock = threading.Lock()                          # type: threading.Lock
         self.__client_ready = threading.Condition(self.__lock)  # type: threading.Condition
 
+        # A condition variable that is notified whenever a frame is pushed onto or popped from any client handler's
+        # frame message queue, or a client finishes, or the server starts to terminate. (This has its own lock, so
+        # that the client handlers can notify it without needing to acquire the server's lock.)
+        self.__queue_changed = threading.Condition()            # type: threading.Condition
+
+        # Note: This is checked once everything else has been set up, so that the server can still be destroyed.
+        if latest_wins and pool_empty_strategy != PooledQueue.PES_DISCARD:
+            raise RuntimeError("Error: Latest-wins mode can only be used with the PES_DISCARD pool empty strategy")
+
     # DESTRUCTOR
 
     def __del__(self):
@@ -57,6 +121,30 @@ class MappingServer:
 
     # PUBLIC METHODS
 
+    def connect_loopback_client(self, calib_msg: CalibrationMessage) -> MappingClientHandler:
+        """
+        Connect a loopback client, i.e. a client in the same process that hands its frames to the server directly.
+
+        .. note::
+            This is normally called by MappingClient (when it's constructed with the server as its endpoint), rather
+            than directly. The loopback client is allocated a client ID in the usual way, and its frames can be
+            retrieved exactly as for any other client. The server must have been started first.
+
+        :param calib_msg:   The client's calibration message.
+        :return:            The handler for the client, onto which the client should push its frames.
+        """
+        with self.__lock:
+            print("Accepted loopback connection from client {}".format(self.__next_client_id))
+            client_handler = self.__make_client_handler(None, shared_memory=False)  # type: MappingClientHandler
+            client_handler.connect_loopback(calib_msg)
+            client_thread = threading.Thread(
+                target=self.__handle_client, args=[client_handler]
+            )  # type: threading.Thread
+            client_thread.start()
+            client_handler.set_thread(client_thread)
+
+        return client_handler
+
     def get_frame(self, client_id: int, receiver: Callable[[FrameMessage], None]) -> None:
         """
         Get the oldest frame from the specified client that has not yet been processed.
@@ -74,6 +162,36 @@ class MappingServer:
         if client_handler is not None:
             client_handler.get_frame(receiver)
 
+    def get_frames(self, client_id: int, receiver: Callable[[List[FrameMessage]], None], max_frames: int) -> int:
+        """
+        Get up to the specified number of the oldest frames from the specified client that have not yet been
+        processed, and pass them to the receiver as a batch.
+
+        .. note::
+            This waits for at least one frame to be available, and then drains as many of the client's queued frames
+            as it can (up to the maximum) in one go (see MappingClientHandler.get_frames). This is useful when the
+            consumer can process several frames at once (e.g. see RGBDFrameBatchReceiver), or needs to catch up.
+
+        :param client_id:   The ID of the client.
+        :param receiver:    The receiver to which to pass the batch of frames (oldest first).
+        :param max_frames:  The maximum number of frames to pass to the receiver.
+        :return:            The number of frames passed to the receiver.
+        """
+        client_handler = self._get_client_handler(client_id, wait_for_start=True)  # type: MappingClientHandler
+        return client_handler.get_frames(receiver, max_frames) if client_handler is not None else 0
+
+    def get_frames_overwritten(self, client_id: int) -> int:
+        """
+        Get the number of frames from the specified client that were overwritten on its frame message queue (in
+        latest-wins mode) before they could be consumed.
+
+        :param client_id:   The ID of the client.
+        :return:            The number of frames from the client that were overwritten, if the client is active,
+                            or 0 otherwise.
+        """
+        client_handler = self._get_client_handler(client_id, wait_for_start=False)  # type: MappingClientHandler
+        return client_handler.get_frames_overwritten() if client_handler is not None else 0
+
     def get_image_shapes(self, client_id: int) -> Optional[List[Tuple[int, int, int]]]:
         """
         Try to get the shapes of the images being produced by the different cameras being used by the specified client.
@@ -97,6 +215,20 @@ class MappingServer:
         client_handler = self._get_client_handler(client_id, wait_for_start=True)  # type: MappingClientHandler
         return client_handler.get_intrinsics() if client_handler is not None else None
 
+    def get_newest_pose(self, client_id: int) -> Optional[Tuple[int, np.ndarray]]:
+        """
+        Try to get the newest pose received from the specified client.
+
+        .. note::
+            This includes the poses in any pose-only updates sent by the client (see MappingClient).
+
+        :param client_id:   The ID of the client.
+        :return:            A tuple consisting of the frame index and the pose, if the client is active and any
+                            frame has been received from it, or None otherwise.
+        """
+        client_handler = self._get_client_handler(client_id, wait_for_start=True)  # type: MappingClientHandler
+        return client_handler.get_newest_pose() if client_handler is not None else None
+
     def has_finished(self, client_id: int) -> bool:
         """
         Get whether or not the specified client has finished.
@@ -127,6 +259,80 @@ class MappingServer:
         """
         return not self.has_finished(client_id)
 
+    def iter_frames(self, client_id: int, *, copy: bool = False, prefetch: bool = False,
+                    timeout: Optional[float] = None) \
+            -> Iterator[Tuple[int, Optional[float], np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        Make a generator that yields the RGB-D frames from the specified client as they arrive, oldest first.
+
+        .. note::
+            Each frame is yielded as a tuple consisting of the frame index, the frame timestamp, the RGB image,
+            the depth image and the pose (see RGBDFrameMessageUtil.extract_frame_data).
+        .. note::
+            The generator ends once the client has finished and all of its frames have been yielded, or the server
+            terminates, or no frame arrives within the timeout. Each frame is leased from the client's handler (see
+            lease_frame), and the lease is only released when the next frame is requested. If copy is False, the
+            images and pose are read-only views into the leased message, so they must not be used after that point.
+            If copy is True, they are independent copies that remain valid indefinitely.
+        .. note::
+            If prefetch is True, then whilst the caller is processing each frame, the next frame is decompressed
+            on a background thread (if its decompression has been deferred, i.e. if lazy decompression is enabled),
+            so that decompression overlaps with processing.
+
+        :param client_id:   The ID of the client.
+        :param copy:        Whether to yield copies of the images and poses (rather than views into leased messages).
+        :param prefetch:    Whether to decompress each frame in the background whilst the previous one is processed.
+        :param timeout:     The maximum time to wait for each frame (in seconds), or None to wait indefinitely.
+        :return:            The generator.
+        """
+        prefetcher = ThreadPoolExecutor(max_workers=1) if prefetch else None  # type: Optional[ThreadPoolExecutor]
+
+        try:
+            while True:
+                # Wait for a frame, and then lease it. Since another consumer could take the frame in the meantime,
+                # the lease is only waited for until the timeout for the frame runs out.
+                start = time.monotonic()  # type: float
+                if not self.wait_for_frame(client_id, timeout):
+                    break
+
+                remaining = max(timeout - (time.monotonic() - start), 0.0) \
+                    if timeout is not None else None  # type: Optional[float]
+                lease = self.lease_frame(client_id, remaining)  # type: Optional[FrameMessageLease]
+                if lease is None:
+                    break
+
+                with lease:
+                    # Start decompressing the next frame in the background, if requested.
+                    client_handler = self._get_client_handler(
+                        client_id, wait_for_start=False
+                    )  # type: Optional[MappingClientHandler]
+                    if prefetcher is not None and client_handler is not None:
+                        prefetcher.submit(client_handler.prefetch_frame)
+
+                    # Yield the frame's data (or a copy of it).
+                    yield RGBDFrameMessageUtil.extract_frame_data(lease.get_frame_message(), copy=copy)
+        finally:
+            if prefetcher is not None:
+                prefetcher.shutdown()
+
+    def lease_frame(self, client_id: int, timeout: Optional[float] = None) -> Optional[FrameMessageLease]:
+        """
+        Lease the oldest frame from the specified client that has not yet been processed.
+
+        .. note::
+            This is a zero-copy alternative to get_frame: the frame message is not reused until the lease has been
+            released, so the consumer can work directly with (read-only) views into its data, e.g. those returned
+            by RGBDFrameMessageUtil.extract_frame_data with copy=False. The lease should be released (e.g. by using
+            it in a with statement) as soon as the consumer is done with the frame.
+
+        :param client_id:   The ID of the client.
+        :param timeout:     The maximum time to wait for a frame (in seconds), or None to wait indefinitely.
+        :return:            A lease on the frame, if the client is active and a frame could be obtained within the
+                            timeout, or None otherwise.
+        """
+        client_handler = self._get_client_handler(client_id, wait_for_start=True)  # type: MappingClientHandler
+        return client_handler.lease_frame(timeout) if client_handler is not None else None
+
     def peek_newest_frame(self, client_id: int, receiver: Callable[[FrameMessage], None]) -> bool:
         """
         Peek at the newest frame from the specified client.
@@ -149,16 +355,71 @@ class MappingServer:
     def start(self) -> None:
         """Start the server."""
         with self.__lock:
+            if self.__decompression_processes > 0:
+                self.__decompression_pool = ProcessPoolExecutor(
+                    max_workers=self.__decompression_processes, mp_context=multiprocessing.get_context("spawn")
+                )
+
             self.__server_thread = threading.Thread(target=self.__run_server)
             self.__server_thread.start()
 
     def terminate(self) -> None:
         """Tell the server to terminate."""
         with self.__lock:
-            if not self.__should_terminate.is_set():
-                self.__should_terminate.set()
-                if self.__server_thread is not None:
-                    self.__server_thread.join()
+            if self.__should_terminate.is_set():
+                return
+
+            self.__should_terminate.set()
+            self.__client_ready.notify_all()
+
+        self.__notify_queue_changed()
+
+        # Note: The server thread must be joined without holding the lock, since when the selector is being used,
+        #       the server thread finishes the remaining clients (which requires the lock) before it exits.
+        if self.__server_thread is not None:
+            self.__server_thread.join()
+        if self.__decompression_pool is not None:
+            self.__decompression_pool.shutdown()
+
+    def wait_for_any_frame(self, client_ids: List[int], timeout: Optional[float] = None) -> Optional[int]:
+        """
+        Wait until any of the specified clients is ready to yield a frame.
+
+        .. note::
+            This blocks on notifications from the client handlers (rather than polling), so it returns as soon as
+            a frame arrives. It gives up if all of the clients finish (without any frames left to yield) or the
+            server terminates.
+
+        :param client_ids:  The IDs of the clients.
+        :param timeout:     The maximum time to wait (in seconds), or None to wait indefinitely.
+        :return:            The ID of a client that is ready to yield a frame, if any, or None otherwise.
+        """
+        ready_client_ids = []  # type: List[int]
+
+        def is_done() -> bool:
+            ready_client_ids[:] = [client_id for client_id in client_ids if self.has_frames_now(client_id)]
+            return len(ready_client_ids) > 0 or self.__should_terminate.is_set() \
+                or all(self.has_finished(client_id) for client_id in client_ids)
+
+        with self.__queue_changed:
+            self.__queue_changed.wait_for(is_done, timeout)
+
+        return ready_client_ids[0] if len(ready_client_ids) > 0 else None
+
+    def wait_for_frame(self, client_id: int, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until the specified client is ready to yield a frame.
+
+        .. note::
+            This blocks on notifications from the client's handler (rather than polling), so it returns as soon as
+            a frame arrives. It gives up if the client finishes (without any frames left to yield) or the server
+            terminates.
+
+        :param client_id:   The ID of the client.
+        :param timeout:     The maximum time to wait (in seconds), or None to wait indefinitely.
+        :return:            True, if the client is ready to yield a frame, or False otherwise.
+        """
+        return self.wait_for_any_frame([client_id], timeout) is not None
 
     # PROTECTED METHODS
 
@@ -179,7 +440,7 @@ class MappingServer:
                     and client_id not in self.__finished_clients \
                     and not self.__should_terminate.is_set():
                 if wait_for_start:
-                    self.__client_ready.wait(0.1)
+                    self.__client_ready.wait()
                 else:
                     break
 
@@ -187,6 +448,43 @@ class MappingServer:
 
     # PRIVATE METHODS
 
+    def __finish_client(self, client_handler: MappingClientHandler, *,
+                        close_in_background: bool = False) -> Optional[threading.Thread]:
+        """
+        Add a client that has finished to the finished clients set, and remove its handler.
+
+        .. note::
+            Closing the handler waits for any consumer that's currently using its frames. If the client is being
+            finished on a thread that's also serving other clients (e.g. the selector's I/O thread), the handler
+            should be closed in the background, so that a slow consumer can't stall the other clients.
+
+        :param client_handler:      The handler for the client.
+        :param close_in_background: Whether to close the handler on a separate thread.
+        :return:                    The thread on which the handler is being closed, if it's being closed in the
+                                    background, or None otherwise.
+        """
+        client_id = client_handler.get_client_id()  # type: int
+        with self.__lock:
+            print("Stopping client: {}".format(client_id))
+            self.__finished_clients.add(client_id)
+            self.__client_handlers.pop(client_id, None)
+            self.__client_ready.notify_all()
+
+        # Note: The handler must be closed without holding the lock, since closing it waits for any consumer that's
+        #       currently using its frames, and that consumer's receiver may itself be waiting for the lock.
+        def close_client_handler() -> None:
+            client_handler.close()
+            print("Client terminated: {}".format(client_id))
+            self.__notify_queue_changed()
+
+        if close_in_background:
+            close_thread = threading.Thread(target=close_client_handler)  # type: threading.Thread
+            close_thread.start()
+            return close_thread
+        else:
+            close_client_handler()
+            return None
+
     def __handle_client(self, client_handler: MappingClientHandler) -> None:
         """
         Handle messages from a client.
@@ -206,7 +504,7 @@ class MappingServer:
 
             # Signal to other threads that we're ready to start running the main loop for the client.
             print("Client ready: {}".format(client_id))
-            self.__client_ready.notify()
+            self.__client_ready.notify_all()
 
         # Run the main loop for the client. Loop until either (a) the connection drops, or (b) the server itself
         # is terminating.
@@ -217,49 +515,205 @@ class MappingServer:
         # or (b) the server itself is terminating.
         if not self.__should_terminate.is_set():
             print("Waiting for client's queue to drain: {}".format(client_id))
-            while client_handler.has_frames_now() and not self.__should_terminate.is_set():
-                time.sleep(0.1)
+            with self.__queue_changed:
+                self.__queue_changed.wait_for(
+                    lambda: not client_handler.has_frames_now() or self.__should_terminate.is_set()
+                )
 
         # Once the client's finished, add it to the finished clients set and remove its handler.
-        with self.__lock:
-            print("Stopping client: {}".format(client_id))
-            self.__finished_clients.add(client_id)
-            del(self.__client_handlers[client_id])
-            print("Client terminated: {}".format(client_id))
+        self.__finish_client(client_handler)
 
-    def __run_server(self) -> None:
-        """Run the server."""
-        # Set up the server socket and listen for connections.
-        server_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)  # type: socket.SocketType
-        server_sock.bind(("127.0.0.1", self.__port))
-        server_sock.listen(5)
+    def __make_client_handler(self, client_sock: Optional[socket.SocketType], *,
+                              shared_memory: bool) -> MappingClientHandler:
+        """
+        Make a handler for a newly-connected client, and allocate it the next available client ID.
+
+        .. note::
+            This must be called with the lock held.
+
+        :param client_sock:     The socket used to communicate with the client (None for a loopback client).
+        :param shared_memory:   Whether the client will send its frames via shared memory.
+        :return:                The client handler.
+        """
+        # If the client will send its frames via shared memory, only small messages will be sent over the socket,
+        # so disable Nagle's algorithm to stop them being delayed.
+        if shared_memory and not SocketUtil.is_unix_socket(client_sock):
+            client_sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        client_handler = MappingClientHandler(
+            self.__next_client_id, client_sock, self.__should_terminate,
+            decompression_pool=self.__decompression_pool,
+            frame_decoder=self.__frame_decoder,
+            frame_decompressor=self.__frame_decompressor,
+            frame_window_size=self.__frame_window_size,
+            latest_wins=self.__latest_wins,
+            lazy_decompression=self.__lazy_decompression,
+            pool_empty_strategy=self.__pool_empty_strategy,
+            queue_changed=self.__queue_changed,
+            shared_memory=shared_memory
+        )  # type: MappingClientHandler
+        self.__next_client_id += 1
+        return client_handler
+
+    def __notify_queue_changed(self) -> None:
+        """Notify anyone waiting on the queue changed condition that something they may be waiting for has happened."""
+        with self.__queue_changed:
+            self.__queue_changed.notify_all()
+
+    def __run_selector_loop(self, server_socks: List[socket.SocketType]) -> None:
+        """
+        Communicate with all of the clients on the current thread, multiplexing their sockets using a selector.
+
+        :param server_socks:    The server sockets on which to listen for connections (the second of these, if
+                                present, is the one for clients that send their frames via shared memory).
+        """
+        selector = selectors.DefaultSelector()  # type: selectors.BaseSelector
+        for server_sock in server_socks:
+            server_sock.setblocking(False)
+            selector.register(server_sock, selectors.EVENT_READ)
+
+        # The handlers for the clients that are still connected, and for those whose connections have dropped
+        # but whose frame message queues have not yet fully drained.
+        connected_handlers = {}  # type: Dict[socket.SocketType, MappingClientHandler]
+        draining_handlers = []   # type: List[MappingClientHandler]
 
-        print("Listening for connections on 127.0.0.1:{}...".format(self.__port))
+        # The threads on which the handlers for any finished clients are being closed.
+        close_threads = []  # type: List[threading.Thread]
 
         while not self.__should_terminate.is_set():
             timeout = 0.1  # type: float
-            readable, _, _ = select([server_sock], [], [], timeout)
-            if self.__should_terminate.is_set():
-                break
-
-            for s in readable:
-                if s is server_sock:
-                    # Accept a client connection, and set a short timeout on the socket so that reads can be
-                    # interrupted if necessary (e.g. when we want to terminate).
-                    client_sock, client_endpoint = server_sock.accept()
-                    client_sock.settimeout(0.1)
+            for key, events in selector.select(timeout):
+                if key.fileobj in server_socks:
+                    # Accept a client connection, and make the client socket non-blocking.
+                    server_sock = cast(socket.SocketType, key.fileobj)  # type: socket.SocketType
+                    try:
+                        client_sock, client_endpoint = server_sock.accept()
+                    except BlockingIOError:
+                        continue
 
-                    print("Accepted connection from client {} @ {}".format(self.__next_client_id, client_endpoint))
+                    client_sock.setblocking(False)
 
                     with self.__lock:
-                        client_handler = MappingClientHandler(
-                            self.__next_client_id, client_sock, self.__should_terminate,
-                            frame_decompressor=self.__frame_decompressor,
-                            pool_empty_strategy=self.__pool_empty_strategy
+                        print("Accepted connection from client {} @ {}".format(self.__next_client_id, client_endpoint))
+                        client_handler = self.__make_client_handler(
+                            client_sock, shared_memory=server_sock is not server_socks[0]
                         )  # type: MappingClientHandler
-                        client_thread = threading.Thread(
-                            target=self.__handle_client, args=[client_handler]
-                        )  # type: threading.Thread
-                        client_thread.start()
-                        client_handler.set_thread(client_thread)
-                        self.__next_client_id += 1
+
+                    print("Starting client: {}".format(client_handler.get_client_id()))
+                    connected_handlers[client_sock] = client_handler
+                    selector.register(client_sock, selectors.EVENT_READ, client_handler)
+                    continue
+
+                client_sock = cast(socket.SocketType, key.fileobj)
+                client_handler = key.data
+                client_id = client_handler.get_client_id()  # type: int
+                was_calibrated = client_handler.get_image_shapes() is not None  # type: bool
+
+                # Read and process whatever the client has sent, and send it any pending replies.
+                if events & selectors.EVENT_READ:
+                    client_handler.read_available()
+                if events & selectors.EVENT_WRITE:
+                    client_handler.write_available()
+
+                # If the client's calibration message has just been processed, add its handler to the dictionary of
+                # handlers for active clients, and signal to other threads that the client is ready.
+                if not was_calibrated and client_handler.get_image_shapes() is not None:
+                    with self.__lock:
+                        self.__client_handlers[client_id] = client_handler
+                        print("Client ready: {}".format(client_id))
+                        self.__client_ready.notify_all()
+
+                # If the connection has dropped, stop watching the client's socket, and wait for its frame message
+                # queue to drain. Otherwise, make sure we're only waiting to write to the socket if we need to.
+                if not client_handler.is_connection_ok():
+                    selector.unregister(client_sock)
+                    client_sock.close()
+                    del connected_handlers[client_sock]
+                    print("Waiting for client's queue to drain: {}".format(client_id))
+                    draining_handlers.append(client_handler)
+                else:
+                    wanted_events = selectors.EVENT_READ  # type: int
+                    if client_handler.has_pending_output():
+                        wanted_events |= selectors.EVENT_WRITE
+                    if wanted_events != key.events:
+                        selector.modify(client_sock, wanted_events, client_handler)
+
+            # Finish any clients whose frame message queues have now fully drained.
+            for client_handler in [h for h in draining_handlers if not h.has_frames_now()]:
+                draining_handlers.remove(client_handler)
+                close_threads.append(self.__finish_client(client_handler, close_in_background=True))
+
+            close_threads = [t for t in close_threads if t.is_alive()]
+
+        # Once the server is terminating, finish all of the remaining clients. (There are no other clients left
+        # to serve at this point, so their handlers can be closed on this thread.)
+        for client_sock, client_handler in connected_handlers.items():
+            client_sock.close()
+            self.__finish_client(client_handler)
+
+        for client_handler in draining_handlers:
+            self.__finish_client(client_handler)
+
+        # Wait for the handlers of any clients that finished earlier to be closed.
+        for close_thread in close_threads:
+            close_thread.join()
+
+        selector.close()
+
+    def __run_server(self) -> None:
+        """Run the server."""
+        # Set up the server socket and listen for connections.
+        server_sock = SocketUtil.make_server_socket(self.__port)  # type: socket.SocketType
+        server_sock.listen(5)
+
+        print("Listening for connections on {}...".format(
+            SocketUtil.format_endpoint(SocketUtil.make_server_endpoint(self.__port))
+        ))
+
+        server_socks = [server_sock]  # type: List[socket.SocketType]
+
+        # If requested, also set up a server socket for clients that want to send their frames via shared memory.
+        if self.__shared_memory_port is not None:
+            shared_memory_sock = SocketUtil.make_server_socket(self.__shared_memory_port)  # type: socket.SocketType
+            shared_memory_sock.listen(5)
+            server_socks.append(shared_memory_sock)
+
+            print("Listening for shared memory connections on {}...".format(
+                SocketUtil.format_endpoint(SocketUtil.make_server_endpoint(self.__shared_memory_port))
+            ))
+
+        # Note: We make sure the server sockets are closed once the server terminates, so that the paths of any
+        #       Unix domain sockets are removed from the file system.
+        try:
+            # If we're multiplexing the client sockets on a single thread, do that instead of starting client threads.
+            if self.__use_selector:
+                self.__run_selector_loop(server_socks)
+                return
+
+            while not self.__should_terminate.is_set():
+                timeout = 0.1  # type: float
+                readable, _, _ = select(server_socks, [], [], timeout)
+                if self.__should_terminate.is_set():
+                    break
+
+                for s in readable:
+                    if s in server_socks:
+                        # Accept a client connection, and set a short timeout on the socket so that reads can be
+                        # interrupted if necessary (e.g. when we want to terminate).
+                        client_sock, client_endpoint = s.accept()
+                        client_sock.settimeout(0.1)
+
+                        print("Accepted connection from client {} @ {}".format(self.__next_client_id, client_endpoint))
+
+                        with self.__lock:
+                            client_handler = self.__make_client_handler(
+                                client_sock, shared_memory=s is not server_sock
+                            )  # type: MappingClientHandler
+                            client_thread = threading.Thread(
+                                target=self.__handle_client, args=[client_handler]
+                            )  # type: threading.Thread
+                            client_thread.start()
+                            client_handler.set_thread(client_thread)
+        finally:
+            for s in server_socks:
+                SocketUtil.close_server_socket(s)
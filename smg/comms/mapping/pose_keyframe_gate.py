@@ -0,0 +1,67 @@
+import numpy as np
+
+from typing import Optional
+
+
+class PoseKeyframeGate:
+    """
+    Used to decide which frames a mapping client should send in full, based on how far the camera has moved.
+
+    .. note::
+        A frame is a keyframe if the camera has translated or rotated by more than the specified thresholds since
+        the last keyframe, or if too many frames have been skipped since then (this allows the frames to be thinned
+        out rather than dropped altogether when the camera is stationary). Frames that are not keyframes can be
+        replaced by pose-only updates (see MappingClient).
+    """
+
+    # CONSTRUCTOR
+
+    def __init__(self, *, max_skipped_frames: Optional[int] = None, rotation_threshold: float = np.deg2rad(5.0),
+                 translation_threshold: float = 0.05):
+        """
+        Construct a pose keyframe gate.
+
+        :param max_skipped_frames:      The maximum number of consecutive frames to skip (None means no maximum).
+        :param rotation_threshold:      The angle (in radians) through which the camera must rotate for a frame to be
+                                        a keyframe.
+        :param translation_threshold:   The distance (in metres) by which the camera must move for a frame to be a
+                                        keyframe.
+        """
+        self.__keyframe_pose = None                           # type: Optional[np.ndarray]
+        self.__max_skipped_frames = max_skipped_frames        # type: Optional[int]
+        self.__rotation_threshold = rotation_threshold        # type: float
+        self.__skipped_frames = 0                             # type: int
+        self.__translation_threshold = translation_threshold  # type: float
+
+    # PUBLIC METHODS
+
+    def is_keyframe(self, pose: np.ndarray) -> bool:
+        """
+        Determine whether the next frame is a keyframe, based on its pose.
+
+        .. note::
+            The frames must be passed to this function in order, since it records the pose of each keyframe.
+
+        :param pose:    The pose of the frame (a 4x4 matrix).
+        :return:        True, if the frame is a keyframe, or False otherwise.
+        """
+        keyframe = self.__keyframe_pose is None  # type: bool
+
+        if not keyframe:
+            # Compute the translation and rotation of the camera since the last keyframe. The rotation angle is
+            # computed from the trace of the relative rotation matrix (clipped to allow for rounding errors).
+            translation = np.linalg.norm(pose[0:3, 3] - self.__keyframe_pose[0:3, 3])  # type: float
+            relative_rotation = self.__keyframe_pose[0:3, 0:3].T @ pose[0:3, 0:3]     # type: np.ndarray
+            rotation = np.arccos(np.clip((np.trace(relative_rotation) - 1) / 2, -1.0, 1.0))  # type: float
+
+            keyframe = bool(translation > self.__translation_threshold or rotation > self.__rotation_threshold) or (
+                self.__max_skipped_frames is not None and self.__skipped_frames >= self.__max_skipped_frames
+            )
+
+        if keyframe:
+            self.__keyframe_pose = pose.copy()
+            self.__skipped_frames = 0
+        else:
+            self.__skipped_frames += 1
+
+        return keyframe
@@ -1,2 +1,3 @@
+from .async_remote_skeleton_detector import AsyncRemoteSkeletonDetector
 from .remote_skeleton_detector import RemoteSkeletonDetector
 from .skeleton_detection_service import SkeletonDetectionService
@@ -0,0 +1,216 @@
+import asyncio
+import numpy as np
+import socket
+
+from typing import Callable, List, Optional, Tuple, Union
+
+from smg.skeletons import Skeleton3D, SkeletonUtil
+
+from ..base import *
+from .skeleton_control_message import SkeletonControlMessage
+
+
+class AsyncRemoteSkeletonDetector:
+    """An asyncio-based skeleton detector that makes use of a remote skeleton detection service to operate."""
+
+    # CONSTRUCTOR
+
+    def __init__(self, endpoint: Union[Tuple[str, int], str] = ("127.0.0.1", 7852), *, defer_acks: bool = False,
+                 frame_compressor: Optional[Callable[[FrameMessage], FrameMessage]] = None):
+        """
+        Construct an asyncio-based remote skeleton detector.
+
+        .. note::
+            This speaks the same protocol as RemoteSkeletonDetector (see there for the meaning of defer_acks). The
+            detector must be connected (using connect, or by using it as an async context manager) before use.
+        .. note::
+            Whilst a detection is in progress on the service, the event loop is free to run other coroutines,
+            which makes it possible to overlap inference with other I/O.
+
+        :param endpoint:            The service host and port, e.g. ("127.0.0.1", 7852), or the path of the
+                                    service's Unix domain socket.
+        :param defer_acks:          Whether to defer reading the acknowledgements for detection requests.
+        :param frame_compressor:    An optional function to use to compress frames prior to transmission.
+        """
+        self.__ack_msg = AckMessage()               # type: AckMessage
+        self.__alive = False                        # type: bool
+        self.__defer_acks = defer_acks              # type: bool
+        self.__endpoint = endpoint                  # type: Union[Tuple[str, int], str]
+        self.__frame_compressor = frame_compressor  # type: Optional[Callable[[FrameMessage], FrameMessage]]
+        self.__pending_acks = 0                     # type: int
+        self.__people_mask_shape = None             # type: Optional[Tuple[int, int]]
+        self.__sock = None                          # type: Optional[socket.SocketType]
+
+    # SPECIAL METHODS
+
+    async def __aenter__(self):
+        """Connect to the service (this allows the detector's lifetime to be managed by an async with statement)."""
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """Destroy the detector at the end of the async with statement that's used to manage its lifetime."""
+        self.terminate()
+
+    # PUBLIC METHODS
+
+    async def begin_detection(self, colour_image: np.ndarray, world_from_camera: np.ndarray, *,
+                              frame_idx: int = -1) -> bool:
+        """
+        Try to request that the remote skeleton detection service detect any skeletons in the specified colour image.
+
+        :param colour_image:        The colour image.
+        :param world_from_camera:   The pose from which the image was captured.
+        :param frame_idx:           The frame index (if available).
+        :return:                    True, if the detection was successfully requested, or False otherwise.
+        """
+        # Make the frame message.
+        dummy_depth_image = np.zeros(colour_image.shape[:2], dtype=np.uint16)  # type: np.ndarray
+        frame_msg = RGBDFrameMessageUtil.make_frame_message(
+            frame_idx, colour_image, dummy_depth_image, world_from_camera
+        )  # type: FrameMessage
+
+        # If requested, compress the frame prior to transmission.
+        compressed_frame_msg = frame_msg  # type: FrameMessage
+        if self.__frame_compressor is not None:
+            compressed_frame_msg = self.__frame_compressor(frame_msg)
+
+        # Make the frame header message.
+        max_images = 2  # type: int
+        header_msg = FrameHeaderMessage(max_images)  # type: FrameHeaderMessage
+        header_msg.set_image_byte_sizes(compressed_frame_msg.get_image_byte_sizes())
+        header_msg.set_image_codec_ids(compressed_frame_msg.get_image_codec_ids())
+        header_msg.set_image_shapes(compressed_frame_msg.get_image_shapes())
+
+        # Send the begin detection message, the frame header message and the frame message, then (unless
+        # acknowledgements are being deferred) wait for an acknowledgement from the service.
+        connection_ok = \
+            await self.__read_pending_acks() and \
+            await AsyncSocketUtil.write_messages(
+                self.__sock, SkeletonControlMessage.begin_detection(), header_msg, compressed_frame_msg
+            )  # type: bool
+
+        if connection_ok:
+            self.__pending_acks += 1
+            if not self.__defer_acks:
+                connection_ok = await self.__read_pending_acks()
+
+        # If that succeeded, store the expected people mask shape for later.
+        if connection_ok:
+            self.__people_mask_shape = colour_image.shape[:2]
+
+        return connection_ok
+
+    async def connect(self) -> None:
+        """Connect to the service."""
+        loop = asyncio.get_event_loop()  # type: asyncio.AbstractEventLoop
+
+        try:
+            self.__sock = SocketUtil.make_socket(self.__endpoint)
+            self.__sock.setblocking(False)
+            await loop.sock_connect(self.__sock, self.__endpoint)
+            self.__alive = True
+        except (ConnectionRefusedError, FileNotFoundError):
+            raise RuntimeError("Error: Could not connect to the service")
+
+    async def detect_skeletons(self, colour_image: np.ndarray, world_from_camera: np.ndarray, *,
+                               frame_idx: int = -1) -> Tuple[Optional[List[Skeleton3D]], Optional[np.ndarray]]:
+        """
+        Try to use the remote skeleton detection service to detect any skeletons in the specified colour image.
+
+        :param colour_image:        The colour image.
+        :param world_from_camera:   The pose from which the image was captured.
+        :param frame_idx:           The frame index (if available).
+        :return:                    A tuple consisting of a list of skeletons and a people mask, if the detection
+                                    succeeded, or (None, None) otherwise.
+        """
+        if await self.begin_detection(colour_image, world_from_camera, frame_idx=frame_idx):
+            return await self.end_detection()
+        else:
+            return None, None
+
+    async def end_detection(self) -> Tuple[Optional[List[Skeleton3D]], Optional[np.ndarray]]:
+        """
+        Try to request that the remote skeleton detection service send across any skeletons that it has just detected.
+
+        :return:    A tuple consisting of a list of skeletons and a people mask, if successful,
+                    or (None, None) otherwise.
+        """
+        # Make a local copy of the expected people mask shape, if any, and reset the global one.
+        people_mask_shape = self.__people_mask_shape  # type: Optional[Tuple[int, int]]
+        self.__people_mask_shape = None
+
+        # If there isn't an expected people mask shape, there wasn't a previous successful call to
+        # begin_detection, so early out.
+        if people_mask_shape is None:
+            return None, None
+
+        # Send the end detection message, then read any deferred acknowledgement, followed by the size of the
+        # skeleton data that the service wants to send across.
+        data_size_msg = SimpleMessage[int](int)  # type: SimpleMessage[int]
+        connection_ok = \
+            await AsyncSocketUtil.write_message(self.__sock, SkeletonControlMessage.end_detection()) and \
+            await self.__read_pending_acks() and \
+            await AsyncSocketUtil.read_message(self.__sock, data_size_msg)  # type: bool
+
+        # If that succeeds:
+        if connection_ok:
+            # Read the skeleton data itself, as well as the people mask.
+            data_msg = DataMessage(data_size_msg.extract_value())  # type: DataMessage
+            mask_msg = BinaryMaskMessage(people_mask_shape)  # type: BinaryMaskMessage
+            connection_ok = \
+                await AsyncSocketUtil.read_message(self.__sock, data_msg) and \
+                await AsyncSocketUtil.read_message(self.__sock, mask_msg)
+
+            # If that succeeds, construct a list of skeletons from the data, and extract the people mask.
+            if connection_ok:
+                data = str(data_msg.get_data().tobytes(), "utf-8")  # type: str
+                skeletons = SkeletonUtil.string_to_skeletons(data)  # type: List[Skeleton3D]
+                people_mask = mask_msg.get_mask()  # type: np.ndarray
+                return skeletons, people_mask
+
+        # If anything goes wrong, return (None, None).
+        return None, None
+
+    async def set_calibration(self, image_size: Tuple[int, int],
+                              intrinsics: Tuple[float, float, float, float]) -> bool:
+        """
+        Try to send the camera calibration to the remote skeleton detection service.
+
+        :param image_size:  The image size.
+        :param intrinsics:  The camera intrinsics, as an (fx, fy, cx, cy) tuple.
+        :return:            True, if the camera calibration was successfully sent, or False otherwise.
+        """
+        calib_msg = RGBDFrameMessageUtil.make_calibration_message(
+            image_size, image_size, intrinsics, intrinsics
+        )  # type: CalibrationMessage
+
+        return \
+            await self.__read_pending_acks() and \
+            await AsyncSocketUtil.write_messages(self.__sock, SkeletonControlMessage.set_calibration(), calib_msg) and \
+            await AsyncSocketUtil.read_message(self.__sock, self.__ack_msg)
+
+    def terminate(self) -> None:
+        """Tell the detector to terminate."""
+        if self.__alive:
+            try:
+                self.__sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self.__sock.close()
+            self.__alive = False
+
+    # PRIVATE METHODS
+
+    async def __read_pending_acks(self) -> bool:
+        """
+        Try to read any acknowledgements from the service that are still pending.
+
+        :return:    True, if all of the pending acknowledgements were successfully read, or False otherwise.
+        """
+        while self.__pending_acks > 0:
+            if not await AsyncSocketUtil.read_message(self.__sock, self.__ack_msg):
+                return False
+            self.__pending_acks -= 1
+
+        return True
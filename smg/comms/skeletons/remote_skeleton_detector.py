@@ -1,7 +1,7 @@
 import numpy as np
 import socket
 
-from typing import Callable, List, Optional, Tuple
+from typing import Callable, List, Optional, Tuple, Union
 
 from smg.skeletons import Skeleton3D, SkeletonUtil
 
@@ -14,27 +14,38 @@ class RemoteSkeletonDetector:
 
     # CONSTRUCTOR
 
-    def __init__(self, endpoint: Tuple[str, int] = ("127.0.0.1", 7852), *, timeout: Optional[float] = None,
+    def __init__(self, endpoint: Union[Tuple[str, int], str] = ("127.0.0.1", 7852), *,
+                 timeout: Optional[float] = None, defer_acks: bool = False,
                  frame_compressor: Optional[Callable[[FrameMessage], FrameMessage]] = None):
         """
         Construct a remote skeleton detector.
 
-        :param endpoint:            The service host and port, e.g. ("127.0.0.1", 7852).
+        .. note::
+            If acknowledgements are deferred, begin_detection will return as soon as the detection request has been
+            sent, rather than waiting for the service to acknowledge it. The acknowledgement will then be read at the
+            start of the next call that needs a response from the service (normally end_detection). This saves a
+            round trip per detection, and allows the caller to do other work whilst the frame is being transmitted.
+
+        :param endpoint:            The service host and port, e.g. ("127.0.0.1", 7852), or the path of the
+                                    service's Unix domain socket.
         :param timeout:             An optional socket timeout (in seconds).
+        :param defer_acks:          Whether to defer reading the acknowledgements for detection requests.
         :param frame_compressor:    An optional function to use to compress frames prior to transmission.
         """
         self.__alive = False                        # type: bool
+        self.__defer_acks = defer_acks              # type: bool
         self.__frame_compressor = frame_compressor  # type: Optional[Callable[[FrameMessage], FrameMessage]]
+        self.__pending_acks = 0                     # type: int
         self.__people_mask_shape = None             # type: Optional[Tuple[int, int]]
 
         try:
             # Try to connect to the service.
-            self.__sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)  # type: socket.SocketType
+            self.__sock = SocketUtil.make_socket(endpoint)  # type: socket.SocketType
             self.__sock.connect(endpoint)
             if timeout is not None:
                 self.__sock.settimeout(timeout)
             self.__alive = True
-        except ConnectionRefusedError:
+        except (ConnectionRefusedError, FileNotFoundError):
             # If we couldn't connect to the service, raise an exception.
             raise RuntimeError("Error: Could not connect to the service")
 
@@ -61,7 +72,8 @@ class RemoteSkeletonDetector:
         Try to request that the remote skeleton detection service detect any skeletons in the specified colour image.
 
         .. note::
-            This will return False iff the connection drops before the request can be completed.
+            This will return False iff the connection drops before the request can be completed. If acknowledgements
+            are being deferred, the request is deemed to be complete once it has been sent.
 
         :param colour_image:        The colour image.
         :param world_from_camera:   The pose from which the image was captured.
@@ -83,19 +95,22 @@ class RemoteSkeletonDetector:
         max_images = 2  # type: int
         header_msg = FrameHeaderMessage(max_images)  # type: FrameHeaderMessage
         header_msg.set_image_byte_sizes(compressed_frame_msg.get_image_byte_sizes())
+        header_msg.set_image_codec_ids(compressed_frame_msg.get_image_codec_ids())
         header_msg.set_image_shapes(compressed_frame_msg.get_image_shapes())
 
-        # First send the begin detection message, then send the frame header message, then send the frame message,
-        # then wait for an acknowledgement from the service. We chain all of these with 'and' so as to early out
-        # in case of failure.
-        connection_ok = True    # type: bool
-        ack_msg = AckMessage()  # type: AckMessage
+        # First send the begin detection message, the frame header message and the frame message (together),
+        # then (unless acknowledgements are being deferred) wait for an acknowledgement from the service. We
+        # chain these with 'and' so as to early out in case of failure.
+        connection_ok = \
+            self.__read_pending_acks() and \
+            SocketUtil.write_messages(
+                self.__sock, SkeletonControlMessage.begin_detection(), header_msg, compressed_frame_msg
+            )  # type: bool
 
-        connection_ok = connection_ok and \
-            SocketUtil.write_message(self.__sock, SkeletonControlMessage.begin_detection()) and \
-            SocketUtil.write_message(self.__sock, header_msg) and \
-            SocketUtil.write_message(self.__sock, compressed_frame_msg) and \
-            SocketUtil.read_message(self.__sock, ack_msg)
+        if connection_ok:
+            self.__pending_acks += 1
+            if not self.__defer_acks:
+                connection_ok = self.__read_pending_acks()
 
         # If that succeeded, store the expected people mask shape for later.
         if connection_ok:
@@ -137,9 +152,12 @@ class RemoteSkeletonDetector:
 
         # First send the end detection message, then read the size of the skeleton data that the service
         # wants to send across.
+        # Note that any acknowledgement for the preceding detection request that's been deferred will arrive
+        # before the size, so we read it first.
         data_size_msg = SimpleMessage[int](int)  # type: SimpleMessage[int]
         connection_ok = \
             SocketUtil.write_message(self.__sock, SkeletonControlMessage.end_detection()) and \
+            self.__read_pending_acks() and \
             SocketUtil.read_message(self.__sock, data_size_msg)  # type: bool
 
         # If that succeeds:
@@ -180,8 +198,8 @@ class RemoteSkeletonDetector:
         ack_msg = AckMessage()  # type: AckMessage
 
         connection_ok = \
-            SocketUtil.write_message(self.__sock, SkeletonControlMessage.set_calibration()) and \
-            SocketUtil.write_message(self.__sock, calib_msg) and \
+            self.__read_pending_acks() and \
+            SocketUtil.write_messages(self.__sock, SkeletonControlMessage.set_calibration(), calib_msg) and \
             SocketUtil.read_message(self.__sock, ack_msg)  # type: bool
 
         return connection_ok
@@ -192,3 +210,19 @@ class RemoteSkeletonDetector:
             self.__sock.shutdown(socket.SHUT_RDWR)
             self.__sock.close()
             self.__alive = False
+
+    # PRIVATE METHODS
+
+    def __read_pending_acks(self) -> bool:
+        """
+        Try to read any acknowledgements from the service that are still pending.
+
+        :return:    True, if all of the pending acknowledgements were successfully read, or False otherwise.
+        """
+        ack_msg = AckMessage()  # type: AckMessage
+        while self.__pending_acks > 0:
+            if not SocketUtil.read_message(self.__sock, ack_msg):
+                return False
+            self.__pending_acks -= 1
+
+        return True
@@ -3,7 +3,7 @@ import socket
 
 from OpenGL.GL import *
 from select import select
-from typing import Callable, List, Optional, Tuple
+from typing import Callable, Dict, List, Optional, Tuple, Union
 
 from smg.skeletons import PeopleMaskRenderer, Skeleton3D, SkeletonRenderer
 
@@ -20,14 +20,15 @@ class SkeletonDetectionService:
                     [int, np.ndarray, np.ndarray, np.ndarray, Tuple[float, float, float, float]],
                     Tuple[List[Skeleton3D], Optional[np.ndarray]]
                  ],
-                 port: int = 7852, *, debug: bool = False,
+                 port: Union[int, str] = 7852, *, debug: bool = False,
                  frame_decompressor: Optional[Callable[[FrameMessage], FrameMessage]] = None,
                  post_client_hook: Optional[Callable[[], None]] = None):
         """
         Construct a skeleton detection service.
 
         :param frame_processor:     The function to use to detect skeletons in frames.
-        :param port:                The port on which the service should listen for a connection.
+        :param port:                The port on which the service should listen for a connection, or the path of
+                                    the Unix domain socket on which to listen.
         :param debug:               Whether to print out debug messages.
         :param frame_decompressor:  An optional function to use to decompress received frames.
         :param post_client_hook:    An optional function to call each time a client disconnects.
@@ -36,7 +37,7 @@ class SkeletonDetectionService:
         self.__frame_decompressor = frame_decompressor      # type: Optional[Callable[[FrameMessage], FrameMessage]]
         self.__frame_processor = frame_processor            # type: Callable[[int, np.ndarray, np.ndarray, np.ndarray, Tuple[float, float, float, float]], Tuple[List[Skeleton3D], Optional[np.ndarray]]]
         self.__people_mask_renderer = PeopleMaskRenderer()  # type: PeopleMaskRenderer
-        self.__port = port                                  # type: int
+        self.__port = port                                  # type: Union[int, str]
         self.__post_client_hook = post_client_hook          # type: Optional[Callable[[], None]]
 
     # PUBLIC METHODS
@@ -44,14 +45,15 @@ class SkeletonDetectionService:
     def run(self) -> None:
         """Run the service."""
         # Set up the server socket.
-        server_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)  # type: socket.SocketType
-        server_sock.bind(("127.0.0.1", self.__port))
+        server_sock = SocketUtil.make_server_socket(self.__port)  # type: socket.SocketType
 
         # Repeatedly:
         while True:
             # Listen for a connection.
             server_sock.listen(1)
-            print("Listening for a connection on 127.0.0.1:{}...".format(self.__port))
+            print("Listening for a connection on {}...".format(
+                SocketUtil.format_endpoint(SocketUtil.make_server_endpoint(self.__port))
+            ))
 
             client_sock = None  # type: Optional[socket.SocketType]
 
@@ -71,6 +73,7 @@ class SkeletonDetectionService:
             people_mask = None              # type: Optional[np.ndarray]
             receiver = RGBDFrameReceiver()  # type: RGBDFrameReceiver
             skeletons = None                # type: Optional[List[Skeleton3D]]
+            stream_decoders = {}            # type: Dict[int, ImageCodec]
 
             while connection_ok:
                 # First, try to read a control message from the client.
@@ -97,7 +100,9 @@ class SkeletonDetectionService:
                             # Set up a frame message accordingly.
                             image_shapes = header_msg.get_image_shapes()              # type: List[Tuple[int, int, int]]
                             image_byte_sizes = header_msg.get_image_byte_sizes()      # type: List[int]
-                            frame_msg = FrameMessage(image_shapes, image_byte_sizes)  # type: FrameMessage
+                            frame_msg = FrameMessage(
+                                image_shapes, image_byte_sizes, image_codec_ids=header_msg.get_image_codec_ids()
+                            )  # type: FrameMessage
 
                             # Try to read the contents of the frame message from the client.
                             connection_ok = SocketUtil.read_message(client_sock, frame_msg)
@@ -109,7 +114,11 @@ class SkeletonDetectionService:
 
                                 # Decompress the frame as necessary.
                                 decompressed_frame_msg = frame_msg  # type: FrameMessage
-                                if self.__frame_decompressor is not None:
+                                if ImageCodecRegistry.can_decode(frame_msg):
+                                    decompressed_frame_msg = ImageCodecRegistry.decode_frame_message(
+                                        frame_msg, stream_decoders=stream_decoders
+                                    )
+                                elif self.__frame_decompressor is not None:
                                     decompressed_frame_msg = self.__frame_decompressor(frame_msg)
 
                                 # Detect any people who are present in the frame.
@@ -146,10 +155,9 @@ class SkeletonDetectionService:
                             mask_msg = BinaryMaskMessage(people_mask.shape)  # type: BinaryMaskMessage
                             mask_msg.set_mask(people_mask)
 
-                            connection_ok = \
-                                SocketUtil.write_message(client_sock, SimpleMessage[int](int, len(data))) and \
-                                SocketUtil.write_message(client_sock, data_msg) and \
-                                SocketUtil.write_message(client_sock, mask_msg)
+                            connection_ok = SocketUtil.write_messages(
+                                client_sock, SimpleMessage[int](int, len(data)), data_msg, mask_msg
+                            )
 
                             # Now that we've sent the skeletons, clear them so that they don't get sent to the client
                             # again erroneously in future frames.